@@ -15,6 +15,7 @@ optionally applied so that recent connections carry more influence.
 
 from __future__ import annotations
 
+from contextlib import aclosing
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -58,24 +59,25 @@ async def compute_node_importance(
     """
     from core.graph.model import edge_weight as _edge_weight
 
-    nodes = await storage.find_nodes(user_id, limit=2000)
-    if not nodes:
+    # Only ids are needed: stream the nodes instead of holding 2000 of them.
+    async with aclosing(storage.iter_nodes(user_id, limit=2000)) as nodes:
+        node_ids = [node.id async for node in nodes]
+    if not node_ids:
         return {}
 
-    edges = await storage.list_edges(user_id)
-    node_ids = [n.id for n in nodes]
     n = len(node_ids)
     idx: dict[str, int] = {nid: i for i, nid in enumerate(node_ids)}
 
     # Build weighted adjacency: in_weights[i] = list of (source_idx, weight)
     in_weights: list[list[tuple[int, float]]] = [[] for _ in range(n)]
-    for edge in edges:
-        src_idx = idx.get(edge.source_node_id)
-        tgt_idx = idx.get(edge.target_node_id)
-        if src_idx is None or tgt_idx is None:
-            continue
-        w = _edge_weight(edge) if use_temporal_weights else 1.0
-        in_weights[tgt_idx].append((src_idx, w))
+    async with aclosing(storage.iter_edges(user_id, endpoint_in=set(idx))) as edges:
+        async for edge in edges:
+            src_idx = idx.get(edge.source_node_id)
+            tgt_idx = idx.get(edge.target_node_id)
+            if src_idx is None or tgt_idx is None:
+                continue
+            w = _edge_weight(edge) if use_temporal_weights else 1.0
+            in_weights[tgt_idx].append((src_idx, w))
 
     # Out-degree weighted sum per node
     out_weight_sum: list[float] = [0.0] * n
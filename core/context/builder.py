@@ -30,7 +30,7 @@ class GraphContextBuilder:
         values_raw = await self.storage.find_nodes(user_id, node_type="VALUE", limit=20)
         beliefs_raw = await self.storage.find_nodes(user_id, node_type="BELIEF", limit=10)
         notes_raw = await self.storage.find_nodes(user_id, node_type="NOTE", limit=5)
-        insights_raw = await self.storage.find_nodes(user_id, node_type="INSIGHT", limit=5)
+        insights_raw = await self.storage.find_nodes_recent(user_id, node_type="INSIGHT", limit=5)
 
         active_projects = [n.name for n in projects_raw if n.name]
 
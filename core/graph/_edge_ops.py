@@ -2,115 +2,283 @@
 
 from __future__ import annotations
 
-import json
+from collections.abc import AsyncIterator
+from dataclasses import replace
 
 import aiosqlite
 
 from core.graph.model import Edge
+from core.utils.json_codec import dumps as _dumps
+from core.utils.json_codec import loads_lazy as _loads_lazy
+
+_EDGE_COLUMNS = "id, user_id, source_node_id, target_node_id, relation, metadata_json, created_at"
+
+# Порция строк за один переход в поток aiosqlite при стриминге курсора
+# (по умолчанию arraysize = 1, т.е. переход на каждую строку).
+ITER_FETCH_SIZE = 256
+
+_INSERT_EDGE_COLUMNS = """
+INSERT INTO edges (id, user_id, source_node_id, target_node_id, relation, metadata_json, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(user_id, source_node_id, target_node_id, relation)"""
+
+# Дубликат отсекает idx_edges_unique. DO NOTHING не пишет строку (в отличие
+# от «пустого» DO UPDATE, который перезаписывает её и журналирует страницу),
+# но и не возвращает её: id существующего ребра дочитывает
+# _SELECT_EDGE_ID_SQL.
+_INSERT_EDGE_RETURNING_SQL = _INSERT_EDGE_COLUMNS + """
+DO NOTHING
+RETURNING id
+"""
+
+_SELECT_EDGE_ID_SQL = """
+SELECT id FROM edges
+WHERE user_id = ? AND source_node_id = ? AND target_node_id = ? AND relation = ?
+"""
+
+# Для executemany RETURNING бесполезен (строки отбрасываются), поэтому
+# дубликаты просто пропускаются, а id дочитывает _SELECT_EDGE_IDS_SQL.
+_INSERT_EDGE_IGNORE_SQL = _INSERT_EDGE_COLUMNS + " DO NOTHING"
+
+# id рёбер пачки одним запросом: json_each разворачивает список
+# [user_id, source, target, relation], поиск идёт по idx_edges_unique.
+_SELECT_EDGE_IDS_SQL = """
+SELECT e.id, e.user_id, e.source_node_id, e.target_node_id, e.relation
+FROM json_each(?) AS j
+JOIN edges AS e
+  ON e.user_id = json_extract(j.value, '$[0]')
+ AND e.source_node_id = json_extract(j.value, '$[1]')
+ AND e.target_node_id = json_extract(j.value, '$[2]')
+ AND e.relation = json_extract(j.value, '$[3]')
+"""
+
+# Вставка только рёбер, оба конца которых — живые (не soft-deleted) узлы
+# того же пользователя. Пачка приходит одним JSON-массивом [id, user_id, source, target, relation,
+# metadata, created_at]; проверка концов — два поиска по первичному ключу
+# на ребро в том же выражении. WHERE true нужен парсеру: иначе ON CONFLICT
+# принимается за условие JOIN.
+_INSERT_EDGES_BETWEEN_EXISTING_SQL = """
+INSERT INTO edges (id, user_id, source_node_id, target_node_id, relation, metadata_json, created_at)
+SELECT json_extract(j.value, '$[0]'), s.user_id, s.id, t.id,
+       json_extract(j.value, '$[4]'), json_extract(j.value, '$[5]'),
+       json_extract(j.value, '$[6]')
+FROM json_each(?) AS j
+CROSS JOIN nodes AS s ON s.id = json_extract(j.value, '$[2]')
+CROSS JOIN nodes AS t ON t.id = json_extract(j.value, '$[3]')
+WHERE true
+  AND s.user_id = json_extract(j.value, '$[1]')
+  AND t.user_id = s.user_id
+  AND (s.is_deleted IS NULL OR s.is_deleted = 0)
+  AND (t.is_deleted IS NULL OR t.is_deleted = 0)
+ON CONFLICT(user_id, source_node_id, target_node_id, relation) DO NOTHING
+"""
+
+_DELETE_EDGES_BY_IDS_SQL = "DELETE FROM edges WHERE id IN (SELECT value FROM json_each(?))"
+
+_SELECT_EDGE_BY_ID_SQL = f"SELECT {_EDGE_COLUMNS} FROM edges WHERE id = ?"
+
+_ITER_EDGES_SQL = f"SELECT {_EDGE_COLUMNS} FROM edges WHERE user_id = ? ORDER BY created_at"
+
+# json_each keeps this a single bound parameter regardless of set size
+_ITER_EDGES_WITHIN_SQL = f"""
+SELECT {_EDGE_COLUMNS} FROM edges
+WHERE user_id = ?
+  AND source_node_id IN (SELECT value FROM json_each(?))
+  AND target_node_id IN (SELECT value FROM json_each(?))
+ORDER BY created_at
+"""
+
+_EDGES_BY_RELATION_SQL = (
+    f"SELECT {_EDGE_COLUMNS} FROM edges WHERE user_id = ? AND relation = ? ORDER BY created_at"
+)
+
+_EDGES_TO_NODE_SQL = f"SELECT {_EDGE_COLUMNS} FROM edges WHERE user_id = ? AND target_node_id = ?"
+
+_EDGES_FROM_NODE_SQL = f"SELECT {_EDGE_COLUMNS} FROM edges WHERE user_id = ? AND source_node_id = ?"
 
 
 class EdgeOpsMixin:
     """Операции с рёбрами: add, get, list, filter."""
 
     async def add_edge(self, edge: Edge) -> Edge:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT id FROM edges
-            WHERE user_id = ? AND source_node_id = ? AND target_node_id = ? AND relation = ?
-            """,
-            (edge.user_id, edge.source_node_id, edge.target_node_id, edge.relation),
+        row = (
+            edge.id,
+            edge.user_id,
+            edge.source_node_id,
+            edge.target_node_id,
+            edge.relation,
+            _dumps(edge.metadata),
+            edge.created_at,
+        )
+        async with self._write_conn() as conn:
+            cursor = await conn.execute(_INSERT_EDGE_RETURNING_SQL, row)
+            inserted = await cursor.fetchone()
+            if inserted is None:
+                cursor = await conn.execute(_SELECT_EDGE_ID_SQL, row[1:5])
+                inserted = await cursor.fetchone()
+            (edge_id,) = inserted
+        if edge_id == edge.id:
+            return edge
+        return Edge(
+            id=edge_id,
+            user_id=edge.user_id,
+            source_node_id=edge.source_node_id,
+            target_node_id=edge.target_node_id,
+            relation=edge.relation,
+            metadata=edge.metadata,
         )
-        existing = await cursor.fetchone()
-        if existing:
-            return Edge(
-                id=existing["id"],
-                user_id=edge.user_id,
-                source_node_id=edge.source_node_id,
-                target_node_id=edge.target_node_id,
-                relation=edge.relation,
-                metadata=edge.metadata,
-            )
 
-        await conn.execute(
-            """
-            INSERT INTO edges (id, user_id, source_node_id, target_node_id, relation, metadata_json, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
+    async def add_edges(self, edges: list[Edge]) -> list[Edge]:
+        """Пакетный :meth:`add_edge`: одна транзакция и один ``executemany``.
+
+        Возвращает рёбра в порядке *edges*; для уже существующих (и
+        повторяющихся внутри пачки) подставляется id сохранённого ребра.
+        """
+        if not edges:
+            return []
+        rows = [
             (
                 edge.id,
                 edge.user_id,
                 edge.source_node_id,
                 edge.target_node_id,
                 edge.relation,
-                json.dumps(edge.metadata, ensure_ascii=False),
+                _dumps(edge.metadata),
                 edge.created_at,
-            ),
+            )
+            for edge in edges
+        ]
+        lookup = _dumps([[row[1], row[2], row[3], row[4]] for row in rows])
+
+        async with self._write_conn() as conn:
+            await conn.executemany(_INSERT_EDGE_IGNORE_SQL, rows)
+            cursor = await conn.execute(_SELECT_EDGE_IDS_SQL, (lookup,))
+            stored = {tuple(row[1:]): row[0] for row in await cursor.fetchall()}
+
+        saved: list[Edge] = []
+        for edge in edges:
+            key = (edge.user_id, edge.source_node_id, edge.target_node_id, edge.relation)
+            edge_id = stored[key]
+            saved.append(edge if edge_id == edge.id else replace(edge, id=edge_id))
+        return saved
+
+    async def add_edges_between_existing(self, edges: list[Edge]) -> int:
+        """Вставляет рёбра, оба конца которых существуют; остальные пропускаются.
+
+        Одно выражение без предварительных SELECT в Python: подходит для
+        ссылок на id, которые могли быть удалены (в том числе soft-delete)
+        или не сохранены. Дубликаты пропускаются. Возвращает число
+        вставленных рёбер.
+        """
+        if not edges:
+            return 0
+        batch = _dumps(
+            [
+                [
+                    edge.id,
+                    edge.user_id,
+                    edge.source_node_id,
+                    edge.target_node_id,
+                    edge.relation,
+                    edge.metadata,
+                    edge.created_at,
+                ]
+                for edge in edges
+            ]
         )
-        await conn.commit()
-        return edge
+        async with self._write_conn() as conn:
+            cursor = await conn.execute(_INSERT_EDGES_BETWEEN_EXISTING_SQL, (batch,))
+            return cursor.rowcount
+
+    async def delete_edges(self, edge_ids: list[str]) -> int:
+        """Физически удалить рёбра по id одним выражением; вернуть число удалённых."""
+        if not edge_ids:
+            return 0
+        async with self._write_conn() as conn:
+            cursor = await conn.execute(_DELETE_EDGES_BY_IDS_SQL, (_dumps(edge_ids),))
+            return cursor.rowcount
 
     async def get_edge(self, edge_id: str) -> Edge:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute("SELECT * FROM edges WHERE id = ?", (edge_id,))
-        row = await cursor.fetchone()
-        if row is None:
-            raise KeyError(f"Edge not found: {edge_id}")
-        return _row_to_edge(row)
-
-    async def list_edges(self, user_id: str) -> list[Edge]:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT * FROM edges WHERE user_id = ? ORDER BY created_at",
-            (user_id,),
-        )
-        rows = await cursor.fetchall()
-        return [_row_to_edge(row) for row in rows]
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_SELECT_EDGE_BY_ID_SQL, (edge_id,))
+            row = await cursor.fetchone()
+            if row is None:
+                raise KeyError(f"Edge not found: {edge_id}")
+            return _row_to_edge(row)
+
+    async def list_edges(
+        self,
+        user_id: str,
+        *,
+        endpoint_in: set[str] | None = None,
+    ) -> list[Edge]:
+        """Все рёбра пользователя по created_at (см. :meth:`iter_edges`)."""
+        return [edge async for edge in self.iter_edges(user_id, endpoint_in=endpoint_in)]
+
+    async def iter_edges(
+        self,
+        user_id: str,
+        *,
+        endpoint_in: set[str] | None = None,
+    ) -> AsyncIterator[Edge]:
+        """Стримит рёбра пользователя по created_at, не собирая весь список.
+
+        Строки читаются из курсора порциями, поэтому потребители, которым
+        достаточно одного прохода, держат в памяти O(1) рёбер вместо O(E).
+
+        Если задан *endpoint_in*, возвращаются только рёбра, оба конца которых
+        входят в это множество — фильтр выполняется в SQLite, так что
+        отброшенные рёбра не материализуются в Python.
+
+        Как и ``iter_nodes``, незавершённый генератор держит слот пула
+        читателей: прерываемый обход оборачивайте в ``contextlib.aclosing``.
+        """
+        if endpoint_in is not None and not endpoint_in:
+            return
+        if endpoint_in is None:
+            query = _ITER_EDGES_SQL
+            params: tuple[object, ...] = (user_id,)
+        else:
+            ids_json = _dumps(list(endpoint_in))
+            query = _ITER_EDGES_WITHIN_SQL
+            params = (user_id, ids_json, ids_json)
+        async with self._read_conn() as conn, conn.execute(query, params) as cursor:
+            cursor.arraysize = ITER_FETCH_SIZE
+            async for row in cursor:
+                yield _row_to_edge(row)
 
     async def get_edges_by_relation(self, user_id: str, relation: str) -> list[Edge]:
         """Все рёбра пользователя с указанным relation."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT * FROM edges WHERE user_id = ? AND relation = ? ORDER BY created_at",
-            (user_id, relation),
-        )
-        rows = await cursor.fetchall()
-        return [_row_to_edge(row) for row in rows]
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_EDGES_BY_RELATION_SQL, (user_id, relation))
+            rows = await cursor.fetchall()
+            return [_row_to_edge(row) for row in rows]
 
     async def get_edges_to_node(self, user_id: str, target_node_id: str) -> list[Edge]:
         """Все рёбра входящие в указанный узел."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT * FROM edges WHERE user_id = ? AND target_node_id = ?",
-            (user_id, target_node_id),
-        )
-        rows = await cursor.fetchall()
-        return [_row_to_edge(row) for row in rows]
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_EDGES_TO_NODE_SQL, (user_id, target_node_id))
+            rows = await cursor.fetchall()
+            return [_row_to_edge(row) for row in rows]
 
     async def get_edges_from_node(self, user_id: str, source_node_id: str) -> list[Edge]:
         """Все рёбра исходящие из указанного узла."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT * FROM edges WHERE user_id = ? AND source_node_id = ?",
-            (user_id, source_node_id),
-        )
-        rows = await cursor.fetchall()
-        return [_row_to_edge(row) for row in rows]
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_EDGES_FROM_NODE_SQL, (user_id, source_node_id))
+            rows = await cursor.fetchall()
+            return [_row_to_edge(row) for row in rows]
 
 
 def _row_to_edge(row: aiosqlite.Row) -> Edge:
+    """Строка ``SELECT _EDGE_COLUMNS`` → Edge (позиционно)."""
+    edge_id, user_id, source_node_id, target_node_id, relation, metadata_json, created_at = row
+    # Позиционно, в порядке полей Edge (см. _row_to_node).
     return Edge(
-        id=row["id"],
-        user_id=row["user_id"],
-        source_node_id=row["source_node_id"],
-        target_node_id=row["target_node_id"],
-        relation=row["relation"],
-        metadata=json.loads(row["metadata_json"]),
-        created_at=row["created_at"],
+        user_id,
+        source_node_id,
+        target_node_id,
+        relation,
+        edge_id,
+        _loads_lazy(metadata_json),
+        created_at,
     )
@@ -2,21 +2,76 @@
 
 from __future__ import annotations
 
+from typing import NamedTuple
+
+# Сколько последних снапшотов хранится на пользователя.
+MOOD_HISTORY_LIMIT = 30
+
+_INSERT_MOOD_SNAPSHOT_SQL = """
+INSERT OR REPLACE INTO mood_snapshots (
+    id, user_id, timestamp, valence_avg, arousal_avg,
+    dominance_avg, intensity_avg, dominant_label, sample_count
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Удаляются строки после первых MOOD_HISTORY_LIMIT: подзапрос — ограниченный
+# проход по idx_mood_snapshots_user_ts (rowid есть в самом индексе), без
+# анти-джойна NOT IN по всей истории пользователя.
+_PRUNE_MOOD_SNAPSHOTS_SQL = """
+DELETE FROM mood_snapshots
+WHERE rowid IN (
+    SELECT rowid FROM mood_snapshots
+    WHERE user_id = ?
+    ORDER BY timestamp DESC
+    LIMIT -1 OFFSET ?
+)
+"""
+
+
+class MoodSnapshot(NamedTuple):
+    """Строка mood_snapshots без промежуточного dict (порядок = _MOOD_COLUMNS)."""
+
+    id: str
+    user_id: str
+    timestamp: str
+    valence_avg: float
+    arousal_avg: float
+    dominance_avg: float
+    intensity_avg: float
+    dominant_label: str | None
+    sample_count: int
+    stressor_tags: str | None
+    active_parts_keys: str | None
+    intervention_applied: str | None
+    feedback_score: int | None
+
+
+_MOOD_COLUMNS = MoodSnapshot._fields
+
+_MOOD_SNAPSHOTS_SQL = f"""
+SELECT {", ".join(_MOOD_COLUMNS)} FROM mood_snapshots
+WHERE user_id = ?
+ORDER BY timestamp DESC
+LIMIT ?
+"""
+
 
 class MoodOpsMixin:
     """Операции с mood_snapshots: save, get_latest, get_list."""
 
     async def save_mood_snapshot(self, snapshot: dict) -> None:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        await conn.execute(
-            """
-            INSERT OR REPLACE INTO mood_snapshots (
-                id, user_id, timestamp, valence_avg, arousal_avg,
-                dominance_avg, intensity_avg, dominant_label, sample_count
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+        await self.save_mood_snapshots([snapshot])
+
+    async def save_mood_snapshots(self, snapshots: list[dict]) -> None:
+        """Сохраняет пачку снапшотов и обрезает историю одной транзакцией.
+
+        Вставка идёт одним ``executemany``, затем для каждого затронутого
+        пользователя остаются только последние ``MOOD_HISTORY_LIMIT`` записей.
+        """
+        if not snapshots:
+            return
+        rows = [
             (
                 snapshot["id"],
                 snapshot["user_id"],
@@ -27,49 +82,33 @@ class MoodOpsMixin:
                 snapshot.get("intensity_avg", 0.5),
                 snapshot.get("dominant_label"),
                 snapshot.get("sample_count", 1),
-            ),
-        )
-        await conn.execute(
-            """
-            DELETE FROM mood_snapshots
-            WHERE user_id = ?
-              AND id NOT IN (
-                  SELECT id FROM mood_snapshots
-                  WHERE user_id = ?
-                  ORDER BY timestamp DESC
-                  LIMIT 30
-              )
-            """,
-            (snapshot["user_id"], snapshot["user_id"]),
-        )
-        await conn.commit()
+            )
+            for snapshot in snapshots
+        ]
+        user_ids = [
+            (user_id, MOOD_HISTORY_LIMIT)
+            for user_id in dict.fromkeys(row[1] for row in rows)
+        ]
+
+        async with self._write_conn() as conn:
+            await conn.executemany(_INSERT_MOOD_SNAPSHOT_SQL, rows)
+            await conn.executemany(_PRUNE_MOOD_SNAPSHOTS_SQL, user_ids)
 
     async def get_latest_mood_snapshot(self, user_id: str) -> dict | None:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT * FROM mood_snapshots
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 1
-            """,
-            (user_id,),
-        )
-        row = await cursor.fetchone()
-        return dict(row) if row else None
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_MOOD_SNAPSHOTS_SQL, (user_id, 1))
+            row = await cursor.fetchone()
+            return dict(zip(_MOOD_COLUMNS, row, strict=True)) if row else None
+
+    async def get_mood_snapshot_rows(self, user_id: str, limit: int = 5) -> list[MoodSnapshot]:
+        """Как :meth:`get_mood_snapshots`, но кортежами — для числовых расчётов."""
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_MOOD_SNAPSHOTS_SQL, (user_id, limit))
+            rows = await cursor.fetchall()
+            return list(map(MoodSnapshot._make, rows))
 
     async def get_mood_snapshots(self, user_id: str, limit: int = 5) -> list[dict]:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT * FROM mood_snapshots
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-            """,
-            (user_id, limit),
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_MOOD_SNAPSHOTS_SQL, (user_id, limit))
+            rows = await cursor.fetchall()
+            return [dict(zip(_MOOD_COLUMNS, row, strict=True)) for row in rows]
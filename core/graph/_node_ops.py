@@ -2,178 +2,303 @@
 
 from __future__ import annotations
 
-import json
 import logging
 import sqlite3
-from datetime import datetime, timezone
+import struct
+from array import array
+from collections.abc import AsyncIterator, Sequence
 
 import aiosqlite
 
-from core.graph.model import Edge, Node, ensure_metadata_defaults
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when numpy is absent
+    np = None  # type: ignore[assignment]
+
+from core.graph._edge_ops import ITER_FETCH_SIZE
+from core.graph.model import Edge, Node, metadata_with_defaults
+from core.utils.json_codec import LazyJSONDict
+from core.utils.json_codec import dumps as _dumps
+from core.utils.json_codec import loads_lazy as _loads_lazy
 
 logger = logging.getLogger(__name__)
 
+# Один UPSERT вместо SELECT + INSERT OR REPLACE. Для узла с key каноническим
+# остаётся id уже существующей записи (user_id, type, key); created_at всегда
+# сохраняется от первой вставки. is_deleted сбрасывается, как и раньше при
+# REPLACE: повторный upsert «воскрешает» мягко удалённый узел. UPDATE вместо
+# DELETE+INSERT сохраняет rowid, и nodes_fts обновляет триггер nodes_fts_au.
+#
+# WHERE в DO UPDATE пропускает запись, если строка не изменилась (частый
+# идемпотентный upsert): ни страниц в WAL, ни триггеров FTS. RETURNING в этом
+# случае пуст, и id/created_at дочитываются _lookup_node_identity.
+#
+# embedding_blob не затирается upsert'ом без эмбеддинга (COALESCE): повторная
+# запись узла из пайплайна не теряет уже посчитанный вектор. pattern_type
+# выводится из metadata_json (см. _node_params), поэтому в WHERE его нет.
+#
+# Без RETURNING выражение годится для executemany (upsert_nodes_batch).
+_UPSERT_NODE_SQL = """
+INSERT INTO nodes (
+    id, user_id, type, name, text, subtype, key, metadata_json,
+    embedding_blob, embedding_dtype, pattern_type, created_at
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(user_id, type, key) WHERE key IS NOT NULL DO UPDATE SET
+    name = excluded.name,
+    text = excluded.text,
+    subtype = excluded.subtype,
+    metadata_json = excluded.metadata_json,
+    embedding_blob = COALESCE(excluded.embedding_blob, nodes.embedding_blob),
+    embedding_dtype = CASE WHEN excluded.embedding_blob IS NULL
+        THEN nodes.embedding_dtype ELSE excluded.embedding_dtype END,
+    pattern_type = excluded.pattern_type,
+    is_deleted = 0
+WHERE nodes.name IS NOT excluded.name
+   OR nodes.text IS NOT excluded.text
+   OR nodes.subtype IS NOT excluded.subtype
+   OR nodes.metadata_json IS NOT excluded.metadata_json
+   OR COALESCE(excluded.embedding_blob, nodes.embedding_blob) IS NOT nodes.embedding_blob
+   OR nodes.is_deleted IS NOT 0
+ON CONFLICT(id) DO UPDATE SET
+    user_id = excluded.user_id,
+    type = excluded.type,
+    name = excluded.name,
+    text = excluded.text,
+    subtype = excluded.subtype,
+    key = excluded.key,
+    metadata_json = excluded.metadata_json,
+    embedding_blob = COALESCE(excluded.embedding_blob, nodes.embedding_blob),
+    embedding_dtype = CASE WHEN excluded.embedding_blob IS NULL
+        THEN nodes.embedding_dtype ELSE excluded.embedding_dtype END,
+    pattern_type = excluded.pattern_type,
+    is_deleted = 0
+WHERE nodes.user_id IS NOT excluded.user_id
+   OR nodes.type IS NOT excluded.type
+   OR nodes.name IS NOT excluded.name
+   OR nodes.text IS NOT excluded.text
+   OR nodes.subtype IS NOT excluded.subtype
+   OR nodes.key IS NOT excluded.key
+   OR nodes.metadata_json IS NOT excluded.metadata_json
+   OR COALESCE(excluded.embedding_blob, nodes.embedding_blob) IS NOT nodes.embedding_blob
+   OR nodes.is_deleted IS NOT 0
+"""
+
+_UPSERT_NODE_RETURNING_SQL = _UPSERT_NODE_SQL + "RETURNING id, created_at\n"
+
+# Без подсказки планировщик выбирает уникальный idx_nodes_user_type_key и
+# читает строку целиком; idx_nodes_key_identity отвечает из самого индекса.
+_NODE_IDENTITY_BY_KEY_SQL = """
+SELECT id, created_at FROM nodes INDEXED BY idx_nodes_key_identity
+WHERE user_id = ? AND type = ? AND key = ?
+"""
+
+_NODE_IDENTITY_BY_ID_SQL = "SELECT id, created_at FROM nodes WHERE id = ?"
+
+# Канонические (id, created_at) всей пачки одним запросом. json_each
+# разворачивает список [id, user_id, type, key] в порядке пачки (j.key —
+# индекс в массиве); узел с key ищется по ключу, иначе — по id.
+_NODE_IDENTITIES_SQL = """
+SELECT COALESCE(k.id, i.id), COALESCE(k.created_at, i.created_at)
+FROM json_each(?) AS j
+LEFT JOIN nodes AS k INDEXED BY idx_nodes_key_identity
+  ON k.user_id = json_extract(j.value, '$[1]')
+ AND k.type = json_extract(j.value, '$[2]')
+ AND k.key = json_extract(j.value, '$[3]')
+LEFT JOIN nodes AS i ON i.id = json_extract(j.value, '$[0]')
+ORDER BY j.key
+"""
+
+# Явный список колонок вместо SELECT *: _row_to_node распаковывает строку
+# по позициям, а порядок колонок в старых базах зависит от истории ALTER.
+_NODE_COLUMNS = (
+    "id, user_id, type, name, text, subtype, key, metadata_json, created_at, "
+    "embedding_blob, embedding_dtype"
+)
+
+_SELECT_NODE_BY_ID_SQL = f"SELECT {_NODE_COLUMNS} FROM nodes WHERE id = ?"
+
+_SELECT_NODE_BY_KEY_SQL = (
+    f"SELECT {_NODE_COLUMNS} FROM nodes WHERE user_id = ? AND type = ? AND key = ?"
+)
+
+# Колонки с префиксом n. — для запросов с JOIN (у json_each и nodes_fts есть
+# свои id, key, type).
+_QUALIFIED_NODE_COLUMNS = ", ".join(f"n.{column}" for column in _NODE_COLUMNS.split(", "))
+
+# Пачка пар [type, key] одним JSON-параметром. CROSS JOIN фиксирует порядок:
+# внешний цикл — по парам, каждая — поиск по уникальному idx_nodes_user_type_key
+# (иначе планировщик перебирает все узлы пользователя).
+_SELECT_NODES_BY_KEYS_SQL = f"""
+SELECT {_QUALIFIED_NODE_COLUMNS} FROM json_each(?) AS j
+CROSS JOIN nodes AS n
+  ON n.user_id = ?
+ AND n.type = json_extract(j.value, '$[0]')
+ AND n.key = json_extract(j.value, '$[1]')
+"""
+
+_FIND_NODES_RECENT_SQL = f"""
+SELECT {_NODE_COLUMNS} FROM nodes
+WHERE user_id = ? AND type = ?
+  AND (is_deleted IS NULL OR is_deleted = 0)
+ORDER BY created_at DESC
+LIMIT ?
+"""
+
+
+def _find_nodes_sql(by_type: bool, by_name: bool) -> str:
+    return (
+        f"SELECT {_NODE_COLUMNS} FROM nodes "
+        "WHERE user_id = ? AND (is_deleted IS NULL OR is_deleted = 0)"
+        + (" AND type = ?" if by_type else "")
+        + (" AND name = ?" if by_name else "")
+        + " ORDER BY created_at LIMIT ?"
+    )
+
+
+# Четыре варианта find_nodes по (node_type, name) — фиксированные строки,
+# чтобы кэш выражений sqlite3 отдавал уже скомпилированный запрос.
+_FIND_NODES_SQL: dict[tuple[bool, bool], str] = {
+    (by_type, by_name): _find_nodes_sql(by_type, by_name)
+    for by_type in (False, True)
+    for by_name in (False, True)
+}
+
+# Списки id/типов передаются одним JSON-параметром через json_each: текст
+# запроса не зависит от длины списка (кэш выражений sqlite3 его переиспользует),
+# и нет упора в лимит SQLite на число параметров. Унарный + у user_id убирает
+# его из выбора индекса: без sqlite_stat1 планировщик считал user_id
+# селективным и перебирал все узлы пользователя вместо поиска по id.
+_SELECT_NODES_BY_IDS_SQL = f"""
+SELECT {_NODE_COLUMNS} FROM nodes
+WHERE +user_id = ? AND id IN (SELECT value FROM json_each(?))
+"""
+
+_RETENTION_CANDIDATES_SQL = f"""
+SELECT {_NODE_COLUMNS} FROM nodes
+WHERE user_id = ? AND (is_deleted IS NULL OR is_deleted = 0)
+ORDER BY created_at LIMIT ?
+"""
+
+_RETENTION_CANDIDATES_BY_TYPE_SQL = f"""
+SELECT {_NODE_COLUMNS} FROM nodes
+WHERE user_id = ? AND (is_deleted IS NULL OR is_deleted = 0)
+  AND type IN (SELECT value FROM json_each(?))
+ORDER BY created_at LIMIT ?
+"""
+
+_MERGE_REPOINT_SOURCES_SQL = """
+UPDATE edges SET source_node_id = ?
+WHERE user_id = ? AND source_node_id IN (SELECT value FROM json_each(?))
+"""
+
+_MERGE_REPOINT_TARGETS_SQL = """
+UPDATE edges SET target_node_id = ?
+WHERE user_id = ? AND target_node_id IN (SELECT value FROM json_each(?))
+"""
+
+# user_id — префикс idx_edges_unique: без него DELETE перебирал бы все рёбра.
+_MERGE_DROP_SELF_LOOPS_SQL = """
+DELETE FROM edges WHERE user_id = ? AND source_node_id = ? AND target_node_id = ?
+"""
+
+# Как в _SELECT_NODES_BY_IDS_SQL: поиск по id, user_id — только фильтр.
+_MERGE_SOFT_DELETE_SQL = """
+UPDATE nodes SET is_deleted = 1
+WHERE +user_id = ? AND id IN (SELECT value FROM json_each(?))
+"""
+
+_SOFT_DELETE_NODE_SQL = "UPDATE nodes SET is_deleted = 1 WHERE id = ?"
+
 
 class NodeOpsMixin:
     """Операции с узлами: upsert, find, soft-delete, merge, retention."""
 
     async def upsert_node(self, node: Node) -> Node:
-        await self._ensure_initialized()
-
-        node_metadata = ensure_metadata_defaults(dict(node.metadata))
+        node_metadata = metadata_with_defaults(node.metadata)
         if node.type == "EMOTION" and "created_at" not in node_metadata:
-            node_metadata["created_at"] = datetime.now(timezone.utc).isoformat()
-
-        conn = await self._get_conn()
-        if node.key:
-            cursor = await conn.execute(
-                """
-                SELECT * FROM nodes
-                WHERE user_id = ? AND type = ? AND key = ?
-                """,
-                (node.user_id, node.type, node.key),
-            )
-            existing = await cursor.fetchone()
-            canonical_id = existing["id"] if existing else node.id
-            created_at = existing["created_at"] if existing else node.created_at
-
-            await conn.execute(
-                """
-                INSERT OR REPLACE INTO nodes (id, user_id, type, name, text, subtype, key, metadata_json, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    canonical_id,
-                    node.user_id,
-                    node.type,
-                    node.name,
-                    node.text,
-                    node.subtype,
-                    node.key,
-                    json.dumps(node_metadata, ensure_ascii=False),
-                    created_at,
-                ),
-            )
-            await conn.commit()
-            return Node(
-                id=canonical_id,
-                user_id=node.user_id,
-                type=node.type,
-                name=node.name,
-                text=node.text,
-                subtype=node.subtype,
-                key=node.key,
-                metadata=node_metadata,
-                created_at=created_at,
-            )
-
-        cursor = await conn.execute("SELECT created_at FROM nodes WHERE id = ?", (node.id,))
-        existing = await cursor.fetchone()
-        created_at = existing["created_at"] if existing else node.created_at
-
-        await conn.execute(
-            """
-            INSERT OR REPLACE INTO nodes (id, user_id, type, name, text, subtype, key, metadata_json, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                node.id,
-                node.user_id,
-                node.type,
-                node.name,
-                node.text,
-                node.subtype,
-                None,
-                json.dumps(node_metadata, ensure_ascii=False),
-                created_at,
-            ),
-        )
-        await conn.commit()
+            # Момент создания уже отформатирован в node.created_at — не
+            # строим новый datetime на каждую запись.
+            node_metadata = {**node_metadata, "created_at": node.created_at}
+
+        key = node.key or None
+        # Сериализация — до взятия лока писателя: под ним только SQLite.
+        params = _node_params(node, key, node_metadata)
+        async with self._write_conn() as conn:
+            canonical_id, created_at = await _upsert_node_row(conn, params)
+            self._user_stats_pending.add(node.user_id)
         return Node(
-            id=node.id,
+            id=canonical_id,
             user_id=node.user_id,
             type=node.type,
             name=node.name,
             text=node.text,
             subtype=node.subtype,
-            key=None,
+            key=key,
             metadata=node_metadata,
             created_at=created_at,
         )
 
+    async def upsert_nodes(self, nodes: list[Node]) -> list[Node]:
+        """Пакетный :meth:`upsert_node` в одной транзакции."""
+        nodes_data: list[tuple[Node, dict]] = []
+        for node in nodes:
+            node_metadata = metadata_with_defaults(node.metadata)
+            if node.type == "EMOTION" and "created_at" not in node_metadata:
+                node_metadata = {**node_metadata, "created_at": node.created_at}
+            nodes_data.append((node, node_metadata))
+        return await self.upsert_nodes_batch(nodes_data)
+
     async def upsert_nodes_batch(self, nodes_data: list[tuple[Node, dict]]) -> list[Node]:
-        """Атомарный upsert списка узлов в одной транзакции."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        saved: list[Node] = []
+        """Атомарный upsert списка узлов в одной транзакции.
+
+        Вся пачка пишется одним ``executemany`` (``executemany`` отбрасывает
+        строки ``RETURNING``), после чего канонические id и created_at
+        дочитываются одним запросом :data:`_NODE_IDENTITIES_SQL`.
+        """
+        if not nodes_data:
+            return []
+        # Параметры и JSON для lookup готовятся до взятия лока писателя.
+        rows = [
+            _node_params(node, node.key or None, node_metadata)
+            for node, node_metadata in nodes_data
+        ]
+        lookup = _dumps([[row[0], row[1], row[2], row[6]] for row in rows])
 
-        await conn.execute("BEGIN")
         try:
-            for node, node_metadata in nodes_data:
-                if node.key:
-                    cursor = await conn.execute(
-                        "SELECT id, created_at FROM nodes "
-                        "WHERE user_id = ? AND type = ? AND key = ?",
-                        (node.user_id, node.type, node.key),
-                    )
-                    existing = await cursor.fetchone()
-                    canonical_id = existing["id"] if existing else node.id
-                    created_at = existing["created_at"] if existing else node.created_at
-                else:
-                    cursor = await conn.execute(
-                        "SELECT created_at FROM nodes WHERE id = ?", (node.id,)
-                    )
-                    existing = await cursor.fetchone()
-                    canonical_id = node.id
-                    created_at = existing["created_at"] if existing else node.created_at
-
-                await conn.execute(
-                    """
-                    INSERT OR REPLACE INTO nodes
-                      (id, user_id, type, name, text, subtype, key, metadata_json, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        canonical_id,
-                        node.user_id,
-                        node.type,
-                        node.name,
-                        node.text,
-                        node.subtype,
-                        node.key,
-                        json.dumps(node_metadata, ensure_ascii=False),
-                        created_at,
-                    ),
-                )
-                saved.append(
-                    Node(
-                        id=canonical_id,
-                        user_id=node.user_id,
-                        type=node.type,
-                        name=node.name,
-                        text=node.text,
-                        subtype=node.subtype,
-                        key=node.key,
-                        metadata=node_metadata,
-                        created_at=created_at,
-                    )
-                )
-            await conn.commit()
+            async with self._write_conn() as conn:
+                await conn.executemany(_UPSERT_NODE_SQL, rows)
+                cursor = await conn.execute(_NODE_IDENTITIES_SQL, (lookup,))
+                identities = await cursor.fetchall()
+                self._user_stats_pending.update(node.user_id for node, _ in nodes_data)
         except Exception:
-            await conn.rollback()
             logger.exception("apply_changes_atomic transaction failed, rolled back")
             raise
 
-        return saved
+        return [
+            Node(
+                id=canonical_id,
+                user_id=node.user_id,
+                type=node.type,
+                name=node.name,
+                text=node.text,
+                subtype=node.subtype,
+                key=node.key,
+                metadata=node_metadata,
+                created_at=created_at,
+            )
+            for (node, node_metadata), (canonical_id, created_at) in zip(
+                nodes_data, identities, strict=True
+            )
+        ]
 
     async def get_node(self, node_id: str) -> Node:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
-        row = await cursor.fetchone()
-        if row is None:
-            raise KeyError(f"Node not found: {node_id}")
-        return _row_to_node(row)
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_SELECT_NODE_BY_ID_SQL, (node_id,))
+            row = await cursor.fetchone()
+            if row is None:
+                raise KeyError(f"Node not found: {node_id}")
+            return _row_to_node(row)
 
     async def find_nodes(
         self,
@@ -182,22 +307,44 @@ class NodeOpsMixin:
         name: str | None = None,
         limit: int = 500,
     ) -> list[Node]:
-        await self._ensure_initialized()
-        query = "SELECT * FROM nodes WHERE user_id = ? AND (is_deleted IS NULL OR is_deleted = 0)"
-        params: list[object] = [user_id]
+        """Список узлов по created_at (см. :meth:`iter_nodes`)."""
+        return [
+            node
+            async for node in self.iter_nodes(user_id, node_type=node_type, name=name, limit=limit)
+        ]
+
+    async def iter_nodes(
+        self,
+        user_id: str,
+        node_type: str | None = None,
+        name: str | None = None,
+        limit: int = 500,
+    ) -> AsyncIterator[Node]:
+        """Стримит неудалённые узлы пользователя по created_at.
+
+        Строки читаются из курсора порциями по ITER_FETCH_SIZE: потребитель,
+        которому хватает одного прохода (например, нужны только id), не
+        держит в памяти все *limit* узлов сразу.
+
+        Пока генератор не исчерпан, он занимает одно соединение пула читателей.
+        Потребитель, который может прервать обход (break, исключение), должен
+        оборачивать его в ``contextlib.aclosing``, иначе слот освободится лишь
+        при сборке генератора.
+        """
         if node_type:
-            query += " AND type = ?"
-            params.append(node_type)
-        if name:
-            query += " AND name = ?"
-            params.append(name)
-        query += " ORDER BY created_at LIMIT ?"
-        params.append(limit)
-
-        conn = await self._get_conn()
-        cursor = await conn.execute(query, params)
-        rows = await cursor.fetchall()
-        return [_row_to_node(row) for row in rows]
+            if name:
+                query, params = _FIND_NODES_SQL[True, True], (user_id, node_type, name, limit)
+            else:
+                query, params = _FIND_NODES_SQL[True, False], (user_id, node_type, limit)
+        elif name:
+            query, params = _FIND_NODES_SQL[False, True], (user_id, name, limit)
+        else:
+            query, params = _FIND_NODES_SQL[False, False], (user_id, limit)
+
+        async with self._read_conn() as conn, conn.execute(query, params) as cursor:
+            cursor.arraysize = ITER_FETCH_SIZE
+            async for row in cursor:
+                yield _row_to_node(row)
 
     async def find_nodes_recent(
         self,
@@ -206,60 +353,49 @@ class NodeOpsMixin:
         limit: int = 5,
     ) -> list[Node]:
         """Возвращает limit последних узлов по created_at DESC."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT * FROM nodes
-            WHERE user_id = ? AND type = ?
-              AND (is_deleted IS NULL OR is_deleted = 0)
-            ORDER BY created_at DESC
-            LIMIT ?
-            """,
-            (user_id, node_type, limit),
-        )
-        rows = await cursor.fetchall()
-        return [_row_to_node(row) for row in rows]
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_FIND_NODES_RECENT_SQL, (user_id, node_type, limit))
+            rows = await cursor.fetchall()
+            return [_row_to_node(row) for row in rows]
 
     async def find_by_key(self, user_id: str, node_type: str, key: str) -> Node | None:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT * FROM nodes WHERE user_id = ? AND type = ? AND key = ?",
-            (user_id, node_type, key),
-        )
-        row = await cursor.fetchone()
-        return _row_to_node(row) if row else None
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_SELECT_NODE_BY_KEY_SQL, (user_id, node_type, key))
+            row = await cursor.fetchone()
+            return _row_to_node(row) if row else None
+
+    async def find_by_keys(
+        self, user_id: str, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], Node]:
+        """Пакетный :meth:`find_by_key`: {(type, key): Node} для найденных пар."""
+        if not keys:
+            return {}
+        keys_json = _dumps([list(pair) for pair in dict.fromkeys(keys)])
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_SELECT_NODES_BY_KEYS_SQL, (keys_json, user_id))
+            rows = await cursor.fetchall()
+        nodes = (_row_to_node(row) for row in rows)
+        return {(node.type, node.key): node for node in nodes}
 
     async def get_nodes_by_ids(self, user_id: str, node_ids: list[str]) -> list[Node]:
         """Возвращает узлы пользователя по списку id одним SQL-запросом."""
         if not node_ids:
             return []
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        unique_ids = list(dict.fromkeys(node_ids))
-        placeholders = ", ".join("?" for _ in unique_ids)
-        query = f"SELECT * FROM nodes WHERE user_id = ? AND id IN ({placeholders})"
-        cursor = await conn.execute(query, [user_id, *unique_ids])
-        rows = await cursor.fetchall()
-        return [_row_to_node(row) for row in rows]
+        ids_json = _dumps(list(dict.fromkeys(node_ids)))
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_SELECT_NODES_BY_IDS_SQL, (user_id, ids_json))
+            rows = await cursor.fetchall()
+            return [_row_to_node(row) for row in rows]
 
     async def count_nodes(self, user_id: str) -> int:
         """Общее количество узлов пользователя."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT COUNT(*) FROM nodes WHERE user_id = ?", (user_id,)
-        )
-        row = await cursor.fetchone()
-        return int(row[0]) if row else 0
+        stats = (await self._get_user_stats()).get(user_id)
+        return stats.node_count if stats else 0
 
     async def soft_delete_node(self, node_id: str) -> None:
         """Пометить узел как удалённый без физического удаления."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        await conn.execute("UPDATE nodes SET is_deleted = 1 WHERE id = ?", (node_id,))
-        await conn.commit()
+        async with self._write_conn() as conn:
+            await conn.execute(_SOFT_DELETE_NODE_SQL, (node_id,))
 
     async def merge_nodes(
         self,
@@ -277,41 +413,21 @@ class NodeOpsMixin:
         if not source_node_ids:
             return await self.upsert_node(target_node)
 
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-
         saved = await self.upsert_node(target_node)
 
-        source_set = list(dict.fromkeys(source_node_ids))
-        placeholders = ",".join("?" * len(source_set))
-
-        # Re-point edges: source_node_id → target
-        await conn.execute(
-            f"UPDATE edges SET source_node_id = ? "
-            f"WHERE user_id = ? AND source_node_id IN ({placeholders})",
-            [saved.id, user_id, *source_set],
-        )
-        # Re-point edges: target_node_id → target
-        await conn.execute(
-            f"UPDATE edges SET target_node_id = ? "
-            f"WHERE user_id = ? AND target_node_id IN ({placeholders})",
-            [saved.id, user_id, *source_set],
-        )
+        source_json = _dumps(list(dict.fromkeys(source_node_ids)))
 
-        # Remove self-loops that may have been created
-        await conn.execute(
-            "DELETE FROM edges WHERE source_node_id = ? AND target_node_id = ?",
-            (saved.id, saved.id),
-        )
+        async with self._write_conn() as conn:
+            # Re-point edges: source_node_id → target
+            await conn.execute(_MERGE_REPOINT_SOURCES_SQL, (saved.id, user_id, source_json))
+            # Re-point edges: target_node_id → target
+            await conn.execute(_MERGE_REPOINT_TARGETS_SQL, (saved.id, user_id, source_json))
 
-        # Soft-delete source nodes
-        await conn.execute(
-            f"UPDATE nodes SET is_deleted = 1 "
-            f"WHERE user_id = ? AND id IN ({placeholders})",
-            [user_id, *source_set],
-        )
+            # Remove self-loops that may have been created
+            await conn.execute(_MERGE_DROP_SELF_LOOPS_SQL, (user_id, saved.id, saved.id))
 
-        await conn.commit()
+            # Soft-delete source nodes
+            await conn.execute(_MERGE_SOFT_DELETE_SQL, (user_id, source_json))
         return saved
 
     async def get_nodes_by_retention(
@@ -322,42 +438,148 @@ class NodeOpsMixin:
         limit: int = 200,
     ) -> list[Node]:
         """Узлы с salience_score ≤ max_retention — кандидаты на забывание."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-
-        query = (
-            "SELECT * FROM nodes WHERE user_id = ? AND "
-            "(is_deleted IS NULL OR is_deleted = 0)"
-        )
-        params: list[object] = [user_id]
         if node_types:
-            placeholders = ",".join("?" * len(node_types))
-            query += f" AND type IN ({placeholders})"
-            params.extend(node_types)
-        query += " ORDER BY created_at LIMIT ?"
-        params.append(limit)
+            query = _RETENTION_CANDIDATES_BY_TYPE_SQL
+            params: tuple[object, ...] = (user_id, _dumps(node_types), limit)
+        else:
+            query, params = _RETENTION_CANDIDATES_SQL, (user_id, limit)
+
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(query, params)
+            rows = await cursor.fetchall()
+
+            results: list[Node] = []
+            for row in rows:
+                node = _row_to_node(row)
+                salience = float(node.metadata.get("salience_score", 1.0))
+                if salience <= max_retention:
+                    results.append(node)
+            return results
+
+
+async def _upsert_node_row(conn: aiosqlite.Connection, params: tuple) -> tuple[str, str]:
+    """Выполняет _UPSERT_NODE_RETURNING_SQL с параметрами из :func:`_node_params`.
+
+    Возвращает канонические (id, created_at).
+    """
+    cursor = await conn.execute(_UPSERT_NODE_RETURNING_SQL, params)
+    row = await cursor.fetchone()
+    if row is None:
+        node_id, user_id, node_type, _, _, _, key = params[:7]
+        row = await _lookup_node_identity(conn, node_id, user_id, node_type, key)
+    return row[0], row[1]
+
+
+def _encode_embedding(values: list) -> tuple[bytes, str] | None:
+    """Вектор → (embedding_blob, embedding_dtype); ``None`` для нечисловых списков.
+
+    По умолчанию float16: вдвое меньше float32 на диске и в page cache.
+    Хранение с потерями — прочитанный вектор не равен записанному:
+    относительная ошибка компоненты ≤ 2**-11 (~5e-4), для |x| < 2**-14
+    (субнормальные float16) абсолютная ≤ 2**-25. Косинусная близость к
+    исходному вектору остаётся ≥ 1 - 1e-6, и для ранжирования этого
+    достаточно; тем, кому нужен точный вектор, стоит хранить его отдельно.
+    Значения вне диапазона float16 (|x| > 65504) сохраняются как float32.
+    """
+    try:
+        return struct.pack(f"<{len(values)}e", *values), "e"
+    except OverflowError:
+        pass
+    except struct.error:
+        return None
+    try:
+        return array("f", values).tobytes(), "f"
+    except (TypeError, OverflowError):
+        return None
+
+
+def _decode_embedding(blob: bytes, dtype: str | None) -> list[float]:
+    """Обратное к :func:`_encode_embedding`; dtype NULL — старые строки (float32)."""
+    if dtype == "e":
+        return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+    embedding = array("f")
+    embedding.frombytes(blob)
+    return embedding.tolist()
+
+
+def _decode_embedding_array(blob: bytes, dtype: str | None) -> Sequence[float]:
+    """Как :func:`_decode_embedding`, но с NumPy — ndarray-представление
+    blob без копирования и без Python-списка (для пакетного ранжирования).
+    """
+    if np is None:
+        return _decode_embedding(blob, dtype)
+    return np.frombuffer(blob, dtype="<f2" if dtype == "e" else "<f4")
+
+
+def _node_params(node: Node, key: str | None, node_metadata: dict) -> tuple:
+    """Параметры _UPSERT_NODE_SQL.
+
+    ``metadata['embedding']`` хранится не в metadata_json, а в embedding_blob
+    (см. :func:`_encode_embedding`): компактнее JSON-текста и без парсинга
+    на чтении. ``metadata['pattern_type']`` INSIGHT-узла дублируется в
+    колонку pattern_type — ключ дедупликации инсайтов читается из индекса.
+    """
+    embedding = node_metadata.get("embedding")
+    blob = dtype = None
+    if isinstance(embedding, list) and embedding:
+        encoded = _encode_embedding(embedding)
+        if encoded is not None:
+            blob, dtype = encoded
+            node_metadata = {k: v for k, v in node_metadata.items() if k != "embedding"}
+    pattern_type = node_metadata.get("pattern_type") if node.type == "INSIGHT" else None
+    return (
+        node.id,
+        node.user_id,
+        node.type,
+        node.name,
+        node.text,
+        node.subtype,
+        key,
+        _dumps(node_metadata),
+        blob,
+        dtype,
+        pattern_type if isinstance(pattern_type, str) else None,
+        node.created_at,
+    )
+
+
+async def _lookup_node_identity(
+    conn: aiosqlite.Connection, node_id: str, user_id: str, node_type: str, key: str | None
+) -> aiosqlite.Row:
+    # Upsert ничего не изменил: строка совпала по key или по id.
+    if key:
+        cursor = await conn.execute(_NODE_IDENTITY_BY_KEY_SQL, (user_id, node_type, key))
+        row = await cursor.fetchone()
+        if row is not None:
+            return row
+    cursor = await conn.execute(_NODE_IDENTITY_BY_ID_SQL, (node_id,))
+    return await cursor.fetchone()
+
 
-        cursor = await conn.execute(query, params)
-        rows = await cursor.fetchall()
+class _LazyNodeMetadata(LazyJSONDict):
+    """metadata узла с embedding_blob: JSON и вектор декодируются при первом обращении."""
 
-        results: list[Node] = []
-        for row in rows:
-            node = _row_to_node(row)
-            salience = float(node.metadata.get("salience_score", 1.0))
-            if salience <= max_retention:
-                results.append(node)
-        return results
+    __slots__ = ("_blob", "_dtype")
+
+    def _materialize(self) -> None:
+        super()._materialize()
+        embedding = _decode_embedding(self._blob, self._dtype)
+        self._blob = None
+        dict.__setitem__(self, "embedding", embedding)
 
 
 def _row_to_node(row: aiosqlite.Row) -> Node:
-    return Node(
-        id=row["id"],
-        user_id=row["user_id"],
-        type=row["type"],
-        name=row["name"],
-        text=row["text"],
-        subtype=row["subtype"],
-        key=row["key"],
-        metadata=json.loads(row["metadata_json"]),
-        created_at=row["created_at"],
-    )
+    """Строка ``SELECT _NODE_COLUMNS`` → Node (позиционно, без поиска по именам)."""
+    (
+        node_id, user_id, node_type, name, text, subtype, key, metadata_json, created_at,
+        blob, dtype,
+    ) = row
+    if blob is None:
+        metadata = _loads_lazy(metadata_json)
+    else:
+        metadata = _LazyNodeMetadata.from_json(metadata_json)
+        metadata._blob = blob
+        metadata._dtype = dtype
+    # Позиционно, в порядке полей Node: вызов на каждую строку, а разбор
+    # именованных аргументов в __init__ dataclass почти вдвое дороже.
+    return Node(user_id, node_type, node_id, name, text, subtype, key, metadata, created_at)
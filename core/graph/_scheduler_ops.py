@@ -3,43 +3,139 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
+from typing import NamedTuple
 from uuid import uuid4
 
+from core.utils.json_codec import dumps as _dumps
+
+
+class UserStats(NamedTuple):
+    """Агрегаты по узлам пользователя (включая мягко удалённые)."""
+
+    last_activity_at: str
+    node_count: int
+
+
+# Оба запроса — проход по покрывающему idx_nodes_user_created.
+_ALL_USER_STATS_SQL = "SELECT user_id, MAX(created_at), COUNT(*) FROM nodes GROUP BY user_id"
+
+_USER_STATS_SQL = """
+SELECT user_id, MAX(created_at), COUNT(*) FROM nodes
+WHERE user_id IN (SELECT value FROM json_each(?))
+GROUP BY user_id
+"""
+
+# Меняется, когда коммитит любое *другое* соединение с базой (другой
+# GraphStorage, другой процесс); собственные коммиты писателя его не трогают.
+_DATA_VERSION_SQL = "PRAGMA data_version"
+
+_UPSERT_SCHEDULER_STATE_SQL = """
+INSERT INTO scheduler_state (user_id, last_proactive_at, last_checked_at, total_sent)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    last_proactive_at = COALESCE(excluded.last_proactive_at, last_proactive_at),
+    last_checked_at   = excluded.last_checked_at,
+    total_sent        = total_sent + excluded.total_sent
+"""
+
+_INSERT_SIGNAL_FEEDBACK_SQL = """
+INSERT INTO signal_feedback (
+    id, user_id, signal_type, signal_score, was_helpful, sent_at, feedback_at
+) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Читатели отдают кортежи (см. GraphStorage._open_conn): колонки перечислены
+# явно, dict собирается через zip.
+_SCHEDULER_STATE_COLUMNS = ("user_id", "last_proactive_at", "last_checked_at", "total_sent")
+
+_SCHEDULER_STATE_SQL = (
+    f"SELECT {', '.join(_SCHEDULER_STATE_COLUMNS)} FROM scheduler_state WHERE user_id = ?"
+)
+
+_SIGNAL_FEEDBACK_COLUMNS = (
+    "id",
+    "user_id",
+    "signal_type",
+    "signal_score",
+    "was_helpful",
+    "sent_at",
+    "feedback_at",
+)
+
+_SIGNAL_FEEDBACK_SQL = f"""
+SELECT {", ".join(_SIGNAL_FEEDBACK_COLUMNS)} FROM signal_feedback
+WHERE user_id = ?
+ORDER BY feedback_at DESC
+LIMIT ?
+"""
+
+_SIGNAL_FEEDBACK_BY_TYPE_SQL = f"""
+SELECT {", ".join(_SIGNAL_FEEDBACK_COLUMNS)} FROM signal_feedback
+WHERE user_id = ? AND signal_type = ?
+ORDER BY feedback_at DESC
+LIMIT ?
+"""
+
 
 class SchedulerOpsMixin:
     """Операции планировщика: scheduler_state, signal_feedback, user_ids, activity."""
 
+    async def _get_user_stats(self) -> dict[str, UserStats]:
+        """Кэш :class:`UserStats` по всем пользователям.
+
+        Планировщик опрашивает user_ids / last_activity / count_nodes по
+        каждому пользователю на каждом тике — вместо запроса на вызов кэш
+        грузится одним GROUP BY, а после записи узлов перечитываются только
+        затронутые пользователи (их помечает _write_conn после commit).
+
+        Записи мимо этого экземпляра (другие соединения и процессы) видны по
+        ``PRAGMA data_version`` писателя: если он сменился, кэш грузится
+        заново. Версия читается до загрузки, так что коммит, попавший между
+        ними, в худшем случае вызовет лишнюю перезагрузку, а не устаревший кэш.
+        """
+        conn = self._conn or await self._get_conn()
+        cursor = await conn.execute(_DATA_VERSION_SQL)
+        (version,) = await cursor.fetchone()
+        if version != self._user_stats_version:
+            self._user_stats = None
+            self._user_stats_version = version
+        stats = self._user_stats
+        if stats is None:
+            self._user_stats_stale.clear()  # полная загрузка покрывает и их
+            async with self._read_conn() as conn:
+                cursor = await conn.execute(_ALL_USER_STATS_SQL)
+                rows = await cursor.fetchall()
+            stats = self._user_stats = {
+                user_id: UserStats(last_activity_at, count)
+                for user_id, last_activity_at, count in rows
+            }
+        if self._user_stats_stale:
+            stale = list(self._user_stats_stale)
+            self._user_stats_stale.clear()
+            async with self._read_conn() as conn:
+                cursor = await conn.execute(_USER_STATS_SQL, (_dumps(stale),))
+                rows = await cursor.fetchall()
+            for user_id in stale:
+                stats.pop(user_id, None)
+            for user_id, last_activity_at, count in rows:
+                stats[user_id] = UserStats(last_activity_at, count)
+        return stats
+
     async def get_all_user_ids(self) -> list[str]:
         """Все уникальные user_id у которых есть узлы в графе."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT DISTINCT user_id FROM nodes ORDER BY user_id"
-        )
-        rows = await cursor.fetchall()
-        return [row[0] for row in rows]
+        return sorted(await self._get_user_stats())
 
     async def get_last_activity_at(self, user_id: str) -> str | None:
         """ISO datetime последнего созданного узла пользователя."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT MAX(created_at) FROM nodes WHERE user_id = ?",
-            (user_id,),
-        )
-        row = await cursor.fetchone()
-        return row[0] if row and row[0] else None
+        stats = (await self._get_user_stats()).get(user_id)
+        return stats.last_activity_at if stats and stats.last_activity_at else None
 
     async def get_scheduler_state(self, user_id: str) -> dict | None:
         """Состояние scheduler для пользователя."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT * FROM scheduler_state WHERE user_id = ?",
-            (user_id,),
-        )
-        row = await cursor.fetchone()
-        return dict(row) if row else None
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_SCHEDULER_STATE_SQL, (user_id,))
+            row = await cursor.fetchone()
+            return dict(zip(_SCHEDULER_STATE_COLUMNS, row, strict=True)) if row else None
 
     async def upsert_scheduler_state(
         self,
@@ -49,38 +145,19 @@ class SchedulerOpsMixin:
         increment_sent: bool = False,
     ) -> None:
         """Обновляет состояние scheduler. Создаёт запись если нет."""
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        now = datetime.now(timezone.utc).isoformat()
-
-        existing = await self.get_scheduler_state(user_id)
-        if existing is None:
+        # Одно выражение вместо чтения текущего состояния и INSERT/UPDATE:
+        # счётчик увеличивается в SQL, и внутри transaction() не нужно видеть
+        # ещё не закоммиченную строку.
+        async with self._write_conn() as conn:
             await conn.execute(
-                """
-                INSERT INTO scheduler_state
-                  (user_id, last_proactive_at, last_checked_at, total_sent)
-                VALUES (?, ?, ?, ?)
-                """,
+                _UPSERT_SCHEDULER_STATE_SQL,
                 (
                     user_id,
                     last_proactive_at,
-                    last_checked_at or now,
+                    last_checked_at or datetime.now(timezone.utc).isoformat(),
                     1 if increment_sent else 0,
                 ),
             )
-        else:
-            total = existing.get("total_sent", 0) + (1 if increment_sent else 0)
-            await conn.execute(
-                """
-                UPDATE scheduler_state
-                SET last_proactive_at = COALESCE(?, last_proactive_at),
-                    last_checked_at   = COALESCE(?, last_checked_at),
-                    total_sent        = ?
-                WHERE user_id = ?
-                """,
-                (last_proactive_at, last_checked_at or now, total, user_id),
-            )
-        await conn.commit()
 
     async def save_signal_feedback(
         self,
@@ -90,25 +167,19 @@ class SchedulerOpsMixin:
         was_helpful: bool,
         sent_at: str,
     ) -> None:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        await conn.execute(
-            """
-            INSERT INTO signal_feedback (
-                id, user_id, signal_type, signal_score, was_helpful, sent_at, feedback_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                str(uuid4()),
-                user_id,
-                signal_type,
-                float(signal_score),
-                1 if was_helpful else 0,
-                sent_at,
-                datetime.now(timezone.utc).isoformat(),
-            ),
-        )
-        await conn.commit()
+        async with self._write_conn() as conn:
+            await conn.execute(
+                _INSERT_SIGNAL_FEEDBACK_SQL,
+                (
+                    str(uuid4()),
+                    user_id,
+                    signal_type,
+                    float(signal_score),
+                    1 if was_helpful else 0,
+                    sent_at,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
 
     async def get_signal_feedback(
         self,
@@ -116,33 +187,17 @@ class SchedulerOpsMixin:
         signal_type: str | None = None,
         limit: int = 100,
     ) -> list[dict]:
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        if signal_type:
-            cursor = await conn.execute(
-                """
-                SELECT * FROM signal_feedback
-                WHERE user_id = ? AND signal_type = ?
-                ORDER BY feedback_at DESC
-                LIMIT ?
-                """,
-                (user_id, signal_type, limit),
-            )
-        else:
-            cursor = await conn.execute(
-                """
-                SELECT * FROM signal_feedback
-                WHERE user_id = ?
-                ORDER BY feedback_at DESC
-                LIMIT ?
-                """,
-                (user_id, limit),
-            )
-        rows = await cursor.fetchall()
-        return [
-            {
-                **dict(row),
-                "was_helpful": bool(row["was_helpful"]),
-            }
-            for row in rows
-        ]
+        async with self._read_conn() as conn:
+            if signal_type:
+                cursor = await conn.execute(
+                    _SIGNAL_FEEDBACK_BY_TYPE_SQL, (user_id, signal_type, limit)
+                )
+            else:
+                cursor = await conn.execute(_SIGNAL_FEEDBACK_SQL, (user_id, limit))
+            rows = await cursor.fetchall()
+        feedback = []
+        for row in rows:
+            item = dict(zip(_SIGNAL_FEEDBACK_COLUMNS, row, strict=True))
+            item["was_helpful"] = bool(item["was_helpful"])
+            feedback.append(item)
+        return feedback
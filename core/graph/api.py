@@ -3,15 +3,46 @@ from __future__ import annotations
 import logging
 import re
 import sqlite3
+from dataclasses import replace
 
 from core.graph.model import Edge, Node
 from core.graph.storage import GraphStorage
 
+_WS_RE = re.compile(r"\s+")
+
 
 def normalize_key(value: str) -> str:
-    normalized = value.strip().lower()
-    normalized = re.sub(r"\s+", " ", normalized)
-    return normalized
+    return _WS_RE.sub(" ", value.strip().lower())
+
+
+def _merge_node(base: Node, update: Node) -> Node:
+    """Merge *update* into *base*, keeping the identity of *base*.
+
+    Built with :func:`dataclasses.replace` so fields added to ``Node`` later
+    are carried over from *base* instead of silently reset to defaults.
+    """
+    return replace(
+        base,
+        type=update.type,
+        name=update.name or base.name,
+        text=update.text or base.text,
+        subtype=update.subtype or base.subtype,
+        key=update.key,
+        metadata=_merge_metadata(base.metadata, update.metadata),
+    )
+
+
+def _merge_metadata(base: dict, update: dict) -> dict:
+    """``{**base, **update}`` that skips the copy when either side is empty.
+
+    The result may alias an input dict; ``apply_changes`` copies metadata
+    before mutating it, so sharing is safe there.
+    """
+    if not update:
+        return base
+    if not base:
+        return update
+    return {**base, **update}
 
 
 class GraphAPI:
@@ -102,49 +133,45 @@ class GraphAPI:
 
     async def apply_changes(self, user_id: str, nodes: list[Node], edges: list[Edge]) -> tuple[list[Node], list[Edge]]:
         node_id_map: dict[str, str] = {}
-        nodes_data: list[tuple[str, Node, dict]] = []
+        nodes_data: list[tuple[list[str], Node, dict]] = []
 
+        # Extractors often emit the same entity several times per message:
+        # collapse in-batch duplicates by (type, normalized key) first so each
+        # key is looked up and upserted once.
+        groups: list[tuple[list[str], Node]] = []
+        group_index: dict[tuple[str, str], int] = {}
         for node in nodes:
             if node.user_id != user_id:
                 continue
 
-            original_id = node.id
-
             if node.key:
-                node = Node(
-                    id=node.id,
-                    user_id=node.user_id,
-                    type=node.type,
-                    name=node.name,
-                    text=node.text,
-                    subtype=node.subtype,
-                    key=normalize_key(node.key),
-                    metadata=node.metadata,
-                    created_at=node.created_at,
-                )
-
+                node = replace(node, key=normalize_key(node.key))
+                by_key = (node.type, node.key)
+                index = group_index.get(by_key)
+                if index is not None:
+                    original_ids, previous = groups[index]
+                    original_ids.append(node.id)
+                    groups[index] = (original_ids, _merge_node(previous, node))
+                    continue
+                group_index[by_key] = len(groups)
+
+            groups.append(([node.id], node))
+
+        # One lookup for every keyed node instead of a find_by_key per group.
+        existing_by_key = await self.storage.find_by_keys(
+            user_id, [(node.type, node.key) for _, node in groups if node.key]
+        )
+        for original_ids, node in groups:
             if node.key:
-                existing = await self.storage.find_by_key(user_id, node.type, node.key)
+                existing = existing_by_key.get((node.type, node.key))
                 if existing:
-                    node = Node(
-                        id=existing.id,
-                        user_id=user_id,
-                        type=node.type,
-                        name=node.name or existing.name,
-                        text=node.text or existing.text,
-                        subtype=node.subtype or existing.subtype,
-                        key=node.key,
-                        metadata={**existing.metadata, **node.metadata},
-                        created_at=existing.created_at,
-                    )
+                    node = _merge_node(existing, node)
 
             node_metadata = dict(node.metadata)
             if node.type == "EMOTION" and "created_at" not in node_metadata:
-                from datetime import datetime, timezone
+                node_metadata["created_at"] = node.created_at
 
-                node_metadata["created_at"] = datetime.now(timezone.utc).isoformat()
-
-            nodes_data.append((original_id, node, node_metadata))
+            nodes_data.append((original_ids, node, node_metadata))
 
         saved_nodes = (
             await self.storage.upsert_nodes_batch([(node, metadata) for _, node, metadata in nodes_data])
@@ -153,30 +180,57 @@ class GraphAPI:
         )
 
         created_nodes_by_id: dict[str, Node] = {}
-        for (original_id, _, _), saved in zip(nodes_data, saved_nodes):
-            node_id_map[original_id] = saved.id
+        for (original_ids, _, _), saved in zip(nodes_data, saved_nodes, strict=True):
+            for original_id in original_ids:
+                node_id_map[original_id] = saved.id
             node_id_map[saved.id] = saved.id
             created_nodes_by_id[saved.id] = saved
 
         created_nodes = list(created_nodes_by_id.values())
 
+        pending_edges = [
+            Edge(
+                user_id=user_id,
+                source_node_id=node_id_map.get(edge.source_node_id, edge.source_node_id),
+                target_node_id=node_id_map.get(edge.target_node_id, edge.target_node_id),
+                relation=edge.relation,
+                metadata=edge.metadata or {},
+            )
+            for edge in edges
+            if edge.user_id == user_id
+        ]
+        created_edges = await self.create_edges(pending_edges)
+
+        return created_nodes, created_edges
+
+    async def create_edges(self, edges: list[Edge]) -> list[Edge]:
+        """Batch :meth:`create_edge`: all *edges* in one storage transaction.
+
+        Duplicates resolve to the stored edge. Edges that fail are logged
+        and skipped, as in :meth:`create_edge`.
+        """
+        if not edges:
+            return []
+        try:
+            return await self.storage.add_edges(edges)
+        except sqlite3.Error as exc:
+            # The batch rolled back as a whole; retry edge by edge so one bad
+            # edge does not drop the rest (create_edge logs and skips it).
+            logging.getLogger(__name__).warning(
+                "add_edges batch failed, falling back to per-edge inserts: %s", exc
+            )
         created_edges: list[Edge] = []
         for edge in edges:
-            if edge.user_id != user_id:
-                continue
-            source_id = node_id_map.get(edge.source_node_id, edge.source_node_id)
-            target_id = node_id_map.get(edge.target_node_id, edge.target_node_id)
             saved = await self.create_edge(
-                user_id=user_id,
-                source_node_id=source_id,
-                target_node_id=target_id,
+                user_id=edge.user_id,
+                source_node_id=edge.source_node_id,
+                target_node_id=edge.target_node_id,
                 relation=edge.relation,
                 metadata=edge.metadata,
             )
             if saved:
                 created_edges.append(saved)
-
-        return created_nodes, created_edges
+        return created_edges
 
     async def get_user_nodes_by_type(self, user_id: str, node_type: str) -> list[Node]:
         return await self.storage.find_nodes(user_id=user_id, node_type=node_type)
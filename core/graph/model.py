@@ -3,7 +3,9 @@ from __future__ import annotations
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from functools import lru_cache
 import math
+import time
 from typing import Any, Literal
 from uuid import uuid4
 
@@ -70,9 +72,9 @@ class Node:
 def get_node_embedding(node: Node) -> list[float] | None:
     """Return node embedding from metadata for backward-compatible readers.
 
-    Embeddings are no longer persisted in dedicated SQLite columns; Qdrant is the
-    primary vector store. Some analytical modules may still provide temporary
-    in-memory vectors via ``node.metadata['embedding']``.
+    SQLite storage keeps the vector in ``nodes.embedding_blob`` and exposes it
+    as ``node.metadata['embedding']`` on first access; analytical modules may
+    also provide temporary in-memory vectors there.
     """
     raw = node.metadata.get("embedding")
     if isinstance(raw, list) and raw and all(isinstance(v, (int, float)) for v in raw):
@@ -98,6 +100,8 @@ _METADATA_DEFAULTS: dict[str, Any] = {
     "abstraction_level": 0,
 }
 
+_LN2 = math.log(2)
+
 
 def ensure_metadata_defaults(metadata: dict[str, Any]) -> dict[str, Any]:
     """Return *metadata* with Sprint-0 default fields filled in.
@@ -109,6 +113,17 @@ def ensure_metadata_defaults(metadata: dict[str, Any]) -> dict[str, Any]:
     return metadata
 
 
+def metadata_with_defaults(metadata: dict[str, Any]) -> dict[str, Any]:
+    """Non-mutating :func:`ensure_metadata_defaults`.
+
+    Returns *metadata* itself when every default key is already present
+    (the usual case for re-upserted nodes), otherwise a filled-in copy.
+    """
+    if _METADATA_DEFAULTS.keys() <= metadata.keys():
+        return metadata
+    return ensure_metadata_defaults(dict(metadata))
+
+
 def edge_weight(edge: Edge, half_life_days: float = 30.0) -> float:
     """
     Temporal decay weight. Свежие рёбра весят больше.
@@ -117,17 +132,10 @@ def edge_weight(edge: Edge, half_life_days: float = 30.0) -> float:
     """
     if half_life_days <= 0:
         return 1.0
-    try:
-        created = datetime.fromisoformat(edge.created_at.replace("Z", "+00:00"))
-    except (ValueError, TypeError) as exc:
-        logger.warning("temporal_decay_weight date parse failed: %s", exc)
+    days_elapsed = _days_since(edge.created_at)
+    if days_elapsed is None:
         return 1.0
-    if created.tzinfo is None:
-        created = created.replace(tzinfo=timezone.utc)
-    now = datetime.now(timezone.utc)
-    days_elapsed = max((now - created).total_seconds() / 86400.0, 0.0)
-    decay_lambda = math.log(2) / half_life_days
-    value = math.exp(-decay_lambda * days_elapsed)
+    value = math.exp(-_LN2 / half_life_days * days_elapsed)
     # NOTE: added temporal decay weight function.
     return max(0.0, min(1.0, value))
 
@@ -157,17 +165,44 @@ def ebbinghaus_retention(
     float
         Retention probability in [0, 1].
     """
-    # Each review roughly doubles the stability (simplified model)
+    # Each review roughly doubles the stability (simplified model);
+    # stability is always positive, so no half-life guard is needed here.
     stability_days = 30.0 * (2 ** review_count)
     if last_review_days > 0:
         # Use last-review time rather than creation time
-        decay_lambda = math.log(2) / stability_days
-        value = math.exp(-decay_lambda * last_review_days)
+        days = last_review_days
     else:
-        value = edge_weight(edge, half_life_days=stability_days)
+        days = _days_since(edge.created_at)
+        if days is None:
+            return 1.0
+    value = math.exp(-_LN2 * days / stability_days)
     return max(0.0, min(1.0, value))
 
 
+@lru_cache(maxsize=4096)
+def _iso_to_timestamp(value: str) -> float | None:
+    """Parse an ISO-8601 timestamp to POSIX seconds (naive → UTC), memoised.
+
+    Edge timestamps never change, so forgetting-curve scans over many edges
+    parse each distinct ``created_at`` only once.
+    """
+    try:
+        created = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (ValueError, TypeError) as exc:
+        logger.warning("temporal_decay_weight date parse failed: %s", exc)
+        return None
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return created.timestamp()
+
+
+def _days_since(iso_timestamp: str) -> float | None:
+    created_ts = _iso_to_timestamp(iso_timestamp)
+    if created_ts is None:
+        return None
+    return max((time.time() - created_ts) / 86400.0, 0.0)
+
+
 def spaced_repetition_score(
     review_count: int,
     quality: int,
@@ -204,11 +239,22 @@ def spaced_repetition_score(
         elif new_review_count == 2:
             interval = 6
         else:
-            # Use previous interval (approximated via EF^(n-2) progression)
-            prev_interval = max(1, round(6 * easiness_factor ** (new_review_count - 2)))
-            interval = round(prev_interval * easiness_factor)
+            interval = _sm2_interval(new_review_count, easiness_factor)
 
     new_ef = easiness_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
     new_ef = max(1.3, new_ef)
 
     return interval, new_ef, new_review_count
+
+
+@lru_cache(maxsize=512)
+def _sm2_interval(review_count: int, easiness_factor: float) -> int:
+    """SM-2 interval for ``review_count >= 3``, memoised.
+
+    Easiness factors evolve by a handful of fixed deltas, so the set of
+    distinct ``(review_count, easiness_factor)`` pairs seen by the scheduler
+    is small and caching on the exact values keeps results bit-identical.
+    """
+    # Use previous interval (approximated via EF^(n-2) progression)
+    prev_interval = max(1, round(6 * easiness_factor ** (review_count - 2)))
+    return round(prev_interval * easiness_factor)
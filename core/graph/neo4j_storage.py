@@ -21,17 +21,325 @@ See FRONTIER_VISION_REPORT §2 and §6 — *Semantic Memory layer*.
 
 from __future__ import annotations
 
-import json
+import asyncio
+import copy
 import logging
-from typing import Any
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import replace
+from typing import Any, TypeVar
 
-from core.graph.model import Edge, Node, ensure_metadata_defaults
+from core.graph.model import Edge, Node, metadata_with_defaults
+from core.utils import json_codec
 
 logger = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 # Node types that belong in semantic (long-term) memory.
 SEMANTIC_NODE_TYPES: frozenset[str] = frozenset({"BELIEF", "NEED", "VALUE", "PART"})
 
+# Metadata is stored as native properties: scalar values (and homogeneous
+# scalar lists such as embeddings) become ``meta_<key>`` properties, anything
+# else is kept as JSON in ``metadata_extra``.
+META_PREFIX = "meta_"
+
+# Node properties outside the metadata.  An upsert resets the node to these
+# before applying the new ``meta_*`` set, so metadata keys the caller dropped
+# (and the legacy JSON ``metadata`` string) do not linger on the node.
+_NODE_BASE_PROJECTION = (
+    "n {.id, .user_id, .type, .name, .text, .subtype, .key, .created_at, .is_deleted, ._new}"
+)
+
+# Cypher text is constant per operation (optional filters are bound to null
+# rather than spliced in), so repeated calls hit Neo4j's query plan cache.
+_UPSERT_NODE_BODY = """
+MERGE (n:SemanticNode {id: $id})
+ON CREATE SET
+    n.user_id    = $user_id,
+    n.type       = $type,
+    n.name       = $name,
+    n.text       = $text,
+    n.subtype    = $subtype,
+    n.key        = $key,
+    n.created_at = $created_at,
+    n.is_deleted = 0,
+    n._new       = true
+ON MATCH SET
+    n.name       = COALESCE($name, n.name),
+    n.text       = COALESCE($text, n.text),
+    n.subtype    = COALESCE($subtype, n.subtype)
+SET n = """ + _NODE_BASE_PROJECTION + """
+SET n += $meta_props, n.metadata_extra = $metadata_extra
+WITH n, coalesce(n._new, false) AS created
+REMOVE n._new
+FOREACH (_ IN CASE WHEN created THEN [1] ELSE [] END |
+    MERGE (u:UserStats {user_id: $user_id})
+    ON CREATE SET u.node_count = 1
+    ON MATCH SET u.node_count = u.node_count + 1
+)
+"""
+
+# Only the server-resolved scalars come back; metadata (and embeddings)
+# are known to the caller and would dominate the Bolt payload.
+_Q_UPSERT_NODE = _UPSERT_NODE_BODY + """\
+RETURN n.id AS id, n.created_at AS created_at,
+       n.name AS name, n.text AS text, n.subtype AS subtype
+"""
+
+_Q_UPSERT_NODE_NO_RETURN = _UPSERT_NODE_BODY
+
+_Q_GET_NODE = "MATCH (n:SemanticNode {id: $id}) RETURN n"
+
+_Q_FIND_NODES = """
+MATCH (n:SemanticNode)
+WHERE n.user_id = $user_id
+  AND n.created_at >= ''
+  AND ($node_type IS NULL OR n.type = $node_type)
+  AND ($name IS NULL OR n.name = $name)
+  AND coalesce(n.is_deleted, 0) = 0
+RETURN n
+ORDER BY n.created_at
+LIMIT $limit
+"""
+
+_Q_FIND_BY_KEY = """
+MATCH (n:SemanticNode {user_id: $user_id, type: $type, key: $key})
+RETURN n
+"""
+
+_Q_SOFT_DELETE_NODE = """
+MATCH (n:SemanticNode {id: $id})
+WHERE coalesce(n.is_deleted, 0) = 0
+SET n.is_deleted = 1
+WITH n
+MATCH (u:UserStats {user_id: n.user_id})
+SET u.node_count = u.node_count - 1
+"""
+
+_Q_ADD_EDGE = """
+MATCH (a:SemanticNode {id: $source_id})
+MATCH (b:SemanticNode {id: $target_id})
+MERGE (a)-[r:RELATES {
+    user_id: $user_id,
+    relation: $relation
+}]->(b)
+ON CREATE SET
+    r.id          = $id,
+    r.created_at  = $created_at,
+    r.metadata_extra = $metadata_extra,
+    r += $meta_props
+RETURN r
+"""
+
+# Re-point every relationship of the sources onto the target, drop what is
+# left on the sources, soft-delete them and clear target self-loops — one
+# round-trip.  MERGE keeps (user_id, relation) unique per node pair.
+_Q_MERGE_NODES = """
+UNWIND $source_ids AS sid
+CALL {
+    WITH sid
+    MATCH (s:SemanticNode {id: sid})-[r:RELATES]->(b:SemanticNode)
+    WHERE b.id <> $target_id
+    MATCH (t:SemanticNode {id: $target_id})
+    MERGE (t)-[r2:RELATES {user_id: r.user_id, relation: r.relation}]->(b)
+    ON CREATE SET r2 = properties(r)
+    DELETE r
+}
+CALL {
+    WITH sid
+    MATCH (a:SemanticNode)-[r:RELATES]->(s:SemanticNode {id: sid})
+    WHERE a.id <> $target_id
+    MATCH (t:SemanticNode {id: $target_id})
+    MERGE (a)-[r2:RELATES {user_id: r.user_id, relation: r.relation}]->(t)
+    ON CREATE SET r2 = properties(r)
+    DELETE r
+}
+CALL {
+    WITH sid
+    MATCH (:SemanticNode {id: sid})-[r:RELATES]-()
+    DELETE r
+}
+CALL {
+    WITH sid
+    MATCH (n:SemanticNode {id: sid})
+    WHERE coalesce(n.is_deleted, 0) = 0
+    SET n.is_deleted = 1
+    WITH n
+    MATCH (u:UserStats {user_id: n.user_id})
+    SET u.node_count = u.node_count - 1
+}
+WITH count(*) AS merged
+CALL {
+    MATCH (t:SemanticNode {id: $target_id})-[r:RELATES]->(t)
+    DELETE r
+}
+RETURN merged
+"""
+
+_Q_LIST_EDGES = """
+MATCH (a:SemanticNode)-[r:RELATES {user_id: $user_id}]->(b:SemanticNode)
+WHERE $endpoint_ids IS NULL
+   OR (a.id IN $endpoint_ids AND b.id IN $endpoint_ids)
+RETURN r, a.id AS source_id, b.id AS target_id
+ORDER BY r.created_at
+"""
+
+_Q_EDGES_FROM_NODE = """
+MATCH (a:SemanticNode {id: $source_id})-[r:RELATES {user_id: $user_id}]->(b:SemanticNode)
+RETURN r, a.id AS source_id, b.id AS target_id
+"""
+
+_Q_EDGES_TO_NODE = """
+MATCH (a:SemanticNode)-[r:RELATES {user_id: $user_id}]->(b:SemanticNode {id: $target_id})
+RETURN r, a.id AS source_id, b.id AS target_id
+"""
+
+# Upper hop bound of find_paths; must be a literal in the pattern.
+MAX_PATH_DEPTH = 5
+
+_Q_FIND_PATHS = """
+MATCH path = allShortestPaths(
+    (a:SemanticNode {id: $start_id})-[:RELATES*1..5]->(b:SemanticNode {id: $end_id})
+)
+WHERE ALL(n IN nodes(path) WHERE n.user_id = $user_id)
+  AND length(path) <= $max_depth
+RETURN [n IN nodes(path) | n.id] AS node_ids
+"""
+
+_Q_NEIGHBORHOOD = """
+MATCH (start:SemanticNode {id: $node_id, user_id: $user_id})
+CALL apoc.path.subgraphNodes(start, {maxLevel: $depth})
+YIELD node
+WHERE node.user_id = $user_id
+  AND (node.is_deleted IS NULL OR node.is_deleted = 0)
+RETURN node AS n
+"""
+
+# Live-node counts are kept on one :UserStats node per user, maintained by
+# the write paths, so count_nodes is a single-node lookup.
+_Q_COUNT_NODES = """
+OPTIONAL MATCH (u:UserStats {user_id: $user_id})
+RETURN coalesce(u.node_count, 0) AS cnt
+"""
+
+_Q_DELETE_USER_DATA = """
+MATCH (n:SemanticNode {user_id: $user_id})
+DETACH DELETE n
+WITH count(n) AS cnt
+OPTIONAL MATCH (u:UserStats {user_id: $user_id})
+DELETE u
+RETURN cnt
+"""
+
+# One-time backfill of :UserStats for data written before it existed.
+_Q_BACKFILL_USER_STATS = """
+OPTIONAL MATCH (s:UserStats)
+WITH count(s) AS existing
+WHERE existing = 0
+MATCH (n:SemanticNode)
+WHERE coalesce(n.is_deleted, 0) = 0
+WITH n.user_id AS uid, count(n) AS live
+MERGE (u:UserStats {user_id: uid})
+ON CREATE SET u.node_count = live
+"""
+
+_SCHEMA_STATEMENTS: tuple[str, ...] = (
+    # Unique constraint on (user_id, node_type, key) for keyed nodes
+    "CREATE CONSTRAINT IF NOT EXISTS "
+    "FOR (n:SemanticNode) REQUIRE (n.user_id, n.type, n.key) IS UNIQUE",
+    # Index for fast user lookups
+    "CREATE INDEX IF NOT EXISTS FOR (n:SemanticNode) ON (n.user_id, n.type)",
+    # Unique id; the constraint's backing index serves MERGE on id
+    "CREATE CONSTRAINT semantic_node_id_unique IF NOT EXISTS "
+    "FOR (n:SemanticNode) REQUIRE n.id IS UNIQUE",
+    # Index-backed ORDER BY created_at for find_nodes
+    "CREATE INDEX IF NOT EXISTS FOR (n:SemanticNode) ON (n.user_id, n.created_at)",
+    # Name equality / STARTS WITH lookups
+    "CREATE TEXT INDEX IF NOT EXISTS FOR (n:SemanticNode) ON (n.name)",
+    # One stats node per user
+    "CREATE CONSTRAINT user_stats_user_id IF NOT EXISTS "
+    "FOR (u:UserStats) REQUIRE u.user_id IS UNIQUE",
+)
+
+# ANN index over metadata['embedding'] (stored as ``meta_embedding``).
+VECTOR_INDEX_NAME = "semantic_embedding"
+
+# The vector index is global, so candidates are over-fetched before the
+# per-user filter to still fill top_k.
+VECTOR_OVERSAMPLE = 10
+
+_Q_CREATE_VECTOR_INDEX = (
+    "CREATE VECTOR INDEX " + VECTOR_INDEX_NAME + " IF NOT EXISTS "
+    "FOR (n:SemanticNode) ON (n." + META_PREFIX + "embedding) "
+    "OPTIONS {indexConfig: {`vector.dimensions`: %d, "
+    "`vector.similarity_function`: 'cosine'}}"
+)
+
+_Q_VECTOR_SEARCH = """
+CALL db.index.vector.queryNodes($index_name, $candidates, $embedding)
+YIELD node, score
+WHERE node.user_id = $user_id AND coalesce(node.is_deleted, 0) = 0
+RETURN node AS n, score
+ORDER BY score DESC
+LIMIT $top_k
+"""
+
+_Q_LEGACY_ID_INDEXES = """
+SHOW INDEXES YIELD name, labelsOrTypes, properties, owningConstraint
+WHERE labelsOrTypes = ['SemanticNode'] AND properties = ['id']
+  AND owningConstraint IS NULL
+RETURN name
+"""
+
+# find_by_key cache: keyed semantic nodes are looked up repeatedly by the
+# consolidator and rarely change; writes through this instance invalidate.
+KEY_CACHE_TTL = 60.0
+KEY_CACHE_SIZE = 4096
+
+# Rows per UNWIND statement in the bulk write paths.
+BULK_BATCH_SIZE = 1000
+
+_Q_BULK_UPSERT_NODES = """
+UNWIND $rows AS r
+MERGE (n:SemanticNode {id: r.id})
+ON CREATE SET
+    n.user_id    = r.user_id,
+    n.type       = r.type,
+    n.name       = r.name,
+    n.text       = r.text,
+    n.subtype    = r.subtype,
+    n.key        = r.key,
+    n.created_at = r.created_at,
+    n.is_deleted = 0,
+    n._new       = true
+ON MATCH SET
+    n.name       = COALESCE(r.name, n.name),
+    n.text       = COALESCE(r.text, n.text),
+    n.subtype    = COALESCE(r.subtype, n.subtype)
+SET n = """ + _NODE_BASE_PROJECTION + """
+SET n += r.meta_props, n.metadata_extra = r.metadata_extra
+WITH n, coalesce(n._new, false) AS created
+REMOVE n._new
+WITH n.user_id AS uid, count(CASE WHEN created THEN 1 END) AS new_nodes
+WHERE new_nodes > 0
+MERGE (u:UserStats {user_id: uid})
+ON CREATE SET u.node_count = new_nodes
+ON MATCH SET u.node_count = u.node_count + new_nodes
+"""
+
+_Q_BULK_ADD_EDGES = """
+UNWIND $rows AS e
+MATCH (a:SemanticNode {id: e.source_id})
+MATCH (b:SemanticNode {id: e.target_id})
+MERGE (a)-[r:RELATES {user_id: e.user_id, relation: e.relation}]->(b)
+ON CREATE SET
+    r.id         = e.id,
+    r.created_at = e.created_at,
+    r.metadata_extra = e.metadata_extra,
+    r += e.meta_props
+"""
+
 
 class Neo4jStorage:
     """Neo4j graph storage backend for long-term semantic memory.
@@ -46,6 +354,15 @@ class Neo4jStorage:
         Neo4j password.
     database:
         Neo4j database name.
+    max_connection_pool_size:
+        Bolt connections kept by the driver pool.  Each call borrows one
+        for the length of a single managed transaction.
+    connection_acquisition_timeout:
+        Seconds to wait for a free pooled connection.
+    vector_dimensions:
+        Length of ``metadata['embedding']`` vectors.  When set, a cosine
+        vector index (Neo4j 5.11+) is created over them and
+        :meth:`vector_search` is available.
     """
 
     def __init__(
@@ -54,6 +371,9 @@ class Neo4jStorage:
         user: str = "neo4j",
         password: str = "password",
         database: str = "neo4j",
+        max_connection_pool_size: int = 100,
+        connection_acquisition_timeout: float = 30.0,
+        vector_dimensions: int | None = None,
     ) -> None:
         try:
             from neo4j import AsyncGraphDatabase  # type: ignore[import-untyped]
@@ -63,9 +383,25 @@ class Neo4jStorage:
                 "Install it with: pip install neo4j"
             ) from exc
 
-        self._driver = AsyncGraphDatabase.driver(uri, auth=(user, password))
+        self._driver = AsyncGraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_connection_pool_size,
+            connection_acquisition_timeout=connection_acquisition_timeout,
+        )
         self._database = database
-        self._initialized = False
+        self._vector_dimensions = vector_dimensions
+        # Set once the schema exists; hot paths test it inline instead of
+        # awaiting _ensure_initialized on every call.
+        self._ready = asyncio.Event()
+        self._init_lock = asyncio.Lock()
+        # (user_id, type, key) -> (node, monotonic timestamp); hits only.
+        self._key_cache: dict[tuple[str, str, str], tuple[Node, float]] = {}
+        # Bumped per key by writes (and _key_epoch for writes that cannot
+        # name their keys), so a lookup racing a write does not store what
+        # it read before the write.
+        self._key_generation: dict[tuple[str, str, str], int] = {}
+        self._key_epoch = 0
 
     async def close(self) -> None:
         """Close the Neo4j driver connection."""
@@ -73,22 +409,69 @@ class Neo4jStorage:
 
     async def _ensure_initialized(self) -> None:
         """Create constraints and indexes on first use."""
-        if self._initialized:
-            return
+        async with self._init_lock:
+            if self._ready.is_set():
+                return
+            await self._create_schema()
+            self._ready.set()
+
+    async def _create_schema(self) -> None:
+        """Run the constraint and index DDL (idempotent)."""
         async with self._driver.session(database=self._database) as session:
-            # Unique constraint on (user_id, node_type, key) for keyed nodes
-            await session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS "
-                "FOR (n:SemanticNode) REQUIRE (n.user_id, n.type, n.key) IS UNIQUE"
-            )
-            # Index for fast user lookups
-            await session.run(
-                "CREATE INDEX IF NOT EXISTS FOR (n:SemanticNode) ON (n.user_id, n.type)"
-            )
-            await session.run(
-                "CREATE INDEX IF NOT EXISTS FOR (n:SemanticNode) ON (n.id)"
-            )
-        self._initialized = True
+            # A plain (n.id) index from older deployments blocks the id
+            # constraint, whose backing index replaces it.
+            legacy = await session.execute_read(_fetch_all, _Q_LEGACY_ID_INDEXES, {})
+            for record in legacy:
+                await session.run(f"DROP INDEX `{record['name']}` IF EXISTS")
+            await session.execute_write(_run_schema)
+            await session.execute_write(_fetch_all, _Q_BACKFILL_USER_STATS, {})
+            if self._vector_dimensions:
+                try:
+                    result = await session.run(
+                        _Q_CREATE_VECTOR_INDEX % int(self._vector_dimensions)
+                    )
+                    await result.consume()
+                except Exception as exc:
+                    # Older servers lack vector indexes; the rest still works.
+                    logger.warning("Neo4jStorage: vector index not created: %s", exc)
+
+    async def _read(self, query: str, **params: Any) -> list[Any]:
+        """Run *query* in a managed read transaction and return its records.
+
+        An ``AsyncSession`` must not be shared between concurrent coroutines,
+        so each call opens a short-lived one over the driver's connection
+        pool; managed transactions also retry transient cluster errors.
+        """
+        async with self._driver.session(database=self._database) as session:
+            return await session.execute_read(_fetch_all, query, params)
+
+    async def _read_as(
+        self, convert: Callable[[Any], _T], query: str, **params: Any
+    ) -> list[_T]:
+        """:meth:`_read` that maps each record through *convert* as it arrives."""
+        async with self._driver.session(database=self._database) as session:
+            return await session.execute_read(_fetch_all, query, params, convert)
+
+    async def _write(self, query: str, **params: Any) -> list[Any]:
+        """Run *query* in a managed write transaction and return its records."""
+        async with self._driver.session(database=self._database) as session:
+            return await session.execute_write(_fetch_all, query, params)
+
+    async def _write_batches(self, query: str, rows: list[dict[str, Any]]) -> list[Any]:
+        """Run an ``UNWIND $rows`` *query* per :data:`BULK_BATCH_SIZE` chunk.
+
+        Each chunk is its own managed write transaction on one session.
+        Returns the summary counters of every chunk.
+        """
+        counters = []
+        async with self._driver.session(database=self._database) as session:
+            for start in range(0, len(rows), BULK_BATCH_SIZE):
+                counters.append(
+                    await session.execute_write(
+                        _run_unwind, query, rows[start : start + BULK_BATCH_SIZE]
+                    )
+                )
+        return counters
 
     # ── Node operations ──────────────────────────────────────────
 
@@ -97,54 +480,59 @@ class Neo4jStorage:
 
         Only nodes whose ``type`` is in :data:`SEMANTIC_NODE_TYPES` should
         be stored here.  The caller is responsible for routing.
+
+        The returned node is rebuilt from *node* plus the scalar fields the
+        server resolved (id, created_at, merged name/text/subtype); the
+        metadata is not echoed back over the wire.
         """
-        await self._ensure_initialized()
-        node_metadata = ensure_metadata_defaults(dict(node.metadata))
+        metadata = metadata_with_defaults(node.metadata)
+        records = await self._upsert(node, metadata, _Q_UPSERT_NODE)
+        if not records:
+            return node
+        record = records[0]
+        return replace(
+            node,
+            id=record["id"],
+            created_at=record["created_at"],
+            name=record["name"],
+            text=record["text"],
+            subtype=record["subtype"],
+            metadata=metadata,
+        )
 
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MERGE (n:SemanticNode {id: $id})
-                ON CREATE SET
-                    n.user_id    = $user_id,
-                    n.type       = $type,
-                    n.name       = $name,
-                    n.text       = $text,
-                    n.subtype    = $subtype,
-                    n.key        = $key,
-                    n.metadata   = $metadata_json,
-                    n.created_at = $created_at,
-                    n.is_deleted = 0
-                ON MATCH SET
-                    n.name       = COALESCE($name, n.name),
-                    n.text       = COALESCE($text, n.text),
-                    n.subtype    = COALESCE($subtype, n.subtype),
-                    n.metadata   = $metadata_json
-                RETURN n
-                """,
-                id=node.id,
-                user_id=node.user_id,
-                type=node.type,
-                name=node.name,
-                text=node.text,
-                subtype=node.subtype,
-                key=node.key,
-                metadata_json=json.dumps(node_metadata, ensure_ascii=False),
-                created_at=node.created_at,
-            )
-            record = await result.single()
+    async def upsert_node_no_return(self, node: Node) -> None:
+        """:meth:`upsert_node` for callers that discard the result."""
+        await self._upsert(node, metadata_with_defaults(node.metadata), _Q_UPSERT_NODE_NO_RETURN)
 
-        return _record_to_node(record["n"]) if record else node
+    async def _upsert(self, node: Node, metadata: dict[str, Any], query: str) -> list[Any]:
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        meta_props, metadata_extra = _metadata_to_props(metadata)
+        records = await self._write(
+            query,
+            id=node.id,
+            user_id=node.user_id,
+            type=node.type,
+            name=node.name,
+            text=node.text,
+            subtype=node.subtype,
+            key=node.key,
+            meta_props=meta_props,
+            metadata_extra=metadata_extra,
+            created_at=node.created_at,
+        )
+        self._invalidate_key(node)
+        return records
 
     async def get_node(self, node_id: str) -> Node:
         """Retrieve a single node by id."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                "MATCH (n:SemanticNode {id: $id}) RETURN n",
-                id=node_id,
-            )
-            record = await result.single()
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        records = await self._read(
+            _Q_GET_NODE,
+            id=node_id,
+        )
+        record = records[0] if records else None
         if record is None:
             raise KeyError(f"Node not found: {node_id}")
         return _record_to_node(record["n"])
@@ -157,145 +545,252 @@ class Neo4jStorage:
         limit: int = 500,
     ) -> list[Node]:
         """Find non-deleted nodes for a user, optionally filtered by type/name."""
-        await self._ensure_initialized()
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        return await self._read_as(
+            _node_of,
+            _Q_FIND_NODES,
+            user_id=user_id,
+            node_type=node_type or None,
+            name=name or None,
+            limit=limit,
+        )
 
-        clauses = ["n.user_id = $user_id", "(n.is_deleted IS NULL OR n.is_deleted = 0)"]
-        params: dict[str, Any] = {"user_id": user_id, "limit": limit}
-
-        if node_type:
-            clauses.append("n.type = $node_type")
-            params["node_type"] = node_type
-        if name:
-            clauses.append("n.name = $name")
-            params["name"] = name
-
-        where = " AND ".join(clauses)
-        query = f"MATCH (n:SemanticNode) WHERE {where} RETURN n ORDER BY n.created_at LIMIT $limit"
+    async def iter_nodes(
+        self,
+        user_id: str,
+        node_type: str | None = None,
+        name: str | None = None,
+        limit: int = 500,
+    ) -> AsyncIterator[Node]:
+        """Stream the nodes :meth:`find_nodes` returns, in ``created_at`` order.
 
+        Records are converted as they arrive over Bolt, so single-pass
+        consumers do not hold the whole result.
+        """
+        if not self._ready.is_set():
+            await self._ensure_initialized()
         async with self._driver.session(database=self._database) as session:
-            result = await session.run(query, **params)
-            records = await result.data()
-
-        return [_record_to_node(r["n"]) for r in records]
+            result = await session.run(
+                _Q_FIND_NODES,
+                user_id=user_id,
+                node_type=node_type or None,
+                name=name or None,
+                limit=limit,
+            )
+            async for record in result:
+                yield _node_of(record)
 
     async def find_by_key(
         self, user_id: str, node_type: str, key: str
     ) -> Node | None:
-        """Find a node by its unique (user_id, type, key) triple."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (n:SemanticNode {user_id: $user_id, type: $type, key: $key})
-                RETURN n
-                """,
-                user_id=user_id,
-                type=node_type,
-                key=key,
-            )
-            record = await result.single()
-        return _record_to_node(record["n"]) if record else None
+        """Find a node by its unique (user_id, type, key) triple.
+
+        Hits are cached for :data:`KEY_CACHE_TTL` seconds and handed out as
+        copies; writes made through this instance invalidate them.  Misses
+        are not cached, so a node created elsewhere is found on the next call.
+        """
+        cache_key = (user_id, node_type, key)
+        cached = self._key_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[1] < KEY_CACHE_TTL:
+            return _copy_node(cached[0])
+
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        generation = (self._key_epoch, self._key_generation.get(cache_key, 0))
+        records = await self._read(
+            _Q_FIND_BY_KEY,
+            user_id=user_id,
+            type=node_type,
+            key=key,
+        )
+        if not records:
+            return None
+        node = _record_to_node(records[0]["n"])
+        if generation == (self._key_epoch, self._key_generation.get(cache_key, 0)):
+            if len(self._key_cache) >= KEY_CACHE_SIZE:
+                # Evict the oldest entry (dicts keep insertion order).
+                del self._key_cache[next(iter(self._key_cache))]
+            self._key_cache[cache_key] = (_copy_node(node), time.monotonic())
+        return node
+
+    def _invalidate_key(self, node: Node) -> None:
+        if not node.key:
+            return
+        cache_key = (node.user_id, node.type, node.key)
+        self._key_cache.pop(cache_key, None)
+        if len(self._key_generation) >= KEY_CACHE_SIZE:
+            # Bound the counters: a new epoch invalidates every lookup in flight.
+            self._key_generation.clear()
+            self._key_epoch += 1
+        self._key_generation[cache_key] = self._key_generation.get(cache_key, 0) + 1
+
+    def _invalidate_ids(self, node_ids: set[str]) -> None:
+        stale = [
+            cache_key
+            for cache_key, (node, _) in self._key_cache.items()
+            if node.id in node_ids
+        ]
+        for cache_key in stale:
+            del self._key_cache[cache_key]
+        # Lookups in flight for these ids are not known by key.
+        self._key_epoch += 1
 
     async def soft_delete_node(self, node_id: str) -> None:
         """Mark a node as deleted without physically removing it."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            await session.run(
-                "MATCH (n:SemanticNode {id: $id}) SET n.is_deleted = 1",
-                id=node_id,
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        await self._write(
+            _Q_SOFT_DELETE_NODE,
+            id=node_id,
+        )
+        self._invalidate_ids({node_id})
+
+    async def bulk_upsert_nodes(self, nodes: list[Node]) -> int:
+        """Upsert many semantic nodes with batched ``UNWIND … MERGE`` writes.
+
+        Same merge semantics as :meth:`upsert_node`, but each chunk of
+        :data:`BULK_BATCH_SIZE` nodes costs one round-trip and one commit
+        instead of one per node.  Returns the number of rows sent.
+        """
+        if not nodes:
+            return 0
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        rows = []
+        for node in nodes:
+            meta_props, metadata_extra = _metadata_to_props(
+                metadata_with_defaults(node.metadata)
             )
+            rows.append({
+                "id": node.id,
+                "user_id": node.user_id,
+                "type": node.type,
+                "name": node.name,
+                "text": node.text,
+                "subtype": node.subtype,
+                "key": node.key,
+                "meta_props": meta_props,
+                "metadata_extra": metadata_extra,
+                "created_at": node.created_at,
+            })
+        await self._write_batches(_Q_BULK_UPSERT_NODES, rows)
+        for node in nodes:
+            self._invalidate_key(node)
+        return len(rows)
 
     # ── Edge (relationship) operations ───────────────────────────
 
     async def add_edge(self, edge: Edge) -> Edge:
         """Create or return an existing relationship between two semantic nodes."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (a:SemanticNode {id: $source_id})
-                MATCH (b:SemanticNode {id: $target_id})
-                MERGE (a)-[r:RELATES {
-                    user_id: $user_id,
-                    relation: $relation
-                }]->(b)
-                ON CREATE SET
-                    r.id          = $id,
-                    r.metadata    = $metadata_json,
-                    r.created_at  = $created_at
-                RETURN r
-                """,
-                source_id=edge.source_node_id,
-                target_id=edge.target_node_id,
-                user_id=edge.user_id,
-                relation=edge.relation,
-                id=edge.id,
-                metadata_json=json.dumps(edge.metadata, ensure_ascii=False),
-                created_at=edge.created_at,
-            )
-            record = await result.single()
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        meta_props, metadata_extra = _metadata_to_props(edge.metadata)
+        records = await self._write(
+            _Q_ADD_EDGE,
+            source_id=edge.source_node_id,
+            target_id=edge.target_node_id,
+            user_id=edge.user_id,
+            relation=edge.relation,
+            id=edge.id,
+            meta_props=meta_props,
+            metadata_extra=metadata_extra,
+            created_at=edge.created_at,
+        )
+        record = records[0] if records else None
         if record is None:
             logger.warning("add_edge: source or target node not found")
             return edge
         return _record_to_edge(record["r"], edge.source_node_id, edge.target_node_id)
 
-    async def list_edges(self, user_id: str) -> list[Edge]:
-        """Return all relationships for a user."""
-        await self._ensure_initialized()
+    async def bulk_add_edges(self, edges: list[Edge]) -> int:
+        """Create many relationships with batched ``UNWIND … MERGE`` writes.
+
+        Edges whose endpoints do not exist are skipped, as in
+        :meth:`add_edge`.  Returns the number of relationships actually
+        created (already-existing ones are matched, not counted).
+        """
+        if not edges:
+            return 0
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        rows = []
+        for edge in edges:
+            meta_props, metadata_extra = _metadata_to_props(edge.metadata)
+            rows.append({
+                "id": edge.id,
+                "user_id": edge.user_id,
+                "source_id": edge.source_node_id,
+                "target_id": edge.target_node_id,
+                "relation": edge.relation,
+                "meta_props": meta_props,
+                "metadata_extra": metadata_extra,
+                "created_at": edge.created_at,
+            })
+        counters = await self._write_batches(_Q_BULK_ADD_EDGES, rows)
+        return sum(c.relationships_created for c in counters)
+
+    async def list_edges(
+        self,
+        user_id: str,
+        *,
+        endpoint_in: set[str] | None = None,
+    ) -> list[Edge]:
+        """Return all relationships for a user (see :meth:`iter_edges`)."""
+        return [edge async for edge in self.iter_edges(user_id, endpoint_in=endpoint_in)]
+
+    async def iter_edges(
+        self,
+        user_id: str,
+        *,
+        endpoint_in: set[str] | None = None,
+    ) -> AsyncIterator[Edge]:
+        """Stream a user's relationships in ``created_at`` order.
+
+        Records are converted as they arrive over Bolt, so single-pass
+        consumers hold O(1) edges instead of the whole result.
+
+        When *endpoint_in* is given, only relationships whose both endpoints
+        are in that set are returned; the predicate runs inside Neo4j.
+        """
+        if endpoint_in is not None and not endpoint_in:
+            return
+        if not self._ready.is_set():
+            await self._ensure_initialized()
         async with self._driver.session(database=self._database) as session:
             result = await session.run(
-                """
-                MATCH (a:SemanticNode)-[r:RELATES {user_id: $user_id}]->(b:SemanticNode)
-                RETURN r, a.id AS source_id, b.id AS target_id
-                ORDER BY r.created_at
-                """,
+                _Q_LIST_EDGES,
                 user_id=user_id,
+                endpoint_ids=list(endpoint_in) if endpoint_in is not None else None,
             )
-            records = await result.data()
-        return [
-            _record_to_edge(r["r"], r["source_id"], r["target_id"])
-            for r in records
-        ]
+            async for record in result:
+                yield _edge_of(record)
 
     async def get_edges_from_node(
         self, user_id: str, source_node_id: str
     ) -> list[Edge]:
         """Return all outgoing relationships from a node."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (a:SemanticNode {id: $source_id})-[r:RELATES {user_id: $user_id}]->(b:SemanticNode)
-                RETURN r, a.id AS source_id, b.id AS target_id
-                """,
-                source_id=source_node_id,
-                user_id=user_id,
-            )
-            records = await result.data()
-        return [
-            _record_to_edge(r["r"], r["source_id"], r["target_id"])
-            for r in records
-        ]
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        return await self._read_as(
+            _edge_of,
+            _Q_EDGES_FROM_NODE,
+            source_id=source_node_id,
+            user_id=user_id,
+        )
 
     async def get_edges_to_node(
         self, user_id: str, target_node_id: str
     ) -> list[Edge]:
         """Return all incoming relationships to a node."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (a:SemanticNode)-[r:RELATES {user_id: $user_id}]->(b:SemanticNode {id: $target_id})
-                RETURN r, a.id AS source_id, b.id AS target_id
-                """,
-                target_id=target_node_id,
-                user_id=user_id,
-            )
-            records = await result.data()
-        return [
-            _record_to_edge(r["r"], r["source_id"], r["target_id"])
-            for r in records
-        ]
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        return await self._read_as(
+            _edge_of,
+            _Q_EDGES_TO_NODE,
+            target_id=target_node_id,
+            user_id=user_id,
+        )
 
     # ── Merge / consolidation ────────────────────────────────────
 
@@ -308,65 +803,19 @@ class Neo4jStorage:
         """Merge several nodes into *target_node* within Neo4j.
 
         Re-points all relationships, removes self-loops, soft-deletes sources.
+        The target is written without a RETURN (nodes MERGE on ``id``, so the
+        caller's id is the stored one); the result is *target_node* with its
+        metadata defaults filled in.
         """
         if not source_node_ids:
             return await self.upsert_node(target_node)
 
-        await self._ensure_initialized()
-        saved = await self.upsert_node(target_node)
-
-        async with self._driver.session(database=self._database) as session:
-            for source_id in source_node_ids:
-                # Re-point outgoing edges
-                await session.run(
-                    """
-                    MATCH (s:SemanticNode {id: $source_id})-[r:RELATES]->(b:SemanticNode)
-                    WHERE b.id <> $target_id
-                    MATCH (t:SemanticNode {id: $target_id})
-                    CREATE (t)-[r2:RELATES]->(b)
-                    SET r2 = properties(r)
-                    DELETE r
-                    """,
-                    source_id=source_id,
-                    target_id=saved.id,
-                )
-                # Re-point incoming edges
-                await session.run(
-                    """
-                    MATCH (a:SemanticNode)-[r:RELATES]->(s:SemanticNode {id: $source_id})
-                    WHERE a.id <> $target_id
-                    MATCH (t:SemanticNode {id: $target_id})
-                    CREATE (a)-[r2:RELATES]->(t)
-                    SET r2 = properties(r)
-                    DELETE r
-                    """,
-                    source_id=source_id,
-                    target_id=saved.id,
-                )
-                # Remove any remaining self-loops / edges from source
-                await session.run(
-                    """
-                    MATCH (s:SemanticNode {id: $source_id})-[r:RELATES]-(any)
-                    DELETE r
-                    """,
-                    source_id=source_id,
-                )
-                # Soft-delete source
-                await session.run(
-                    "MATCH (n:SemanticNode {id: $id}) SET n.is_deleted = 1",
-                    id=source_id,
-                )
+        await self.upsert_node_no_return(target_node)
 
-            # Remove self-loops on target
-            await session.run(
-                """
-                MATCH (t:SemanticNode {id: $id})-[r:RELATES]->(t)
-                DELETE r
-                """,
-                id=saved.id,
-            )
+        await self._write(_Q_MERGE_NODES, source_ids=source_node_ids, target_id=target_node.id)
+        self._invalidate_ids(set(source_node_ids))
 
-        return saved
+        return replace(target_node, metadata=metadata_with_defaults(target_node.metadata))
 
     # ── Graph traversal (Neo4j advantage) ────────────────────────
 
@@ -377,28 +826,21 @@ class Neo4jStorage:
         end_node_id: str,
         max_depth: int = 5,
     ) -> list[list[str]]:
-        """Find all simple paths between two nodes (up to *max_depth* hops).
+        """Find all shortest paths between two nodes (up to *max_depth* hops).
 
-        Returns a list of node-id paths.  This is O(log N) in Neo4j vs O(N)
-        in SQLite — the primary reason for the migration.
+        Returns a list of node-id paths.  The hop bound in the pattern is the
+        literal :data:`MAX_PATH_DEPTH` (Cypher cannot parameterise it), so
+        one cached plan serves every *max_depth*; larger values are capped.
         """
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH path = shortestPath(
-                    (a:SemanticNode {id: $start_id})-[:RELATES*1.."""
-                + str(max_depth)
-                + """]->(b:SemanticNode {id: $end_id})
-                )
-                WHERE ALL(n IN nodes(path) WHERE n.user_id = $user_id)
-                RETURN [n IN nodes(path) | n.id] AS node_ids
-                """,
-                start_id=start_node_id,
-                end_id=end_node_id,
-                user_id=user_id,
-            )
-            records = await result.data()
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        records = await self._read(
+            _Q_FIND_PATHS,
+            start_id=start_node_id,
+            end_id=end_node_id,
+            user_id=user_id,
+            max_depth=min(max_depth, MAX_PATH_DEPTH),
+        )
         return [r["node_ids"] for r in records]
 
     async def get_neighborhood(
@@ -413,37 +855,55 @@ class Neo4jStorage:
            Requires the APOC plugin to be installed in the Neo4j instance.
            See https://neo4j.com/labs/apoc/
         """
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (start:SemanticNode {id: $node_id, user_id: $user_id})
-                CALL apoc.path.subgraphNodes(start, {maxLevel: $depth})
-                YIELD node
-                WHERE node.user_id = $user_id
-                  AND (node.is_deleted IS NULL OR node.is_deleted = 0)
-                RETURN node
-                """,
-                node_id=node_id,
-                user_id=user_id,
-                depth=depth,
-            )
-            records = await result.data()
-        return [_record_to_node(r["node"]) for r in records]
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        return await self._read_as(
+            _node_of,
+            _Q_NEIGHBORHOOD,
+            node_id=node_id,
+            user_id=user_id,
+            depth=depth,
+        )
+
+    async def vector_search(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        top_k: int = 10,
+    ) -> list[tuple[Node, float]]:
+        """Return the *top_k* nodes closest to *query_embedding* (cosine).
+
+        Backed by the :data:`VECTOR_INDEX_NAME` HNSW index, so the dense
+        ranking runs inside Neo4j instead of over every node in Python.
+        Requires ``vector_dimensions`` to be set on construction.
+        """
+        if not self._vector_dimensions:
+            raise RuntimeError("vector_search requires Neo4jStorage(vector_dimensions=...)")
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        return await self._read_as(
+            _scored_node_of,
+            _Q_VECTOR_SEARCH,
+            index_name=VECTOR_INDEX_NAME,
+            candidates=top_k * VECTOR_OVERSAMPLE,
+            embedding=query_embedding,
+            user_id=user_id,
+            top_k=top_k,
+        )
 
     async def count_nodes(self, user_id: str) -> int:
-        """Total number of semantic nodes for a user."""
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (n:SemanticNode {user_id: $user_id})
-                WHERE n.is_deleted IS NULL OR n.is_deleted = 0
-                RETURN count(n) AS cnt
-                """,
-                user_id=user_id,
-            )
-            record = await result.single()
+        """Total number of live semantic nodes for a user.
+
+        Read from the user's ``:UserStats`` counter rather than by scanning
+        the user's nodes.
+        """
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        records = await self._read(
+            _Q_COUNT_NODES,
+            user_id=user_id,
+        )
+        record = records[0] if records else None
         return record["cnt"] if record else 0
 
     async def delete_all_user_data(self, user_id: str) -> int:
@@ -452,26 +912,132 @@ class Neo4jStorage:
         Intended for testing and GDPR data-deletion requests.
         Returns the number of nodes removed.
         """
-        await self._ensure_initialized()
-        async with self._driver.session(database=self._database) as session:
-            result = await session.run(
-                """
-                MATCH (n:SemanticNode {user_id: $user_id})
-                DETACH DELETE n
-                RETURN count(n) AS cnt
-                """,
-                user_id=user_id,
-            )
-            record = await result.single()
+        if not self._ready.is_set():
+            await self._ensure_initialized()
+        records = await self._write(
+            _Q_DELETE_USER_DATA,
+            user_id=user_id,
+        )
+        self._key_cache = {
+            cache_key: entry
+            for cache_key, entry in self._key_cache.items()
+            if cache_key[0] != user_id
+        }
+        self._key_epoch += 1
+        record = records[0] if records else None
         return record["cnt"] if record else 0
 
 
 # ── Helpers ──────────────────────────────────────────────────────
 
 
+async def _fetch_all(
+    tx: Any,
+    query: str,
+    params: dict[str, Any],
+    convert: Callable[[Any], Any] | None = None,
+) -> list[Any]:
+    """Managed-transaction body: run *query* and collect its records.
+
+    With *convert*, each record is mapped while streaming off the wire, so
+    no intermediate list of raw records is kept.
+    """
+    result = await tx.run(query, params)
+    if convert is None:
+        return [record async for record in result]
+    return [convert(record) async for record in result]
+
+
+async def _run_unwind(tx: Any, query: str, rows: list[dict[str, Any]]) -> Any:
+    """Managed-transaction body for the bulk ``UNWIND $rows`` writes.
+
+    Returns the summary counters of the statement.
+    """
+    result = await tx.run(query, rows=rows)
+    summary = await result.consume()
+    return summary.counters
+
+
+async def _run_schema(tx: Any) -> None:
+    """Managed-transaction body: apply :data:`_SCHEMA_STATEMENTS`."""
+    for statement in _SCHEMA_STATEMENTS:
+        result = await tx.run(statement)
+        await result.consume()
+
+
+def _is_native_value(value: Any) -> bool:
+    """Whether *value* can be stored as a Neo4j property.
+
+    Scalars, lists of one scalar type, and lists of numbers (int and float
+    mixed, as in embeddings) — see :func:`_metadata_to_props`.
+    """
+    if isinstance(value, (str, bool, int, float)):
+        return True
+    if isinstance(value, list) and value:
+        kind = type(value[0])
+        if kind is str or kind is bool:
+            return all(type(v) is kind for v in value)
+        return kind in (int, float) and all(type(v) in (int, float) for v in value)
+    return False
+
+
+def _metadata_to_props(metadata: dict[str, Any]) -> tuple[dict[str, Any], str | None]:
+    """Split *metadata* into native ``meta_*`` properties and a JSON remainder.
+
+    Neo4j only stores homogeneous lists, so a number list mixing int and
+    float is stored as floats.
+    """
+    props: dict[str, Any] = {}
+    extra: dict[str, Any] = {}
+    for key, value in metadata.items():
+        if not _is_native_value(value):
+            extra[key] = value
+            continue
+        if isinstance(value, list) and type(value[0]) in (int, float):
+            kind = type(value[0])
+            if any(type(v) is not kind for v in value):
+                value = [float(v) for v in value]
+        props[META_PREFIX + key] = value
+    return props, (json_codec.dumps(extra) if extra else None)
+
+
+def _props_to_metadata(props: Any) -> dict[str, Any]:
+    """Rebuild a metadata dict from the native ``meta_*`` properties.
+
+    Entities written before metadata became native still carry a JSON
+    ``metadata`` string; it is read as the base and dropped on next upsert.
+    """
+    legacy = props.get("metadata")
+    metadata: dict[str, Any] = json_codec.loads(legacy) if legacy else {}
+    for key, value in props.items():
+        if key.startswith(META_PREFIX):
+            metadata[key[len(META_PREFIX):]] = value
+    extra = props.get("metadata_extra")
+    if extra:
+        metadata.update(json_codec.loads(extra))
+    return metadata
+
+
+def _copy_node(node: Node) -> Node:
+    """Copy of *node* whose metadata the caller may mutate freely."""
+    return replace(node, metadata=copy.deepcopy(node.metadata))
+
+
+def _node_of(record: Any) -> Node:
+    return _record_to_node(record["n"])
+
+
+def _scored_node_of(record: Any) -> tuple[Node, float]:
+    return _record_to_node(record["n"]), record["score"]
+
+
+def _edge_of(record: Any) -> Edge:
+    return _record_to_edge(record["r"], record["source_id"], record["target_id"])
+
+
 def _record_to_node(props: Any) -> Node:
     """Convert a Neo4j node record to a :class:`Node`."""
-    metadata = json.loads(props.get("metadata", "{}"))
+    metadata = _props_to_metadata(props)
     return Node(
         id=props["id"],
         user_id=props["user_id"],
@@ -491,7 +1057,7 @@ def _record_to_edge(
     target_id: str,
 ) -> Edge:
     """Convert a Neo4j relationship record to an :class:`Edge`."""
-    metadata = json.loads(props.get("metadata", "{}"))
+    metadata = _props_to_metadata(props)
     return Edge(
         id=props.get("id", ""),
         user_id=props.get("user_id", ""),
@@ -2,22 +2,144 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
-import json
 import logging
 import sqlite3
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import NamedTuple
 
 import aiosqlite
 
-from core.graph.model import Edge, Node, ensure_metadata_defaults
-from core.graph._node_ops import NodeOpsMixin, _row_to_node
-from core.graph._edge_ops import EdgeOpsMixin, _row_to_edge
+from core.graph._edge_ops import _ITER_EDGES_SQL, EdgeOpsMixin, _row_to_edge
 from core.graph._mood_ops import MoodOpsMixin
-from core.graph._scheduler_ops import SchedulerOpsMixin
+from core.graph._node_ops import (
+    _FIND_NODES_SQL,
+    _QUALIFIED_NODE_COLUMNS,
+    NodeOpsMixin,
+    _decode_embedding_array,
+    _row_to_node,
+)
+from core.graph._scheduler_ops import SchedulerOpsMixin, UserStats
+from core.graph.model import Edge, Node, ensure_metadata_defaults
+from core.utils.math import top_k_similar
 
 logger = logging.getLogger(__name__)
 
+# WAL: читатели не блокируются писателем; режим сохраняется в файле БД.
+# synchronous=NORMAL в WAL не портит базу, но fsync делается только на
+# checkpoint: при сбое питания/ОС последние закоммиченные транзакции могут
+# откатиться (падение самого процесса их не теряет). busy_timeout даёт
+# читателям из пула подождать checkpoint вместо мгновенного SQLITE_BUSY.
+# recursive_triggers нужен, чтобы INSERT OR REPLACE вызывал DELETE-триггеры
+# nodes_fts. analysis_limit ограничивает ANALYZE из PRAGMA optimize (см. close)
+# выборкой строк на индекс вместо полного прохода.
+_CONNECTION_PRAGMAS = """
+PRAGMA busy_timeout = 5000;
+PRAGMA analysis_limit = 400;
+PRAGMA cache_size = -65536;
+PRAGMA temp_store = MEMORY;
+PRAGMA recursive_triggers = ON;
+"""
+
+# Только для файловой БД: у ``:memory:`` нет ни WAL, ни fsync, ни файла для mmap.
+_FILE_DB_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA mmap_size = 268435456;
+"""
+
+# Соединений только для чтения сверх единственного писателя. В WAL читатели
+# не ждут писателя и друг друга, а держать их открытыми выгоднее, чем
+# открывать на каждый запрос: page cache у каждого соединения свой и остаётся
+# прогретым.
+READ_POOL_SIZE = 4
+
+# Размер кэша скомпилированных выражений sqlite3 на соединение (по умолчанию
+# 128). Кэш работает по точному тексту SQL, поэтому запросы миксинов вынесены
+# в модульные константы.
+STATEMENT_CACHE_SIZE = 256
+
+# Upper bound on FTS candidates handed to HybridSearchEngine per query.
+FTS_CANDIDATE_LIMIT = 2000
+
+# Upper bound on dense (vector_search) candidates added to them when the
+# query has an embedding.
+DENSE_CANDIDATE_LIMIT = 200
+
+# rank — встроенный bm25 FTS5 (считается в C): при упоре в LIMIT отсекаются
+# наименее релевантные кандидаты, а не случайные.
+_FIND_NODES_FTS_SQL = f"""
+SELECT {_QUALIFIED_NODE_COLUMNS} FROM nodes_fts
+JOIN nodes n ON n.rowid = nodes_fts.rowid
+WHERE nodes_fts MATCH ?
+  AND n.user_id = ?
+  AND (n.is_deleted IS NULL OR n.is_deleted = 0)
+ORDER BY nodes_fts.rank
+LIMIT ?
+"""
+
+
+# (таблица, колонка, определение) — колонки, добавленные после первой версии схемы.
+_COLUMN_MIGRATIONS = (
+    ("nodes", "is_deleted", "INTEGER NOT NULL DEFAULT 0"),
+    # metadata['embedding'] как float32 BLOB (см. _node_ops._node_params)
+    ("nodes", "embedding_blob", "BLOB"),
+    # формат embedding_blob: 'e' — float16, 'f' или NULL (старые строки) — float32
+    ("nodes", "embedding_dtype", "TEXT"),
+    # metadata['pattern_type'] INSIGHT-узла — ключ дедупликации (см. _INSIGHT_KEYS_SQL)
+    ("nodes", "pattern_type", "TEXT"),
+    # mood_snapshots — fields for future predictive engine
+    ("mood_snapshots", "stressor_tags", "TEXT DEFAULT '[]'"),
+    ("mood_snapshots", "active_parts_keys", "TEXT DEFAULT '[]'"),
+    ("mood_snapshots", "intervention_applied", "TEXT"),
+    ("mood_snapshots", "feedback_score", "INTEGER"),
+)
+
+# Кандидаты vector_search: только id и вектор, по частичному индексу — узлы
+# без эмбеддинга не читаются вовсе, а полные строки грузятся лишь для top_k.
+_EMBEDDED_NODES_SQL = """
+SELECT id, embedding_blob, embedding_dtype FROM nodes INDEXED BY idx_nodes_user_embedding
+WHERE user_id = ? AND embedding_blob IS NOT NULL
+  AND (is_deleted IS NULL OR is_deleted = 0)
+"""
+
+_AVG_INTERVENTION_DELTA_SQL = """
+SELECT
+    AVG(post_valence  - pre_valence),
+    AVG(post_arousal  - pre_arousal),
+    AVG(post_dominance - pre_dominance),
+    COUNT(*)
+FROM intervention_outcomes
+WHERE user_id = ?
+  AND intervention_type = ?
+  AND pre_valence  IS NOT NULL
+  AND post_valence IS NOT NULL
+"""
+
+# Ключи дедупликации INSIGHT (pattern_type, name) только из индекса: ни
+# metadata_json, ни сами строки не читаются. Без подсказки (и без
+# sqlite_stat1) планировщик выбирает idx_nodes_user_type_created.
+_INSIGHT_KEYS_SQL = """
+SELECT COALESCE(pattern_type, ''), COALESCE(name, '')
+FROM nodes INDEXED BY idx_nodes_insight_dedup
+WHERE user_id = ? AND type = 'INSIGHT'
+  AND (is_deleted IS NULL OR is_deleted = 0)
+"""
+
+
+async def _fetch_insight_keys(conn: aiosqlite.Connection, user_id: str) -> set[tuple[str, str]]:
+    cursor = await conn.execute(_INSIGHT_KEYS_SQL, (user_id,))
+    return set(await cursor.fetchall())
+
+
+class UserGraph(NamedTuple):
+    """Граф пользователя для одного прохода анализа (см. load_user_graph)."""
+
+    nodes: list[Node]
+    edges: list[Edge]
+    insight_keys: set[tuple[str, str]]
+
 
 class GraphStorage(NodeOpsMixin, EdgeOpsMixin, MoodOpsMixin, SchedulerOpsMixin):
     """Единая точка доступа к графовому хранилищу.
@@ -32,151 +154,375 @@ class GraphStorage(NodeOpsMixin, EdgeOpsMixin, MoodOpsMixin, SchedulerOpsMixin):
     def __init__(self, db_path: str | Path = "data/self_os.db") -> None:
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._initialized = False
-        self._init_lock = asyncio.Lock()
         self._conn: aiosqlite.Connection | None = None
         self._conn_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._txn_task: asyncio.Task | None = None  # владелец открытого transaction()
+        # Кэш (last_activity, node_count) по пользователям, см. SchedulerOpsMixin.
+        self._user_stats: dict[str, UserStats] | None = None
+        self._user_stats_stale: set[str] = set()
+        self._user_stats_pending: set[str] = set()  # записаны, но ещё не закоммичены
+        self._user_stats_version: int | None = None  # PRAGMA data_version писателя
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle_readers: list[aiosqlite.Connection] = []
+        self._reader_slots = asyncio.Semaphore(READ_POOL_SIZE)
+
+    @property
+    def _in_memory(self) -> bool:
+        return str(self.db_path) == ":memory:"
+
+    async def connect(self) -> GraphStorage:
+        """Открыть писателя и создать схему заранее (например, при старте бота).
+
+        Без вызова это происходит при первом обращении к хранилищу, и его
+        латентность достаётся первому запросу пользователя.
+        """
+        await self._get_conn()
+        return self
+
+    async def _open_conn(self, *, read_only: bool = False) -> aiosqlite.Connection:
+        if read_only:
+            # mode=ro: SQLite сам отклонит запись, а соединение не претендует
+            # на write-lock. Файл уже создан писателем (см. _read_conn).
+            database, uri = f"{self.db_path.resolve().as_uri()}?mode=ro", True
+        else:
+            database, uri = str(self.db_path), False
+        conn = await aiosqlite.connect(
+            database, uri=uri, cached_statements=STATEMENT_CACHE_SIZE
+        )
+        if not read_only:
+            # Именованный доступ нужен внешним пользователям писателя
+            # (скрипты, тесты). Читатели отдают простые кортежи: все чтения
+            # хранилища распаковывают строки по позициям.
+            conn.row_factory = aiosqlite.Row
+        if not self._in_memory:
+            await conn.executescript(_FILE_DB_PRAGMAS)
+        await conn.executescript(_CONNECTION_PRAGMAS)
+        return conn
 
     async def _get_conn(self) -> aiosqlite.Connection:
+        """Единственное соединение-писатель (и все транзакции).
+
+        Схема создаётся один раз при открытии соединения, поэтому методам
+        хранилища не нужна отдельная проверка инициализации. Писать напрямую
+        через это соединение нельзя — ни хранилищу, ни внешнему коду
+        (therapy/outcome, consolidator): ``execute`` без лока открывает
+        неявную транзакцию, и следующий ``BEGIN IMMEDIATE`` падает. Все
+        записи идут через :meth:`_write_conn` или :meth:`transaction`.
+        """
+        # Быстрый путь: после открытия соединения лок не берётся.
         if self._conn is None:
             async with self._conn_lock:
                 if self._conn is None:
-                    self._conn = await aiosqlite.connect(str(self.db_path))
-                    self._conn.row_factory = aiosqlite.Row
+                    conn = await self._open_conn()
+                    await self._create_schema(conn)
+                    self._conn = conn
         return self._conn
 
+    @contextlib.asynccontextmanager
+    async def _write_conn(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Писатель под ``_write_lock``; блок — одна транзакция.
+
+        На выходе из блока commit, при исключении — rollback. Без лока
+        одиночная запись другой корутины могла выполниться между ``BEGIN``
+        и ``commit`` пакетной операции и закоммитить её раньше времени (или
+        попасть под её ``rollback``). Лок не реентерабелен — внутри блока
+        нельзя вызывать другие пишущие методы хранилища.
+
+        ``BEGIN IMMEDIATE`` берёт write-lock файла сразу: блок, начавший с
+        чтения, не упрётся в SQLITE_BUSY при переходе к записи, если базу
+        держит другой процесс (busy_timeout действует только на старте).
+
+        Внутри :meth:`transaction` той же задачи лок уже взят: блок становится
+        SAVEPOINT, а commit откладывается до конца внешней транзакции.
+        """
+        conn = self._conn or await self._get_conn()
+        if self._txn_task is not None and self._txn_task is asyncio.current_task():
+            await conn.execute("SAVEPOINT write_op")
+            try:
+                yield conn
+            except BaseException:
+                await conn.execute("ROLLBACK TO write_op")
+                raise
+            finally:
+                await conn.execute("RELEASE write_op")
+            return
+        async with self._write_lock:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+            finally:
+                self._mark_user_stats_stale()
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Объединяет записи хранилища внутри блока в одну транзакцию.
+
+        Один ``BEGIN IMMEDIATE`` и один commit вместо commit на каждый
+        ``upsert_node``/``add_edge``/...; при исключении откатывается всё.
+        Лок писателя держится до конца блока: записи из других задач ждут,
+        а чтения идут через пул и видят только закоммиченные данные.
+        Вложенный ``transaction()`` в той же задаче — часть внешнего.
+        """
+        if self._txn_task is not None and self._txn_task is asyncio.current_task():
+            yield
+            return
+        conn = self._conn or await self._get_conn()
+        async with self._write_lock:
+            await conn.execute("BEGIN IMMEDIATE")
+            self._txn_task = asyncio.current_task()
+            try:
+                yield
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+            finally:
+                self._txn_task = None
+                self._mark_user_stats_stale()
+
+    def _mark_user_stats_stale(self) -> None:
+        # Только после commit/rollback: иначе чтение из пула могло бы
+        # закэшировать состояние до записи.
+        if self._user_stats_pending:
+            self._user_stats_stale |= self._user_stats_pending
+            self._user_stats_pending.clear()
+
+    @contextlib.asynccontextmanager
+    async def _read_conn(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Соединение из пула читателей (не более READ_POOL_SIZE одновременно).
+
+        Чтения больше не выстраиваются в очередь за писателем и видят только
+        закоммиченные данные. Для ``:memory:`` отдельные соединения увидели бы
+        другую базу, поэтому там используется писатель.
+        """
+        writer = self._conn or await self._get_conn()  # писатель создаёт схему
+        if self._in_memory:
+            yield writer
+            return
+        async with self._reader_slots:
+            if self._idle_readers:
+                conn = self._idle_readers.pop()
+            else:
+                conn = await self._open_conn(read_only=True)
+                self._readers.append(conn)
+            try:
+                yield conn
+            finally:
+                # После close() соединение уже закрыто — в пул не возвращаем.
+                if conn in self._readers:
+                    self._idle_readers.append(conn)
+
     async def close(self) -> None:
+        readers, self._readers, self._idle_readers = self._readers, [], []
+        for reader in readers:
+            await reader.close()
         if self._conn is not None:
+            if not self._in_memory:
+                # Обновляет sqlite_stat1 для таблиц, чьи индексы писатель
+                # использовал за сессию (и ни разу не анализированных):
+                # планировщик выбирает индексы по реальной селективности.
+                try:
+                    await self._conn.execute("PRAGMA optimize")
+                except sqlite3.Error as exc:
+                    logger.debug("PRAGMA optimize failed: %s", exc)
             await self._conn.close()
             self._conn = None
-            self._initialized = False
 
-    async def _ensure_initialized(self) -> None:
-        if self._initialized:
-            return
-
-        async with self._init_lock:
-            if self._initialized:
-                return
-
-            conn = await self._get_conn()
-            await conn.executescript(
-                """
-                CREATE TABLE IF NOT EXISTS nodes (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    name TEXT,
-                    text TEXT,
-                    subtype TEXT,
-                    key TEXT,
-                    metadata_json TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                );
-
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_nodes_user_type_key
-                    ON nodes(user_id, type, key)
-                    WHERE key IS NOT NULL;
-
-                CREATE INDEX IF NOT EXISTS idx_nodes_user_type
-                    ON nodes(user_id, type);
-
-                CREATE INDEX IF NOT EXISTS idx_nodes_user_created
-                    ON nodes(user_id, created_at DESC);
-
-                CREATE TABLE IF NOT EXISTS edges (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    source_node_id TEXT NOT NULL,
-                    target_node_id TEXT NOT NULL,
-                    relation TEXT NOT NULL,
-                    metadata_json TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY(source_node_id) REFERENCES nodes(id),
-                    FOREIGN KEY(target_node_id) REFERENCES nodes(id)
-                );
-
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_edges_unique
-                    ON edges(user_id, source_node_id, target_node_id, relation);
-
-                CREATE INDEX IF NOT EXISTS idx_edges_user_created
-                    ON edges(user_id, created_at DESC);
-
-                CREATE TABLE IF NOT EXISTS mood_snapshots (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    valence_avg REAL NOT NULL,
-                    arousal_avg REAL NOT NULL,
-                    dominance_avg REAL NOT NULL DEFAULT 0.0,
-                    intensity_avg REAL NOT NULL DEFAULT 0.5,
-                    dominant_label TEXT,
-                    sample_count INTEGER NOT NULL DEFAULT 1
-                );
-
-                CREATE INDEX IF NOT EXISTS idx_mood_snapshots_user_ts
-                    ON mood_snapshots (user_id, timestamp DESC);
-
-                CREATE TABLE IF NOT EXISTS scheduler_state (
-                    user_id TEXT PRIMARY KEY,
-                    last_proactive_at TEXT,
-                    last_checked_at TEXT,
-                    total_sent INTEGER NOT NULL DEFAULT 0
-                );
-
-                CREATE TABLE IF NOT EXISTS signal_feedback (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    signal_type TEXT NOT NULL,
-                    signal_score REAL NOT NULL,
-                    was_helpful INTEGER NOT NULL,
-                    sent_at TEXT NOT NULL,
-                    feedback_at TEXT NOT NULL
-                );
-
-                CREATE INDEX IF NOT EXISTS idx_signal_feedback_user_type
-                    ON signal_feedback(user_id, signal_type);
-                """
-            )
-            # ── Sprint-0 migrations (backward-compatible ALTER TABLE) ──
-            _migrations = [
-                "ALTER TABLE nodes ADD COLUMN is_deleted INTEGER NOT NULL DEFAULT 0",
-                # mood_snapshots — fields for future predictive engine
-                "ALTER TABLE mood_snapshots ADD COLUMN stressor_tags TEXT DEFAULT '[]'",
-                "ALTER TABLE mood_snapshots ADD COLUMN active_parts_keys TEXT DEFAULT '[]'",
-                "ALTER TABLE mood_snapshots ADD COLUMN intervention_applied TEXT",
-                "ALTER TABLE mood_snapshots ADD COLUMN feedback_score INTEGER",
-            ]
-            for stmt in _migrations:
-                with contextlib.suppress(sqlite3.OperationalError):
-                    await conn.execute(stmt)
-
-            # intervention_outcomes — minimal OutcomeTracker table
+    async def _create_schema(self, conn: aiosqlite.Connection) -> None:
+        await conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS nodes (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                name TEXT,
+                text TEXT,
+                subtype TEXT,
+                key TEXT,
+                -- Текст, не JSONB: jsonb() есть только с SQLite 3.45, а
+                -- Python-клиенту всё равно нужен текст (json() на каждой
+                -- строке). Разбор и так ленивый (LazyJSONDict, orjson), а
+                -- отдельные поля читаются json_extract в SQL.
+                metadata_json TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_nodes_user_type_key
+                ON nodes(user_id, type, key)
+                WHERE key IS NOT NULL;
+
+            -- Покрывающий: id/created_at по ключу читаются без обращения к
+            -- строке таблицы (с её text и metadata_json).
+            CREATE INDEX IF NOT EXISTS idx_nodes_key_identity
+                ON nodes(user_id, type, key, id, created_at)
+                WHERE key IS NOT NULL;
+
+            -- Выборки по типу (find_nodes, get_recent_nodes) идут диапазоном
+            -- по (user_id, type) уже в порядке created_at, без фильтрации
+            -- всех узлов пользователя. Префикс заменяет idx_nodes_user_type.
+            DROP INDEX IF EXISTS idx_nodes_user_type;
+            CREATE INDEX IF NOT EXISTS idx_nodes_user_type_created
+                ON nodes(user_id, type, created_at);
+
+            CREATE INDEX IF NOT EXISTS idx_nodes_user_created
+                ON nodes(user_id, created_at DESC);
+
+            CREATE TABLE IF NOT EXISTS edges (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                source_node_id TEXT NOT NULL,
+                target_node_id TEXT NOT NULL,
+                relation TEXT NOT NULL,
+                metadata_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY(source_node_id) REFERENCES nodes(id),
+                FOREIGN KEY(target_node_id) REFERENCES nodes(id)
+            );
+
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_edges_unique
+                ON edges(user_id, source_node_id, target_node_id, relation);
+
+            CREATE INDEX IF NOT EXISTS idx_edges_user_created
+                ON edges(user_id, created_at DESC);
+
+            CREATE TABLE IF NOT EXISTS mood_snapshots (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                valence_avg REAL NOT NULL,
+                arousal_avg REAL NOT NULL,
+                dominance_avg REAL NOT NULL DEFAULT 0.0,
+                intensity_avg REAL NOT NULL DEFAULT 0.5,
+                dominant_label TEXT,
+                sample_count INTEGER NOT NULL DEFAULT 1
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_mood_snapshots_user_ts
+                ON mood_snapshots (user_id, timestamp DESC);
+
+            CREATE TABLE IF NOT EXISTS scheduler_state (
+                user_id TEXT PRIMARY KEY,
+                last_proactive_at TEXT,
+                last_checked_at TEXT,
+                total_sent INTEGER NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS signal_feedback (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                signal_type TEXT NOT NULL,
+                signal_score REAL NOT NULL,
+                was_helpful INTEGER NOT NULL,
+                sent_at TEXT NOT NULL,
+                feedback_at TEXT NOT NULL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_signal_feedback_user_type
+                ON signal_feedback(user_id, signal_type);
+            """
+        )
+        # ── Sprint-0 migrations (backward-compatible ALTER TABLE) ──
+        # Существующие колонки берутся из PRAGMA table_info: на уже
+        # мигрированной базе ALTER не выполняется вовсе (а не падает с
+        # OperationalError при каждом старте).
+        added: set[tuple[str, str]] = set()
+        for table, column, ddl in _COLUMN_MIGRATIONS:
+            cursor = await conn.execute(f"PRAGMA table_info({table})")
+            if column in {row[1] for row in await cursor.fetchall()}:
+                continue
+            with contextlib.suppress(sqlite3.OperationalError):
+                await conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+                added.add((table, column))
+        if ("nodes", "pattern_type") in added:
+            # Однократно для существующих инсайтов; дальше колонку пишет upsert.
             await conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS intervention_outcomes (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    intervention_type TEXT NOT NULL,
-                    pre_valence REAL,
-                    pre_arousal REAL,
-                    pre_dominance REAL,
-                    post_valence REAL,
-                    post_arousal REAL,
-                    post_dominance REAL,
-                    user_feedback INTEGER,
-                    created_at TEXT NOT NULL
-                )
+                UPDATE nodes SET pattern_type = json_extract(metadata_json, '$.pattern_type')
+                WHERE type = 'INSIGHT'
+                  AND json_type(metadata_json, '$.pattern_type') = 'text'
                 """
             )
-            await conn.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_intervention_outcomes_user
-                    ON intervention_outcomes(user_id, created_at DESC)
-                """
+        # После миграций: в старых базах embedding_blob и pattern_type
+        # появляются только выше. type в колонках idx_nodes_insight_dedup
+        # дублирует условие индекса, но без него SQLite не считает индекс
+        # покрывающим.
+        await conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS idx_nodes_user_embedding
+                ON nodes(user_id) WHERE embedding_blob IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS idx_nodes_insight_dedup
+                ON nodes(user_id, type, pattern_type, name, is_deleted)
+                WHERE type = 'INSIGHT';
+            """
+        )
+
+        # intervention_outcomes — minimal OutcomeTracker table
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS intervention_outcomes (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                intervention_type TEXT NOT NULL,
+                pre_valence REAL,
+                pre_arousal REAL,
+                pre_dominance REAL,
+                post_valence REAL,
+                post_arousal REAL,
+                post_dominance REAL,
+                user_feedback INTEGER,
+                created_at TEXT NOT NULL
             )
-            await conn.commit()
-            self._initialized = True
+            """
+        )
+        await conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_intervention_outcomes_user
+                ON intervention_outcomes(user_id, created_at DESC)
+            """
+        )
+        await self._ensure_fts(conn)
+        await conn.commit()
+
+    async def _ensure_fts(self, conn: aiosqlite.Connection) -> None:
+        """FTS5-индекс по nodes(name, text) для префильтра hybrid_search."""
+        cursor = await conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nodes_fts'"
+        )
+        if await cursor.fetchone() is not None:
+            return
+        await conn.executescript(
+            """
+            CREATE VIRTUAL TABLE nodes_fts USING fts5(
+                name, text, content='nodes', content_rowid='rowid'
+            );
+
+            CREATE TRIGGER nodes_fts_ai AFTER INSERT ON nodes BEGIN
+                INSERT INTO nodes_fts(rowid, name, text)
+                VALUES (new.rowid, new.name, new.text);
+            END;
+
+            CREATE TRIGGER nodes_fts_ad AFTER DELETE ON nodes BEGIN
+                INSERT INTO nodes_fts(nodes_fts, rowid, name, text)
+                VALUES ('delete', old.rowid, old.name, old.text);
+            END;
+
+            CREATE TRIGGER nodes_fts_au AFTER UPDATE OF name, text ON nodes BEGIN
+                INSERT INTO nodes_fts(nodes_fts, rowid, name, text)
+                VALUES ('delete', old.rowid, old.name, old.text);
+                INSERT INTO nodes_fts(rowid, name, text)
+                VALUES (new.rowid, new.name, new.text);
+            END;
+
+            INSERT INTO nodes_fts(nodes_fts) VALUES ('rebuild');
+            """
+        )
 
     # ── Intervention outcomes ───────────────────────────────────────
 
@@ -198,33 +544,46 @@ class GraphStorage(NodeOpsMixin, EdgeOpsMixin, MoodOpsMixin, SchedulerOpsMixin):
         intervention_type:
             The intervention type string (e.g. ``"CBT"``, ``"IFS"``).
         """
-        await self._ensure_initialized()
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT
-                AVG(post_valence  - pre_valence)  AS delta_valence,
-                AVG(post_arousal  - pre_arousal)  AS delta_arousal,
-                AVG(post_dominance - pre_dominance) AS delta_dominance,
-                COUNT(*) AS sample_count
-            FROM intervention_outcomes
-            WHERE user_id = ?
-              AND intervention_type = ?
-              AND pre_valence  IS NOT NULL
-              AND post_valence IS NOT NULL
-            """,
-            (user_id, intervention_type),
-        )
-        row = await cursor.fetchone()
-        if row is None or row["sample_count"] == 0:
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_AVG_INTERVENTION_DELTA_SQL, (user_id, intervention_type))
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        delta_valence, delta_arousal, delta_dominance, sample_count = row
+        if sample_count == 0:
             return None
         return {
-            "delta_valence": float(row["delta_valence"] or 0.0),
-            "delta_arousal": float(row["delta_arousal"] or 0.0),
-            "delta_dominance": float(row["delta_dominance"] or 0.0),
-            "sample_count": int(row["sample_count"]),
+            "delta_valence": float(delta_valence or 0.0),
+            "delta_arousal": float(delta_arousal or 0.0),
+            "delta_dominance": float(delta_dominance or 0.0),
+            "sample_count": int(sample_count),
         }
 
+    # ── Graph snapshot ─────────────────────────────────────────────
+
+    async def load_user_graph(self, user_id: str, node_limit: int = 2000) -> UserGraph:
+        """Узлы (как :meth:`find_nodes`), рёбра и ключи INSIGHT одним заходом.
+
+        Три запроса подряд на одном соединении-читателе (один слот пула);
+        ключи — как в :meth:`fetch_insight_dedup_keys`.
+        """
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_FIND_NODES_SQL[(False, False)], (user_id, node_limit))
+            node_rows = await cursor.fetchall()
+            cursor = await conn.execute(_ITER_EDGES_SQL, (user_id,))
+            edge_rows = await cursor.fetchall()
+            insight_keys = await _fetch_insight_keys(conn, user_id)
+        return UserGraph(
+            nodes=[_row_to_node(row) for row in node_rows],
+            edges=[_row_to_edge(row) for row in edge_rows],
+            insight_keys=insight_keys,
+        )
+
+    async def fetch_insight_dedup_keys(self, user_id: str) -> set[tuple[str, str]]:
+        """Ключи (pattern_type, name) сохранённых INSIGHT без загрузки узлов."""
+        async with self._read_conn() as conn:
+            return await _fetch_insight_keys(conn, user_id)
+
     # ── Search ─────────────────────────────────────────────────────
 
     async def hybrid_search(
@@ -234,20 +593,71 @@ class GraphStorage(NodeOpsMixin, EdgeOpsMixin, MoodOpsMixin, SchedulerOpsMixin):
         alpha: float = 0.7,
         top_k: int = 10,
         use_rrf: bool = False,
+        query_embedding: list[float] | None = None,
     ) -> list[tuple[Node, float]]:
-        """Hybrid sparse search over user nodes."""
-        from core.search.hybrid_search import HybridSearchEngine
-
-        nodes = await self.find_nodes(user_id, limit=500)
+        """Hybrid sparse (+ dense) search over user nodes.
+
+        Candidates are prefiltered by the ``nodes_fts`` index (any query
+        token in name/text), so only nodes with a non-zero sparse score are
+        loaded and ranked.  Queries without tokens fall back to the first
+        500 nodes.  With *query_embedding*, the :data:`DENSE_CANDIDATE_LIMIT`
+        nearest nodes from :meth:`vector_search` join the candidates (they
+        may share no token with the query) and cosine similarity enters the
+        score.
+        """
+        from core.search.hybrid_search import HybridSearchEngine, _tokenize
+
+        tokens = _tokenize(query_text)
+        if tokens:
+            nodes = await self._find_nodes_fts(user_id, tokens, FTS_CANDIDATE_LIMIT)
+        else:
+            nodes = await self.find_nodes(user_id, limit=500)
+        if query_embedding is not None:
+            seen = {node.id for node in nodes}
+            dense = await self.vector_search(user_id, query_embedding, DENSE_CANDIDATE_LIMIT)
+            nodes += [node for node, _ in dense if node.id not in seen]
         engine = HybridSearchEngine(alpha=alpha)
         return engine.search(
             query_text=query_text,
-            query_embedding=None,
+            query_embedding=query_embedding,
             nodes=nodes,
             top_k=top_k,
             use_rrf=use_rrf,
         )
 
+    async def vector_search(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        top_k: int = 10,
+    ) -> list[tuple[Node, float]]:
+        """*top_k* узлов, ближайших к *query_embedding* по косинусу.
+
+        Сначала читаются только id и векторы узлов с эмбеддингом, сходство
+        и выбор лучших считаются одним батчем (:func:`top_k_similar`; с NumPy
+        векторы — представления blob без копирования), и лишь победители
+        загружаются целиком одним :meth:`get_nodes_by_ids`.
+        """
+        async with self._read_conn() as conn:
+            cursor = await conn.execute(_EMBEDDED_NODES_SQL, (user_id,))
+            rows = await cursor.fetchall()
+        if not rows or top_k <= 0:
+            return []
+        vectors = [_decode_embedding_array(blob, dtype) for _, blob, dtype in rows]
+        best = [(rows[i][0], score) for i, score in top_k_similar(query_embedding, vectors, top_k)]
+        nodes = {n.id: n for n in await self.get_nodes_by_ids(user_id, [i for i, _ in best])}
+        return [(nodes[node_id], score) for node_id, score in best if node_id in nodes]
+
+    async def _find_nodes_fts(
+        self, user_id: str, tokens: list[str], limit: int
+    ) -> list[Node]:
+        async with self._read_conn() as conn:
+            # Токены из _tokenize — только [а-яёa-z0-9], кавычки безопасны.
+            match = " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+            cursor = await conn.execute(_FIND_NODES_FTS_SQL, (match, user_id, limit))
+            rows = await cursor.fetchall()
+            return [_row_to_node(row) for row in rows]
+
 
 # Backward-compat alias — canonical implementation lives in core.utils.math
 from core.utils.math import cosine_similarity as _cosine_similarity  # noqa: E402
@@ -12,11 +12,20 @@ The engine is intentionally light — rules do the heavy lifting.
 
 from __future__ import annotations
 
+import asyncio
+import heapq
 import logging
-from datetime import datetime, timezone
+import time
+from operator import attrgetter
 
 from core.graph.api import GraphAPI
-from core.graph.model import Edge, Node
+from core.graph.model import Edge, Node, utc_now_iso
+from core.insights.prepared import (
+    EDGES_BY_RELATION_KEY,
+    PREPARED_GRAPH_KEY,
+    EdgeIndex,
+    PreparedGraph,
+)
 from core.insights.rules import DEFAULT_RULES, InsightCandidate, InsightRule
 
 logger = logging.getLogger(__name__)
@@ -31,6 +40,9 @@ class InsightEngine:
     # Maximum insights to create per single analysis pass
     MAX_PER_PASS = 3
 
+    # Seconds a resolved PERSON node id is reused across passes
+    PERSON_CACHE_TTL = 60.0
+
     def __init__(
         self,
         graph_api: GraphAPI,
@@ -38,6 +50,8 @@ class InsightEngine:
     ) -> None:
         self.graph_api = graph_api
         self.rules = rules if rules is not None else list(DEFAULT_RULES)
+        # user_id -> (PERSON node id, monotonic time it was resolved)
+        self._person_cache: dict[str, tuple[str, float]] = {}
 
     async def run(
         self,
@@ -48,95 +62,125 @@ class InsightEngine:
     ) -> list[Node]:
         """Evaluate all rules and persist resulting INSIGHT nodes.
 
+        A caller that already holds the user graph can pass it in
+        *graph_context* as ``all_nodes`` / ``all_edges`` (and the
+        ``(pattern_type, title)`` set as ``existing_insight_keys``); only the
+        missing parts are loaded from storage. Keys of insights created here
+        are added to a supplied ``existing_insight_keys``.
+
         Returns the list of newly created INSIGHT nodes (may be empty).
         """
         if not new_nodes and not new_edges:
             return []
 
-        # Load full user graph for cross-referencing
-        all_nodes = await self.graph_api.storage.find_nodes(user_id, limit=2000)
-        all_edges = await self.graph_api.storage.list_edges(user_id)
-
-        # Existing insights (for dedup)
-        existing_insights = [
-            n for n in all_nodes if n.type == "INSIGHT"
-        ]
-        existing_keys = {
-            (n.metadata.get("pattern_type", ""), n.name or "")
-            for n in existing_insights
+        all_nodes = graph_context.get("all_nodes")
+        all_edges = graph_context.get("all_edges")
+        existing_keys = graph_context.get("existing_insight_keys")
+        if all_nodes is None or all_edges is None:
+            # Load full user graph for cross-referencing; existing insight
+            # keys (for dedup) come straight from SQL.
+            graph = await self.graph_api.storage.load_user_graph(user_id, node_limit=2000)
+            all_nodes = graph.nodes if all_nodes is None else all_nodes
+            all_edges = graph.edges if all_edges is None else all_edges
+            if existing_keys is None:
+                existing_keys = graph.insight_keys
+        elif existing_keys is None:
+            existing_keys = await self.graph_api.storage.fetch_insight_dedup_keys(user_id)
+
+        # Run all rules concurrently: rules that await I/O overlap, and a
+        # failing rule is logged without affecting the others. Derived node
+        # fields and the edges-by-relation index are computed once for all
+        # rules (see PreparedGraph, EdgeIndex); the caller's graph_context is
+        # not modified.
+        rule_kwargs = {
+            "user_id": user_id,
+            "new_nodes": new_nodes,
+            "new_edges": new_edges,
+            "all_nodes": all_nodes,
+            "all_edges": all_edges,
+            "graph_context": {
+                **graph_context,
+                PREPARED_GRAPH_KEY: PreparedGraph.build(all_nodes),
+                EDGES_BY_RELATION_KEY: EdgeIndex.build(all_edges),
+            },
         }
-
-        # Run all rules
+        results = await asyncio.gather(
+            *(rule.evaluate(**rule_kwargs) for rule in self.rules),
+            return_exceptions=True,
+        )
         candidates: list[InsightCandidate] = []
-        for rule in self.rules:
-            try:
-                result = await rule.evaluate(
-                    user_id=user_id,
-                    new_nodes=new_nodes,
-                    new_edges=new_edges,
-                    all_nodes=all_nodes,
-                    all_edges=all_edges,
-                    graph_context=graph_context,
-                )
+        for rule, result in zip(self.rules, results, strict=True):
+            if isinstance(result, Exception):
+                logger.warning("InsightRule %s failed: %s", rule.name, result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
                 candidates.extend(result)
-            except Exception as exc:
-                logger.warning("InsightRule %s failed: %s", rule.name, exc)
 
-        # Filter by confidence
-        candidates = [c for c in candidates if c.confidence >= self.MIN_CONFIDENCE]
-
-        # De-duplicate against existing
-        fresh: list[InsightCandidate] = []
+        # Filter by confidence and de-duplicate against existing in one pass;
+        # the most confident candidate wins a (pattern_type, title) collision
+        best: dict[tuple[str, str], InsightCandidate] = {}
         for c in candidates:
-            if (c.pattern_type, c.title) not in existing_keys:
-                fresh.append(c)
-                existing_keys.add((c.pattern_type, c.title))
-
-        # Sort by confidence desc, take top N
-        fresh.sort(key=lambda c: c.confidence, reverse=True)
-        fresh = fresh[: self.MAX_PER_PASS]
+            if c.confidence < self.MIN_CONFIDENCE:
+                continue
+            dedup_key = (c.pattern_type, c.title)
+            if dedup_key in existing_keys:
+                continue
+            kept = best.get(dedup_key)
+            if kept is None or c.confidence > kept.confidence:
+                best[dedup_key] = c
+
+        # Top N by confidence without sorting every candidate
+        fresh = heapq.nlargest(self.MAX_PER_PASS, best.values(), key=attrgetter("confidence"))
 
         if not fresh:
             return []
 
-        # Persist INSIGHT nodes
-        created_nodes: list[Node] = []
-        for candidate in fresh:
-            key = f"insight:{candidate.pattern_type}:{candidate.title[:40].lower()}"
-            node = Node(
+        # One timestamp for the whole pass
+        now_iso = utc_now_iso()
+        nodes = [
+            Node(
                 user_id=user_id,
                 type="INSIGHT",
                 name=candidate.title,
                 text=candidate.description,
-                key=key,
+                key=f"insight:{candidate.pattern_type}:{candidate.title[:40].lower()}",
                 metadata={
                     "pattern_type": candidate.pattern_type,
                     "confidence": candidate.confidence,
                     "severity": candidate.severity,
                     "related_node_ids": candidate.related_node_ids,
-                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "created_at": now_iso,
                     **candidate.metadata,
                 },
+                created_at=now_iso,
             )
-            saved = await self.graph_api.storage.upsert_node(node)
-            created_nodes.append(saved)
-
-            # Create GENERATES_INSIGHT edges from related nodes
-            person = await self.graph_api.ensure_person_node(user_id)
-            await self.graph_api.create_edge(
-                user_id=user_id,
-                source_node_id=person.id,
-                target_node_id=saved.id,
-                relation="GENERATES_INSIGHT",
-            )
-            for related_id in candidate.related_node_ids[:5]:
-                await self.graph_api.create_edge(
-                    user_id=user_id,
-                    source_node_id=related_id,
-                    target_node_id=saved.id,
-                    relation="GENERATES_INSIGHT",
-                )
+            for candidate in fresh
+        ]
+        person_id = await self._person_id(user_id)
+
+        # INSIGHT nodes and their GENERATES_INSIGHT edges (from the person and
+        # related nodes) are written in one storage transaction: one BEGIN and
+        # one commit for the whole pass instead of one per batch.
+        storage = self.graph_api.storage
+        async with storage.transaction():
+            created_nodes = await storage.upsert_nodes(nodes)
+            edges: list[Edge] = []
+            for candidate, saved in zip(fresh, created_nodes, strict=True):
+                for source_id in (person_id, *candidate.related_node_ids[:5]):
+                    edges.append(
+                        Edge(
+                            user_id=user_id,
+                            source_node_id=source_id,
+                            target_node_id=saved.id,
+                            relation="GENERATES_INSIGHT",
+                        )
+                    )
+            # related_node_ids may point at nodes deleted or never persisted:
+            # the storage skips edges with a missing endpoint in the same statement
+            await storage.add_edges_between_existing(edges)
 
+        for candidate in fresh:
             logger.info(
                 "Insight created: [%s] %s (conf=%.2f sev=%s)",
                 candidate.pattern_type,
@@ -145,4 +189,21 @@ class InsightEngine:
                 candidate.severity,
             )
 
+        cached_keys = graph_context.get("existing_insight_keys")
+        if cached_keys is not None:
+            cached_keys.update((c.pattern_type, c.title) for c in fresh)
+
         return created_nodes
+
+    async def _person_id(self, user_id: str) -> str:
+        """Id of the user's PERSON node, cached for :attr:`PERSON_CACHE_TTL`.
+
+        Only the id is cached: edges from a node deleted in the meantime are
+        skipped by ``add_edges_between_existing``.
+        """
+        cached = self._person_cache.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < self.PERSON_CACHE_TTL:
+            return cached[0]
+        person = await self.graph_api.ensure_person_node(user_id)
+        self._person_cache[user_id] = (person.id, time.monotonic())
+        return person.id
@@ -0,0 +1,143 @@
+"""PreparedGraph — per-node fields derived once per insight pass.
+
+Rules used to re-derive the same values from ``all_nodes`` on their own
+(lowercased text, hour of the node timestamp, valence). ``PreparedGraph``
+computes them in a single pass as parallel lists indexed like ``all_nodes``;
+``InsightEngine`` builds it once per pass and hands it to every rule through
+``graph_context[PREPARED_GRAPH_KEY]``. Edges are grouped by relation the same
+way (``EdgeIndex`` under ``EDGES_BY_RELATION_KEY``) so a rule reads only the
+relations it cares about instead of scanning ``all_edges``.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+
+from core.graph.model import Edge, Node
+
+__all__ = [
+    "EDGES_BY_RELATION_KEY",
+    "PREPARED_GRAPH_KEY",
+    "EdgeIndex",
+    "PreparedGraph",
+    "node_hour",
+    "node_valence",
+]
+
+PREPARED_GRAPH_KEY = "prepared_graph"
+EDGES_BY_RELATION_KEY = "edges_by_relation"
+
+# ``hours`` entry of a node without a parseable timestamp
+NO_HOUR = -1
+
+
+def node_hour(node: Node) -> int | None:
+    """Hour of ``metadata['created_at']`` (or ``node.created_at``), if parseable."""
+    ts = node.metadata.get("created_at") or node.created_at
+    if not ts:
+        return None
+    return _iso_hour(str(ts))
+
+
+@lru_cache(maxsize=4096)
+def _iso_hour(value: str) -> int | None:
+    """Hour of an ISO-8601 timestamp, memoised.
+
+    Node timestamps never change and every pass re-prepares the same history,
+    so each distinct ``created_at`` is parsed once (``Node`` has slots, so the
+    result cannot be stored on the node itself).
+    """
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).hour
+    except ValueError:
+        return None
+
+
+def node_valence(node: Node) -> float:
+    """``metadata['valence']`` as float: 0.0 when absent, NaN when not numeric."""
+    if not isinstance(node.metadata, dict):
+        return math.nan
+    try:
+        return float(node.metadata.get("valence", 0))
+    except (TypeError, ValueError):
+        return math.nan
+
+
+@dataclass(slots=True)
+class PreparedGraph:
+    """Derived node fields as parallel lists (``types[i]`` is ``nodes[i].type``).
+
+    ``hours`` and ``valence`` are only derived for EMOTION nodes, the only
+    type the rules read them for; other nodes get ``NO_HOUR`` / NaN so their
+    lazily decoded metadata is never parsed.
+    """
+
+    nodes: list[Node]
+    types: list[str]
+    lc_text: list[str]
+    hours: list[int]
+    valence: list[float]
+
+    @classmethod
+    def build(cls, nodes: list[Node]) -> PreparedGraph:
+        types: list[str] = []
+        lc_text: list[str] = []
+        hours: list[int] = []
+        valence: list[float] = []
+        for node in nodes:
+            types.append(node.type)
+            lc_text.append((node.text or node.name or "").lower())
+            if node.type == "EMOTION":
+                hour = node_hour(node)
+                hours.append(NO_HOUR if hour is None else hour)
+                valence.append(node_valence(node))
+            else:
+                hours.append(NO_HOUR)
+                valence.append(math.nan)
+        return cls(nodes=nodes, types=types, lc_text=lc_text, hours=hours, valence=valence)
+
+    @classmethod
+    def from_context(cls, graph_context: dict, nodes: list[Node]) -> PreparedGraph:
+        """The engine-built graph for *nodes*, or a fresh one (rules run directly)."""
+        prepared = graph_context.get(PREPARED_GRAPH_KEY)
+        if isinstance(prepared, cls) and prepared.nodes is nodes:
+            return prepared
+        return cls.build(nodes)
+
+
+@dataclass(slots=True)
+class EdgeIndex:
+    """Positions in ``edges`` grouped by ``relation``."""
+
+    edges: list[Edge]
+    by_relation: dict[str, list[int]]
+
+    @classmethod
+    def build(cls, edges: list[Edge]) -> EdgeIndex:
+        by_relation: dict[str, list[int]] = {}
+        for i, edge in enumerate(edges):
+            positions = by_relation.get(edge.relation)
+            if positions is None:
+                by_relation[edge.relation] = [i]
+            else:
+                positions.append(i)
+        return cls(edges=edges, by_relation=by_relation)
+
+    @classmethod
+    def from_context(cls, graph_context: dict, edges: list[Edge]) -> EdgeIndex:
+        """The engine-built index for *edges*, or a fresh one (rules run directly)."""
+        index = graph_context.get(EDGES_BY_RELATION_KEY)
+        if isinstance(index, cls) and index.edges is edges:
+            return index
+        return cls.build(edges)
+
+    def with_relations(self, *relations: str) -> list[Edge]:
+        """Edges of the given relations, in their order in ``edges``."""
+        groups = [self.by_relation[rel] for rel in relations if rel in self.by_relation]
+        positions = groups[0] if len(groups) == 1 else heapq.merge(*groups)
+        edges = self.edges
+        return [edges[i] for i in positions]
@@ -11,10 +11,10 @@ from __future__ import annotations
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
 from typing import Any
 
 from core.graph.model import Edge, Node
+from core.insights.prepared import EdgeIndex, PreparedGraph, node_hour
 
 logger = logging.getLogger(__name__)
 
@@ -88,14 +88,13 @@ class TimePatternRule(InsightRule):
         graph_context: dict,
     ) -> list[InsightCandidate]:
         insights: list[InsightCandidate] = []
+        prepared = PreparedGraph.from_context(graph_context, all_nodes)
+        # Same for every new node: counted once, on the first late negative emotion
+        late_negative_count: int | None = None
 
         for node in new_nodes:
-            hour = self._extract_hour(node)
-            if hour is None:
-                continue
-
-            is_late = hour in self.LATE_NIGHT or hour in self.EARLY_MORNING
-            if not is_late:
+            hour = node_hour(node)
+            if hour is None or not self._is_late_hour(hour):
                 continue
 
             # Check impulsive behaviour text
@@ -121,14 +120,8 @@ class TimePatternRule(InsightRule):
                 valence = float(node.metadata.get("valence", 0))
                 if valence < -0.4:
                     label = node.metadata.get("label", "")
-                    # Count historical late-night negative emotions
-                    late_negative_count = sum(
-                        1 for n in all_nodes
-                        if n.type == "EMOTION"
-                        and isinstance(n.metadata, dict)
-                        and float(n.metadata.get("valence", 0)) < -0.4
-                        and self._is_late(n)
-                    )
+                    if late_negative_count is None:
+                        late_negative_count = self._count_late_negative(prepared)
                     if late_negative_count >= 2:
                         insights.append(InsightCandidate(
                             pattern_type="time_pattern",
@@ -146,20 +139,18 @@ class TimePatternRule(InsightRule):
 
         return insights
 
-    def _extract_hour(self, node: Node) -> int | None:
-        ts = node.metadata.get("created_at") or node.created_at
-        if not ts:
-            return None
-        try:
-            dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
-            return dt.hour
-        except (ValueError, TypeError):
-            return None
-
-    def _is_late(self, node: Node) -> bool:
-        hour = self._extract_hour(node)
-        if hour is None:
-            return False
+    def _count_late_negative(self, prepared: PreparedGraph) -> int:
+        """Historical late-night negative emotions (valence < -0.4)."""
+        return sum(
+            1
+            for node_type, valence, hour in zip(
+                prepared.types, prepared.valence, prepared.hours, strict=True
+            )
+            if node_type == "EMOTION" and valence < -0.4 and self._is_late_hour(hour)
+        )
+
+    def _is_late_hour(self, hour: int) -> bool:
+        # range membership is False for the NO_HOUR sentinel (-1)
         return hour in self.LATE_NIGHT or hour in self.EARLY_MORNING
 
 
@@ -176,6 +167,9 @@ class EmotionalCycleRule(InsightRule):
     # Minimum occurrences to consider it a cycle
     MIN_CYCLE_COUNT = 3
 
+    # Edge relations linking a PART to an EMOTION (either direction)
+    CYCLE_RELATIONS = ("TRIGGERED_BY", "TRIGGERS", "PROTECTS")
+
     async def evaluate(
         self,
         user_id: str,
@@ -193,20 +187,21 @@ class EmotionalCycleRule(InsightRule):
 
         # Find parts that are triggered by emotions
         part_trigger_emotions: dict[str, set[str]] = {}  # part_id → {emotion_labels}
-        for edge in all_edges:
-            if edge.relation in ("TRIGGERED_BY", "TRIGGERS", "PROTECTS"):
-                if edge.source_node_id in part_nodes and edge.target_node_id in emotion_nodes:
-                    pid = edge.source_node_id
-                    elabel = emotion_nodes[edge.target_node_id].metadata.get("label", "")
-                    if elabel:
-                        part_trigger_emotions.setdefault(pid, set()).add(elabel)
-                elif edge.target_node_id in part_nodes and edge.source_node_id in emotion_nodes:
-                    pid = edge.target_node_id
-                    elabel = emotion_nodes[edge.source_node_id].metadata.get("label", "")
-                    if elabel:
-                        part_trigger_emotions.setdefault(pid, set()).add(elabel)
+        edge_index = EdgeIndex.from_context(graph_context, all_edges)
+        for edge in edge_index.with_relations(*self.CYCLE_RELATIONS):
+            src, tgt = edge.source_node_id, edge.target_node_id
+            if src in part_nodes and (emotion := emotion_nodes.get(tgt)) is not None:
+                pid = src
+            elif tgt in part_nodes and (emotion := emotion_nodes.get(src)) is not None:
+                pid = tgt
+            else:
+                continue
+            elabel = emotion.metadata.get("label", "")
+            if elabel:
+                part_trigger_emotions.setdefault(pid, set()).add(elabel)
 
         # If a part is connected to 2+ different negative emotions ≥ MIN_CYCLE_COUNT times
+        new_ids = {n.id for n in new_nodes}
         for part_id, emotion_labels in part_trigger_emotions.items():
             if len(emotion_labels) >= 2:
                 part = part_nodes[part_id]
@@ -214,7 +209,6 @@ class EmotionalCycleRule(InsightRule):
                 labels_str = ", ".join(sorted(emotion_labels))
 
                 # Check if any new node is involved
-                new_ids = {n.id for n in new_nodes}
                 if part_id in new_ids or any(
                     n.id in new_ids for n in emotion_nodes.values()
                     if n.metadata.get("label") in emotion_labels
@@ -271,6 +265,8 @@ class BehavioralPatternRule(InsightRule):
         "ругал": "конфликт",
         "скандал": "конфликт",
     }
+    # (marker, label) pairs in priority order: the first marker found wins
+    _MARKER_ITEMS = tuple(BEHAVIOR_MARKERS.items())
 
     async def evaluate(
         self,
@@ -284,41 +280,50 @@ class BehavioralPatternRule(InsightRule):
         insights: list[InsightCandidate] = []
 
         # Gather all events that match behavior markers
-        behavior_events: dict[str, list[Node]] = {}
-        for node in all_nodes:
-            if node.type not in ("EVENT", "THOUGHT", "NOTE"):
+        # Count events per behavior label (only the counts are used)
+        prepared = PreparedGraph.from_context(graph_context, all_nodes)
+        behavior_counts: dict[str, int] = {}
+        for node_type, text in zip(prepared.types, prepared.lc_text, strict=True):
+            if node_type not in ("EVENT", "THOUGHT", "NOTE"):
                 continue
-            text = (node.text or node.name or "").lower()
-            for marker, label in self.BEHAVIOR_MARKERS.items():
-                if marker in text:
-                    behavior_events.setdefault(label, []).append(node)
-                    break
+            label = self._behavior_label(text)
+            if label is not None:
+                behavior_counts[label] = behavior_counts.get(label, 0) + 1
 
         # Check if new nodes contain a behavior marker
         for node in new_nodes:
-            text = (node.text or node.name or "").lower()
-            for marker, label in self.BEHAVIOR_MARKERS.items():
-                if marker in text:
-                    history = behavior_events.get(label, [])
-                    count = len(history)
-                    if count >= 2:
-                        insights.append(InsightCandidate(
-                            pattern_type="behavioral_pattern",
-                            title=f"Повторяется: {label}",
-                            description=(
-                                f"«{label}» зафиксировано уже {count} раз. "
-                                "Это может быть устойчивая стратегия саморегуляции. "
-                                "Стоит обратить внимание, что стоит за этим."
-                            ),
-                            confidence=min(0.4 + count * 0.1, 0.85),
-                            severity="notice" if count < 5 else "warning",
-                            related_node_ids=[node.id],
-                            metadata={"behavior": label, "count": count},
-                        ))
-                    break
+            label = self._behavior_label((node.text or node.name or "").lower())
+            if label is None:
+                continue
+            count = behavior_counts.get(label, 0)
+            if count >= 2:
+                insights.append(InsightCandidate(
+                    pattern_type="behavioral_pattern",
+                    title=f"Повторяется: {label}",
+                    description=(
+                        f"«{label}» зафиксировано уже {count} раз. "
+                        "Это может быть устойчивая стратегия саморегуляции. "
+                        "Стоит обратить внимание, что стоит за этим."
+                    ),
+                    confidence=min(0.4 + count * 0.1, 0.85),
+                    severity="notice" if count < 5 else "warning",
+                    related_node_ids=[node.id],
+                    metadata={"behavior": label, "count": count},
+                ))
 
         return insights
 
+    def _behavior_label(self, text: str) -> str | None:
+        """Label of the first ``BEHAVIOR_MARKERS`` entry found in *text*.
+
+        Plain substring checks: each is a C-level search, and for this many
+        short markers a compiled regex alternation is no faster in CPython.
+        """
+        for marker, label in self._MARKER_ITEMS:
+            if marker in text:
+                return label
+        return None
+
 
 class NeedFrustrationRule(InsightRule):
     """Detect repeatedly frustrated needs.
@@ -347,8 +352,9 @@ class NeedFrustrationRule(InsightRule):
         emotion_nodes = {n.id: n for n in all_nodes if n.type == "EMOTION"}
 
         need_signal_count: dict[str, int] = {}  # need_id → count of neg signals
-        for edge in all_edges:
-            if edge.relation == "SIGNALS_NEED" and edge.target_node_id in need_nodes:
+        edge_index = EdgeIndex.from_context(graph_context, all_edges)
+        for edge in edge_index.with_relations("SIGNALS_NEED"):
+            if edge.target_node_id in need_nodes:
                 src = emotion_nodes.get(edge.source_node_id)
                 if src and float(src.metadata.get("valence", 0)) < -0.3:
                     need_signal_count[edge.target_node_id] = (
@@ -24,6 +24,7 @@ class JournalStorage:
     def __init__(self, db_path: str | Path = "data/self_os.db") -> None:
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Hot paths test this inline instead of awaiting _ensure_initialized.
         self._initialized = False
         self._init_lock = asyncio.Lock()
 
@@ -71,7 +72,8 @@ class JournalStorage:
         source: str,
         session_id: str | None = None,
     ) -> JournalEntry:
-        await self._ensure_initialized()
+        if not self._initialized:
+            await self._ensure_initialized()
 
         async with self._connect() as conn:
             cursor = await conn.execute(
@@ -89,7 +91,8 @@ class JournalStorage:
         )
 
     async def list_entries(self, user_id: str, limit: int = 100) -> list[JournalEntry]:
-        await self._ensure_initialized()
+        if not self._initialized:
+            await self._ensure_initialized()
 
         async with self._connect() as conn:
             cursor = await conn.execute(
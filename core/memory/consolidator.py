@@ -16,13 +16,24 @@ from __future__ import annotations
 
 import logging
 import math
+from contextlib import aclosing
 from dataclasses import dataclass
 from datetime import UTC, datetime
+from typing import TYPE_CHECKING
 from uuid import uuid4
 
-from core.graph.model import Node, ebbinghaus_retention, ensure_metadata_defaults, get_node_embedding
+from core.graph.model import (
+    Edge,
+    Node,
+    ebbinghaus_retention,
+    ensure_metadata_defaults,
+    get_node_embedding,
+)
 from core.graph.storage import GraphStorage
 
+if TYPE_CHECKING:
+    from core.graph.neo4j_storage import Neo4jStorage
+
 logger = logging.getLogger(__name__)
 
 # ── Configuration knobs (centralised in core.defaults) ────────────
@@ -74,15 +85,22 @@ class MemoryConsolidator:
         Optional LLM client for abstraction summarisation.  When
         ``None``, :meth:`abstract` falls back to counting candidates
         without actually merging them.
+    semantic_store:
+        Optional :class:`~core.graph.neo4j_storage.Neo4jStorage` (semantic
+        memory layer).  When set, BELIEF nodes created by
+        :meth:`consolidate` and their edges are promoted into it with bulk
+        writes, once per run; :meth:`abstract` merges are mirrored there.
     """
 
     def __init__(
         self,
         storage: GraphStorage,
         llm_client: object | None = None,
+        semantic_store: Neo4jStorage | None = None,
     ) -> None:
         self.storage = storage
         self._llm_client = llm_client
+        self._semantic_store = semantic_store
 
     # ── 1. Consolidate ────────────────────────────────────────────
 
@@ -101,6 +119,7 @@ class MemoryConsolidator:
         2. Cluster by cosine similarity ≥ *similarity_threshold*.
         3. For each cluster create one BELIEF or THOUGHT node.
         4. Re-point edges via ``storage.merge_nodes()``.
+        5. Promote the new nodes to the semantic store, if one is set.
         """
         candidates = await self.storage.get_nodes_by_retention(
             user_id,
@@ -117,6 +136,7 @@ class MemoryConsolidator:
         clusters = _cluster_by_embedding(embedded, similarity_threshold, min_cluster_size)
         total_merged = 0
         total_created = 0
+        promoted: list[Node] = []
 
         for cluster in clusters:
             # Combine texts
@@ -139,7 +159,7 @@ class MemoryConsolidator:
                 created_at=datetime.now(UTC).isoformat(),
             )
 
-            await self.storage.merge_nodes(user_id, source_ids, merged_node)
+            promoted.append(await self.storage.merge_nodes(user_id, source_ids, merged_node))
             total_merged += len(cluster)
             total_created += 1
             logger.info(
@@ -147,12 +167,49 @@ class MemoryConsolidator:
                 len(cluster), merged_node.id, user_id,
             )
 
+        await self._promote(user_id, promoted)
         return ConsolidationReport(
             clusters_found=len(clusters),
             nodes_merged=total_merged,
             new_nodes_created=total_created,
         )
 
+    async def _promote(self, user_id: str, nodes: list[Node]) -> None:
+        """Copy *nodes* and their edges into the semantic store in bulk.
+
+        Edges touching a promoted node are sent along with one bulk write;
+        the semantic store skips those whose other endpoint it does not hold.
+        The semantic layer is secondary: a failure is logged and the SQLite
+        consolidation stands.
+        """
+        if self._semantic_store is None or not nodes:
+            return
+        promoted_ids = {n.id for n in nodes}
+        edges: list[Edge] = []
+        async with aclosing(self.storage.iter_edges(user_id)) as stream:
+            async for edge in stream:
+                if edge.source_node_id in promoted_ids or edge.target_node_id in promoted_ids:
+                    edges.append(edge)
+        try:
+            await self._semantic_store.bulk_upsert_nodes(nodes)
+            await self._semantic_store.bulk_add_edges(edges)
+        except Exception as exc:
+            logger.warning("Semantic promotion failed for user %s: %s", user_id, exc)
+
+    async def _promote_merge(self, user_id: str, source_ids: list[str], target: Node) -> None:
+        """Mirror a :meth:`abstract` merge in the semantic store.
+
+        The sources are level-1 BELIEFs promoted by :meth:`consolidate`, so the
+        semantic copy re-points their relationships onto *target* as well.
+        Failures are logged, as in :meth:`_promote`.
+        """
+        if self._semantic_store is None:
+            return
+        try:
+            await self._semantic_store.merge_nodes(user_id, source_ids, target)
+        except Exception as exc:
+            logger.warning("Semantic promotion failed for user %s: %s", user_id, exc)
+
     # ── 2. Abstract ───────────────────────────────────────────────
 
     async def abstract(self, user_id: str) -> AbstractionReport:
@@ -209,6 +266,7 @@ class MemoryConsolidator:
             )
 
             await self.storage.merge_nodes(user_id, source_ids, archetype)
+            await self._promote_merge(user_id, source_ids, archetype)
             abstracted += 1
             logger.info(
                 "Abstracted %d beliefs into archetype %s for user %s",
@@ -236,41 +294,41 @@ class MemoryConsolidator:
           are soft-deleted (**tombstoned**).
         * BELIEF / NEED / VALUE nodes with ``review_count ≥ 2`` are never deleted.
         """
-        await self.storage._ensure_initialized()
-        conn = await self.storage._get_conn()
-
         # --- edges ---
-        edges = await self.storage.list_edges(user_id)
-        edges_removed = 0
-        for edge in edges:
-            review_count = int(edge.metadata.get("review_count", 0))
-            retention = ebbinghaus_retention(edge, review_count=review_count)
-            if retention < edge_threshold:
-                await conn.execute("DELETE FROM edges WHERE id = ?", (edge.id,))
-                edges_removed += 1
+        stale_edge_ids: list[str] = []
+        async with aclosing(self.storage.iter_edges(user_id)) as edges:
+            async for edge in edges:
+                review_count = int(edge.metadata.get("review_count", 0))
+                retention = ebbinghaus_retention(edge, review_count=review_count)
+                if retention < edge_threshold:
+                    stale_edge_ids.append(edge.id)
+        # Committed before the orphan scan: reads go through the reader pool
+        # and only see committed data, so nodes orphaned here are found below.
+        edges_removed = await self.storage.delete_edges(stale_edge_ids)
 
         # --- orphan nodes ---
         nodes = await self.storage.find_nodes(user_id, limit=1000)
-        remaining_edges = await self.storage.list_edges(user_id)
         connected_ids: set[str] = set()
-        for e in remaining_edges:
-            connected_ids.add(e.source_node_id)
-            connected_ids.add(e.target_node_id)
+        async with aclosing(self.storage.iter_edges(user_id)) as edges:
+            async for e in edges:
+                connected_ids.add(e.source_node_id)
+                connected_ids.add(e.target_node_id)
 
         nodes_tombstoned = 0
-        for node in nodes:
-            if node.id in connected_ids:
-                continue
-            if node.type == "PERSON":
-                continue
-            if node.type in PROTECTED_TYPES and int(node.metadata.get("review_count", 0)) >= PROTECTED_REVIEW_MIN:
-                continue
-            salience = float(node.metadata.get("salience_score", 1.0))
-            if salience < node_threshold:
-                await self.storage.soft_delete_node(node.id)
-                nodes_tombstoned += 1
+        # Tombstones share one commit on the storage writer
+        async with self.storage.transaction():
+            for node in nodes:
+                if node.id in connected_ids:
+                    continue
+                if node.type == "PERSON":
+                    continue
+                if node.type in PROTECTED_TYPES and int(node.metadata.get("review_count", 0)) >= PROTECTED_REVIEW_MIN:
+                    continue
+                salience = float(node.metadata.get("salience_score", 1.0))
+                if salience < node_threshold:
+                    await self.storage.soft_delete_node(node.id)
+                    nodes_tombstoned += 1
 
-        await conn.commit()
         logger.info(
             "Forget pass for user %s: %d edges removed, %d nodes tombstoned",
             user_id, edges_removed, nodes_tombstoned,
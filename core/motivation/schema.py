@@ -265,6 +265,7 @@ class MotivationStateStore:
     def __init__(self, db_path: str | Path = "data/self_os.db") -> None:
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Hot paths test this inline instead of awaiting _ensure_initialized.
         self._initialized = False
         self._init_lock = asyncio.Lock()
 
@@ -314,7 +315,8 @@ class MotivationStateStore:
         state:
             The :class:`MotivationState` snapshot to store.
         """
-        await self._ensure_initialized()
+        if not self._initialized:
+            await self._ensure_initialized()
         async with aiosqlite.connect(str(self.db_path)) as conn:
             await conn.execute(
                 """
@@ -385,7 +387,8 @@ class MotivationStateStore:
         limit:
             Maximum number of snapshots to return.  Defaults to ``10``.
         """
-        await self._ensure_initialized()
+        if not self._initialized:
+            await self._ensure_initialized()
         async with aiosqlite.connect(str(self.db_path)) as conn:
             conn.row_factory = aiosqlite.Row
             cursor = await conn.execute(
@@ -16,7 +16,6 @@ biological brain.
 from __future__ import annotations
 
 import asyncio
-import json
 import uuid
 from collections import deque
 from collections.abc import Sequence
@@ -27,6 +26,8 @@ from typing import Any
 import aiosqlite
 
 from core.neuro.schema import BrainState, Neuron, Synapse
+from core.utils.json_codec import dumps as _dumps
+from core.utils.json_codec import loads as _loads
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # Constants
@@ -242,7 +243,7 @@ class NeuroCore:
                         valence,
                         arousal,
                         dominance,
-                        json.dumps(meta, ensure_ascii=False),
+                        _dumps(meta),
                         now,
                         nid,
                         user_id,
@@ -265,7 +266,7 @@ class NeuroCore:
                         arousal,
                         dominance,
                         decay,
-                        json.dumps(meta, ensure_ascii=False),
+                        _dumps(meta),
                         now,
                         now,
                     ),
@@ -315,7 +316,7 @@ class NeuroCore:
         assert self._conn is not None
 
         now = datetime.now(timezone.utc).isoformat()
-        meta_json = json.dumps(metadata or {}, ensure_ascii=False)
+        meta_json = _dumps(metadata or {})
 
         async with self._lock:
             cursor = await self._conn.execute(
@@ -647,11 +648,11 @@ class NeuroCore:
                     state.dominant_emotion,
                     state.emotional_valence,
                     state.emotional_arousal,
-                    json.dumps(state.active_parts, ensure_ascii=False),
-                    json.dumps(state.active_beliefs, ensure_ascii=False),
-                    json.dumps(state.active_needs, ensure_ascii=False),
+                    _dumps(state.active_parts),
+                    _dumps(state.active_beliefs),
+                    _dumps(state.active_needs),
                     state.cognitive_load,
-                    json.dumps(state.metadata, ensure_ascii=False),
+                    _dumps(state.metadata),
                 ),
             )
             await self._conn.commit()
@@ -722,11 +723,11 @@ class NeuroCore:
                     dominant_emotion=r["dominant_emotion"],
                     emotional_valence=r["emotional_valence"],
                     emotional_arousal=r["emotional_arousal"],
-                    active_parts=json.loads(r["active_parts_json"]),
-                    active_beliefs=json.loads(r["active_beliefs_json"]),
-                    active_needs=json.loads(r["active_needs_json"]),
+                    active_parts=_loads(r["active_parts_json"]),
+                    active_beliefs=_loads(r["active_beliefs_json"]),
+                    active_needs=_loads(r["active_needs_json"]),
                     cognitive_load=r["cognitive_load"],
-                    metadata=json.loads(r["metadata_json"]),
+                    metadata=_loads(r["metadata_json"]),
                 )
             )
         return results
@@ -8,10 +8,11 @@ Terminology (neurobiology -> data model):
 
 from __future__ import annotations
 
-import json
 from dataclasses import dataclass, field
 from typing import Any
 
+from core.utils.json_codec import loads as _loads
+
 
 # ------------------------------------------------------------------
 # Neuron
@@ -70,7 +71,7 @@ class Neuron:
             arousal=row["arousal"],
             dominance=row["dominance"],
             decay_rate=row["decay_rate"],
-            metadata=json.loads(meta) if meta else {},
+            metadata=_loads(meta) if meta else {},
             created_at=row["created_at"],
             last_activated=row["last_activated"],
             is_deleted=bool(row["is_deleted"]),
@@ -121,7 +122,7 @@ class Synapse:
             target_neuron_id=row["target_neuron_id"],
             relation=row["relation"],
             weight=row["weight"],
-            metadata=json.loads(meta) if meta else {},
+            metadata=_loads(meta) if meta else {},
             created_at=row["created_at"],
             last_activated=row["last_activated"],
         )
@@ -379,7 +379,7 @@ class MessageProcessor:
     async def _load_recent_insights(self, user_id: str, limit: int = 3) -> list[dict]:
         """Load the N most recent INSIGHT nodes from the graph."""
         try:
-            insights = await self.graph_api.storage.find_nodes(
+            insights = await self.graph_api.storage.find_nodes_recent(
                 user_id, node_type="INSIGHT", limit=limit,
             )
             insights.sort(
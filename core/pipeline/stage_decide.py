@@ -66,8 +66,6 @@ class DecideStage:
         retrieved_context: list[VectorSearchResult],
         graph_context: dict,
     ) -> DecideResult:
-        extra_edges: list[Edge] = []
-
         # --- Policy selection ---
         has_part = any(n.type == "PART" for n in created_nodes)
         has_value = any(n.type == "VALUE" for n in created_nodes)
@@ -88,31 +86,27 @@ class DecideStage:
             policy = "REFLECT"
 
         # --- Task → Project linking ---
+        pending_edges: list[Edge] = []
         tasks = [n for n in created_nodes if n.type == "TASK"]
         current_projects = [n for n in created_nodes if n.type == "PROJECT"]
+        project: Node | None = None
         if tasks and current_projects:
-            for task in tasks:
-                edge = await self.graph_api.create_edge(
-                    user_id=user_id,
-                    source_node_id=current_projects[0].id,
-                    target_node_id=task.id,
-                    relation="HAS_TASK",
-                )
-                if edge:
-                    extra_edges.append(edge)
+            project = current_projects[0]
         elif tasks and not current_projects:
             all_projects = await self.graph_api.get_user_nodes_by_type(user_id, "PROJECT")
             all_projects_sorted = sorted(all_projects, key=lambda n: n.created_at or "", reverse=True)
             if all_projects_sorted:
-                for task in tasks:
-                    edge = await self.graph_api.create_edge(
-                        user_id=user_id,
-                        source_node_id=all_projects_sorted[0].id,
-                        target_node_id=task.id,
-                        relation="HAS_TASK",
-                    )
-                    if edge:
-                        extra_edges.append(edge)
+                project = all_projects_sorted[0]
+        if project is not None:
+            pending_edges.extend(
+                Edge(
+                    user_id=user_id,
+                    source_node_id=project.id,
+                    target_node_id=task.id,
+                    relation="HAS_TASK",
+                )
+                for task in tasks
+            )
 
         # --- Parts memory + conflict detection ---
         part_nodes = [n for n in created_nodes if n.type == "PART"]
@@ -124,18 +118,22 @@ class DecideStage:
                 parts_context.append(history)
 
         if part_nodes and value_nodes:
-            for part in part_nodes:
-                for value in value_nodes:
-                    conflict_edge = await self.graph_api.create_edge(
-                        user_id=user_id,
-                        source_node_id=part.id,
-                        target_node_id=value.id,
-                        relation="CONFLICTS_WITH",
-                        metadata={"auto": "session_part_value_conflict"},
-                    )
-                    if conflict_edge:
-                        extra_edges.append(conflict_edge)
-                        graph_context["session_conflict"] = True
+            pending_edges.extend(
+                Edge(
+                    user_id=user_id,
+                    source_node_id=part.id,
+                    target_node_id=value.id,
+                    relation="CONFLICTS_WITH",
+                    metadata={"auto": "session_part_value_conflict"},
+                )
+                for part in part_nodes
+                for value in value_nodes
+            )
+
+        # Task links and conflicts are written in one transaction.
+        extra_edges = await self.graph_api.create_edges(pending_edges)
+        if any(edge.relation == "CONFLICTS_WITH" for edge in extra_edges):
+            graph_context["session_conflict"] = True
 
         # --- Mood update ---
         emotion_nodes = [n for n in created_nodes if n.type == "EMOTION"]
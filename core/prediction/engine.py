@@ -120,7 +120,7 @@ class PredictiveEngine:
             EWMA model does not use this for regression, but it will be
             significant once the SSM model is introduced in Stage 4+).
         """
-        snapshots = await self._storage.get_mood_snapshots(user_id, limit=30)
+        snapshots = await self._storage.get_mood_snapshot_rows(user_id, limit=30)
         now = datetime.now(UTC).isoformat()
 
         if not snapshots:
@@ -135,23 +135,23 @@ class PredictiveEngine:
                 created_at=now,
             )
 
-        # Snapshots are ordered DESC (newest first) by get_mood_snapshots.
+        # Snapshots are ordered DESC (newest first) by get_mood_snapshot_rows.
         # Build EWMA from oldest to newest.
         ordered = list(reversed(snapshots))
-        v = float(ordered[0].get("valence_avg") or 0.0)
-        a = float(ordered[0].get("arousal_avg") or 0.0)
-        d = float(ordered[0].get("dominance_avg") or 0.5)
+        v = float(ordered[0].valence_avg or 0.0)
+        a = float(ordered[0].arousal_avg or 0.0)
+        d = float(ordered[0].dominance_avg or 0.5)
 
         for snap in ordered[1:]:
-            sv = float(snap.get("valence_avg") or 0.0)
-            sa = float(snap.get("arousal_avg") or 0.0)
-            sd = float(snap.get("dominance_avg") or 0.5)
+            sv = float(snap.valence_avg or 0.0)
+            sa = float(snap.arousal_avg or 0.0)
+            sd = float(snap.dominance_avg or 0.5)
             v = self._alpha * sv + (1 - self._alpha) * v
             a = self._alpha * sa + (1 - self._alpha) * a
             d = self._alpha * sd + (1 - self._alpha) * d
 
         # Dominant label from most recent snapshot
-        label = str(snapshots[0].get("dominant_label") or "")
+        label = str(snapshots[0].dominant_label or "")
         confidence = min(0.9, len(snapshots) / 30.0)
 
         return PsycheStateForecast(
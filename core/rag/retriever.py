@@ -7,6 +7,7 @@ structured textual context suitable for LLM prompts.
 
 from __future__ import annotations
 
+import asyncio
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -34,6 +35,7 @@ class GraphRAGRetriever:
         query: str,
         top_k: int = 5,
         alpha: float = 0.7,
+        query_embedding: list[float] | None = None,
     ) -> list[tuple["Node", float]]:
         """Return up to *top_k* nodes most relevant to *query*.
 
@@ -46,6 +48,7 @@ class GraphRAGRetriever:
             query_text=query,
             alpha=alpha,
             top_k=top_k,
+            query_embedding=query_embedding,
         )
 
     async def build_context(
@@ -53,6 +56,7 @@ class GraphRAGRetriever:
         user_id: str,
         query: str,
         top_k: int = 5,
+        query_embedding: list[float] | None = None,
     ) -> str:
         """Build a structured textual context string for LLM prompting.
 
@@ -60,25 +64,33 @@ class GraphRAGRetriever:
         neighbours so that the LLM has relational information, not just
         isolated facts.
         """
-        results = await self.retrieve(user_id, query, top_k=top_k)
+        results = await self.retrieve(user_id, query, top_k=top_k, query_embedding=query_embedding)
         if not results:
             return ""
 
+        # Neighbour lookups are independent per result: run them concurrently.
+        neighbour_lists = await asyncio.gather(
+            *(self._neighbours(user_id, node.id) for node, _ in results)
+        )
+
         lines: list[str] = ["=== Retrieved Context ==="]
-        for node, score in results:
+        for (node, score), neighbours in zip(results, neighbour_lists, strict=True):
             node_label = node.name or node.text or node.id
             lines.append(f"[{node.type}] {node_label} (score={score:.3f})")
-
-            # 1-hop neighbours
-            out_edges = await self.storage.get_edges_from_node(user_id, node.id)
-            in_edges = await self.storage.get_edges_to_node(user_id, node.id)
-
-            neighbour_ids = list({e.target_node_id for e in out_edges} | {e.source_node_id for e in in_edges})
-            if neighbour_ids:
-                neighbours = await self.storage.get_nodes_by_ids(user_id, neighbour_ids[:5])
-                for nb in neighbours:
-                    nb_label = nb.name or nb.text or nb.id
-                    lines.append(f"  → [{nb.type}] {nb_label}")
+            for nb in neighbours:
+                nb_label = nb.name or nb.text or nb.id
+                lines.append(f"  → [{nb.type}] {nb_label}")
 
         lines.append("=========================")
         return "\n".join(lines)
+
+    async def _neighbours(self, user_id: str, node_id: str) -> list[Node]:
+        """Return up to 5 immediate (1-hop) neighbours of *node_id*."""
+        out_edges, in_edges = await asyncio.gather(
+            self.storage.get_edges_from_node(user_id, node_id),
+            self.storage.get_edges_to_node(user_id, node_id),
+        )
+        neighbour_ids = list({e.target_node_id for e in out_edges} | {e.source_node_id for e in in_edges})
+        if not neighbour_ids:
+            return []
+        return await self.storage.get_nodes_by_ids(user_id, neighbour_ids[:5])
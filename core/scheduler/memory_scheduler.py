@@ -28,6 +28,7 @@ from typing import TYPE_CHECKING
 from core.memory.consolidator import MemoryConsolidator
 
 if TYPE_CHECKING:
+    from core.graph.neo4j_storage import Neo4jStorage
     from core.graph.storage import GraphStorage
 
 logger = logging.getLogger(__name__)
@@ -51,6 +52,9 @@ class MemoryScheduler:
         Interval (hours) between abstraction runs.
     forget_hours:
         Interval (hours) between forgetting runs.
+    semantic_store:
+        Optional Neo4j semantic memory layer passed to
+        :class:`~core.memory.consolidator.MemoryConsolidator`.
     """
 
     def __init__(
@@ -60,9 +64,10 @@ class MemoryScheduler:
         consolidate_hours: int = CONSOLIDATE_INTERVAL_HOURS,
         abstract_hours: int = ABSTRACT_INTERVAL_HOURS,
         forget_hours: int = FORGET_INTERVAL_HOURS,
+        semantic_store: Neo4jStorage | None = None,
     ) -> None:
         self._storage = storage
-        self._consolidator = MemoryConsolidator(storage)
+        self._consolidator = MemoryConsolidator(storage, semantic_store=semantic_store)
         self._consolidate_hours = consolidate_hours
         self._abstract_hours = abstract_hours
         self._forget_hours = forget_hours
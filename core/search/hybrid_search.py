@@ -5,8 +5,9 @@ Provides two fusion strategies:
 * **Weighted sum**: ``final = alpha * dense_score + (1 - alpha) * sparse_score``
 * **Reciprocal Rank Fusion (RRF)**: ``score(d) = Σ 1 / (k + rank(d))``
 
-All computation uses the Python standard library only (``math``, ``re``,
-``collections``), with no third-party dependencies.
+Sparse scoring uses the Python standard library only (``math``, ``re``,
+``collections``); dense scoring is batched through
+:func:`core.utils.math.cosine_similarities` (NumPy when installed).
 """
 
 from __future__ import annotations
@@ -172,11 +173,9 @@ class HybridSearchEngine:
             return self._rrf_search(query_embedding, nodes, sparse_scores, top_k)
 
         if query_embedding is not None:
-            dense_scores = [
-                _cosine_similarity(query_embedding, emb) if emb else 0.0
-                for n in nodes
-                for emb in [get_node_embedding(n)]
-            ]
+            dense_scores = _cosine_similarities(
+                query_embedding, [get_node_embedding(n) for n in nodes]
+            )
             effective_alpha = self.alpha
         else:
             dense_scores = [0.0] * len(nodes)
@@ -210,11 +209,13 @@ class HybridSearchEngine:
         )
 
         if query_embedding is not None:
-            dense_pairs = [
-                (n.id, _cosine_similarity(query_embedding, emb) if emb else 0.0)
-                for n in nodes
-                for emb in [get_node_embedding(n)]
-            ]
+            dense_pairs = list(
+                zip(
+                    [n.id for n in nodes],
+                    _cosine_similarities(query_embedding, [get_node_embedding(n) for n in nodes]),
+                    strict=True,
+                )
+            )
             dense_ranked = sorted(dense_pairs, key=lambda item: item[1], reverse=True)
         else:
             dense_ranked = sparse_ranked  # treat as same list when no embedding
@@ -228,4 +229,4 @@ class HybridSearchEngine:
 
 
 # Canonical implementation in core.utils.math
-from core.utils.math import cosine_similarity as _cosine_similarity  # noqa: E402
+from core.utils.math import cosine_similarities as _cosine_similarities  # noqa: E402
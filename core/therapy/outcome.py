@@ -52,29 +52,30 @@ class OutcomeTracker:
         pre_dominance: float | None = None,
     ) -> str:
         """Start tracking an intervention. Returns the tracking ``id``."""
-        await self.storage._ensure_initialized()
         tracking_id = str(uuid4())
-        conn = await self.storage._get_conn()
-        await conn.execute(
-            """
-            INSERT INTO intervention_outcomes
-              (id, user_id, intervention_type,
-               pre_valence, pre_arousal, pre_dominance,
-               post_valence, post_arousal, post_dominance,
-               user_feedback, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, NULL, NULL, ?)
-            """,
-            (
-                tracking_id,
-                user_id,
-                intervention_type,
-                pre_valence,
-                pre_arousal,
-                pre_dominance,
-                datetime.now(UTC).isoformat(),
-            ),
-        )
-        await conn.commit()
+        # Writes go through the storage writer lock: a bare execute on the
+        # shared connection would open an implicit transaction that collides
+        # with the next storage write.
+        async with self.storage._write_conn() as conn:
+            await conn.execute(
+                """
+                INSERT INTO intervention_outcomes
+                  (id, user_id, intervention_type,
+                   pre_valence, pre_arousal, pre_dominance,
+                   post_valence, post_arousal, post_dominance,
+                   user_feedback, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, NULL, NULL, ?)
+                """,
+                (
+                    tracking_id,
+                    user_id,
+                    intervention_type,
+                    pre_valence,
+                    pre_arousal,
+                    pre_dominance,
+                    datetime.now(UTC).isoformat(),
+                ),
+            )
         logger.info("Recorded intervention start: %s type=%s", tracking_id, intervention_type)
         return tracking_id
 
@@ -95,35 +96,32 @@ class OutcomeTracker:
         user_feedback:
             1 = helpful, 0 = neutral, -1 = harmful.
         """
-        await self.storage._ensure_initialized()
-        conn = await self.storage._get_conn()
-        await conn.execute(
-            """
-            UPDATE intervention_outcomes
-            SET post_valence = ?, post_arousal = ?, post_dominance = ?,
-                user_feedback = ?
-            WHERE id = ?
-            """,
-            (post_valence, post_arousal, post_dominance, user_feedback, tracking_id),
-        )
-        await conn.commit()
+        async with self.storage._write_conn() as conn:
+            await conn.execute(
+                """
+                UPDATE intervention_outcomes
+                SET post_valence = ?, post_arousal = ?, post_dominance = ?,
+                    user_feedback = ?
+                WHERE id = ?
+                """,
+                (post_valence, post_arousal, post_dominance, user_feedback, tracking_id),
+            )
 
     async def compute_effectiveness(
         self, user_id: str, intervention_type: str
     ) -> float | None:
         """Return mean valence delta for completed outcomes, or ``None``."""
-        await self.storage._ensure_initialized()
-        conn = await self.storage._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT AVG(post_valence - pre_valence) AS avg_delta
-            FROM intervention_outcomes
-            WHERE user_id = ? AND intervention_type = ?
-              AND post_valence IS NOT NULL AND pre_valence IS NOT NULL
-            """,
-            (user_id, intervention_type),
-        )
-        row = await cursor.fetchone()
+        async with self.storage._read_conn() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT AVG(post_valence - pre_valence) AS avg_delta
+                FROM intervention_outcomes
+                WHERE user_id = ? AND intervention_type = ?
+                  AND post_valence IS NOT NULL AND pre_valence IS NOT NULL
+                """,
+                (user_id, intervention_type),
+            )
+            row = await cursor.fetchone()
         if row and row[0] is not None:
             return float(row[0])
         return None
@@ -132,31 +130,21 @@ class OutcomeTracker:
         self, user_id: str, limit: int = 50
     ) -> list[InterventionOutcome]:
         """Return recent outcomes for a user."""
-        await self.storage._ensure_initialized()
-        conn = await self.storage._get_conn()
-        cursor = await conn.execute(
-            """
-            SELECT * FROM intervention_outcomes
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-            """,
-            (user_id, limit),
-        )
-        rows = await cursor.fetchall()
-        return [
-            InterventionOutcome(
-                id=row["id"],
-                user_id=row["user_id"],
-                intervention_type=row["intervention_type"],
-                pre_valence=row["pre_valence"],
-                pre_arousal=row["pre_arousal"],
-                pre_dominance=row["pre_dominance"],
-                post_valence=row["post_valence"],
-                post_arousal=row["post_arousal"],
-                post_dominance=row["post_dominance"],
-                user_feedback=row["user_feedback"],
-                created_at=row["created_at"],
+        # Pooled readers return plain tuples: columns are listed in
+        # InterventionOutcome field order.
+        async with self.storage._read_conn() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT id, user_id, intervention_type,
+                       pre_valence, pre_arousal, pre_dominance,
+                       post_valence, post_arousal, post_dominance,
+                       user_feedback, created_at
+                FROM intervention_outcomes
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+                """,
+                (user_id, limit),
             )
-            for row in rows
-        ]
+            rows = await cursor.fetchall()
+        return [InterventionOutcome(*row) for row in rows]
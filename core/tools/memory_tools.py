@@ -7,7 +7,9 @@ wrapper around existing storage / context APIs.
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import aclosing
 from typing import Any, TYPE_CHECKING
 
 from core.tools.base import Tool, ToolCallResult, ToolParameter
@@ -84,17 +86,19 @@ class GetProjectsTool(Tool):
 
     async def execute(self, **kwargs: Any) -> ToolCallResult:
         try:
-            projects = await self._api.get_user_nodes_by_type(self._user_id, "PROJECT")
-            tasks = await self._api.get_user_nodes_by_type(self._user_id, "TASK")
-            edges = await self._api.storage.list_edges(self._user_id)
+            projects, tasks = await asyncio.gather(
+                self._api.get_user_nodes_by_type(self._user_id, "PROJECT"),
+                self._api.get_user_nodes_by_type(self._user_id, "TASK"),
+            )
 
             # Build project → tasks map
             project_tasks: dict[str, list[str]] = {}
-            for edge in edges:
-                if edge.relation == "HAS_TASK":
-                    project_tasks.setdefault(edge.source_node_id, []).append(
-                        edge.target_node_id
-                    )
+            async with aclosing(self._api.storage.iter_edges(self._user_id)) as edges:
+                async for edge in edges:
+                    if edge.relation == "HAS_TASK":
+                        project_tasks.setdefault(edge.source_node_id, []).append(
+                            edge.target_node_id
+                        )
 
             task_map = {t.id: (t.name or t.text or "")[:80] for t in tasks}
 
@@ -147,7 +151,7 @@ class GetInsightsTool(Tool):
     async def execute(self, **kwargs: Any) -> ToolCallResult:
         limit = int(kwargs.get("limit", 5))
         try:
-            insights = await self._api.storage.find_nodes(
+            insights = await self._api.storage.find_nodes_recent(
                 self._user_id, node_type="INSIGHT", limit=limit,
             )
             # Sort by created_at desc
@@ -185,11 +189,11 @@ class GetMoodTrendTool(Tool):
 
     async def execute(self, **kwargs: Any) -> ToolCallResult:
         try:
-            snapshots = await self._api.storage.get_mood_snapshots(
-                self._user_id, limit=5,
-            )
-            emotions = await self._api.storage.find_nodes(
-                self._user_id, node_type="EMOTION", limit=10,
+            snapshots, emotions = await asyncio.gather(
+                self._api.storage.get_mood_snapshots(self._user_id, limit=5),
+                self._api.storage.find_nodes_recent(
+                    self._user_id, node_type="EMOTION", limit=10,
+                ),
             )
             emotions.sort(
                 key=lambda n: n.metadata.get("created_at", n.created_at or ""),
@@ -189,7 +189,8 @@ class ProactiveTool(Tool):
             suggestions = self._heuristic_suggestions(psyche_state, goals)
 
         if allowed_types:
-            suggestions = [s for s in suggestions if s.type in allowed_types]
+            allowed = frozenset(allowed_types)
+            suggestions = [s for s in suggestions if s.type in allowed]
 
         suggestions.sort(key=lambda s: s.priority)
         return suggestions[:limit]
@@ -0,0 +1,151 @@
+"""Fast JSON encode/decode for storage layers.
+
+Uses ``orjson`` when it is installed (``pip install orjson``) and falls
+back to the standard library otherwise.  Both paths produce compact ``str``
+output and accept the same inputs as ``json.dumps(..., ensure_ascii=False)``;
+``orjson`` additionally serializes NumPy arrays natively.
+
+:func:`loads_lazy` defers parsing of a JSON object until it is first read,
+for rows whose metadata most callers never touch.
+"""
+
+from __future__ import annotations
+
+import json
+from enum import Enum
+from typing import Any
+
+__all__ = ["HAS_ORJSON", "LazyJSONDict", "dumps", "loads", "loads_lazy"]
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is absent
+    orjson = None  # type: ignore[assignment]
+
+HAS_ORJSON = orjson is not None
+
+if orjson is not None:
+    # PASSTHROUGH_SUBCLASS: orjson reads dict subclasses straight from the
+    # underlying storage, which is still empty for an unparsed LazyJSONDict.
+    _OPTIONS = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+
+    def _default(value: Any) -> Any:
+        if isinstance(value, Enum):
+            return value.value
+        for base in (dict, list, str, int):
+            if isinstance(value, base):
+                return base(value)
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    def dumps(value: Any) -> str:
+        """Serialize *value* to a JSON string."""
+        return orjson.dumps(value, default=_default, option=_OPTIONS).decode()
+
+    def loads(data: str | bytes) -> Any:
+        """Parse a JSON document."""
+        return orjson.loads(data)
+
+else:
+    # Compact separators: same bytes on disk as the orjson path.
+    _ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(value: Any) -> str:
+        """Serialize *value* to a JSON string."""
+        # iterencode() without _one_shot is the pure-Python encoder: it tests
+        # dicts with len() and reads items(), so an unparsed LazyJSONDict is
+        # materialized.  The C encoder reads the (still empty) dict storage.
+        return "".join(_ENCODER.iterencode(value))
+
+    def loads(data: str | bytes) -> Any:
+        """Parse a JSON document."""
+        return json.loads(data)
+
+
+def _materialized(method: Any) -> Any:
+    def wrapper(self: LazyJSONDict, *args: Any, **kwargs: Any) -> Any:
+        if self._raw is not None:
+            self._materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+_dict_new = dict.__new__
+
+
+class LazyJSONDict(dict):
+    """A ``dict`` that parses its JSON source on first access.
+
+    Behaves as a regular dict (including ``isinstance(x, dict)``); every
+    read or write first decodes the pending document.  Copies and pickles
+    are plain dicts.
+
+    Until then the underlying dict storage is empty, so C code that reads
+    it directly (the stdlib ``json`` C encoder) sees ``{}``: serialize with
+    :func:`dumps`, or materialize first with ``dict(x)``.
+    """
+
+    __slots__ = ("_raw",)
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._raw: str | bytes | None = None
+
+    @classmethod
+    def from_json(cls, data: str | bytes) -> LazyJSONDict:
+        # Called once per loaded row: skip __init__ and the temporary dict.
+        lazy = _dict_new(cls)
+        lazy._raw = data
+        return lazy
+
+    def _materialize(self) -> None:
+        raw, self._raw = self._raw, None
+        dict.update(self, loads(raw))
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (dict, (dict(self.items()),))
+
+    for _name in (
+        "__contains__",
+        "__delitem__",
+        "__eq__",
+        "__getitem__",
+        "__ior__",
+        "__iter__",
+        "__len__",
+        "__ne__",
+        "__or__",
+        "__repr__",
+        "__reversed__",
+        "__ror__",
+        "__setitem__",
+        "clear",
+        "copy",
+        "get",
+        "items",
+        "keys",
+        "pop",
+        "popitem",
+        "setdefault",
+        "update",
+        "values",
+    ):
+        locals()[_name] = _materialized(getattr(dict, _name))
+    del _name
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+def loads_lazy(data: str | bytes) -> dict[str, Any]:
+    """Return a :class:`LazyJSONDict` for the JSON object *data*.
+
+    An empty object (the stored form of default metadata) is returned as a
+    plain ``dict`` -- there is nothing to defer.
+    """
+    if data == "{}":
+        return {}
+    return LazyJSONDict.from_json(data)
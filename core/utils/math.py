@@ -1,14 +1,32 @@
 """Shared math utilities for SELF-OS.
 
 Single-source ``cosine_similarity`` used across search, memory,
-analytics, and storage modules. **No third-party dependencies.**
+analytics, and storage modules. **No required third-party dependencies:**
+:func:`cosine_similarities` and :func:`top_k_similar` use NumPy when it is
+installed (``pip install numpy``) and fall back to :func:`cosine_similarity`.
 """
 
 from __future__ import annotations
 
+import heapq
 import math
+from collections.abc import Sequence
+from operator import itemgetter
 
-__all__ = ["cosine_similarity", "mean_embedding"]
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when numpy is absent
+    np = None  # type: ignore[assignment]
+
+__all__ = [
+    "HAS_NUMPY",
+    "cosine_similarities",
+    "cosine_similarity",
+    "mean_embedding",
+    "top_k_similar",
+]
+
+HAS_NUMPY = np is not None
 
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
@@ -26,6 +44,67 @@ def cosine_similarity(a: list[float], b: list[float]) -> float:
     return dot / (norm_a * norm_b)
 
 
+def cosine_similarities(
+    query: Sequence[float], vectors: Sequence[Sequence[float] | None]
+) -> list[float]:
+    """Return the cosine similarity of *query* against each of *vectors*.
+
+    Same results as calling :func:`cosine_similarity` per vector (``None``,
+    empty, mismatched-length and zero-norm vectors score 0.0), but with
+    NumPy the whole batch is one matrix-vector product.
+    """
+    if np is None:
+        scores = [0.0] * len(vectors)
+        dim = len(query)
+        for i, vec in enumerate(vectors):
+            if vec and len(vec) == dim:
+                scores[i] = cosine_similarity(query, vec)  # type: ignore[arg-type]
+        return scores
+    return _cosine_scores(query, vectors).tolist()
+
+
+def top_k_similar(
+    query: Sequence[float], vectors: Sequence[Sequence[float] | None], k: int
+) -> list[tuple[int, float]]:
+    """Return ``(index, score)`` of the *k* vectors most similar to *query*.
+
+    Best first; scores are those of :func:`cosine_similarities`. With NumPy,
+    *vectors* may be 1-D arrays (e.g. ``np.frombuffer`` views), and the top
+    *k* are selected with ``argpartition`` instead of ranking every score in
+    Python.
+    """
+    if k <= 0 or not vectors:
+        return []
+    if np is None:
+        scores = cosine_similarities(query, vectors)
+        return heapq.nlargest(k, enumerate(scores), key=itemgetter(1))
+    sims = _cosine_scores(query, vectors)
+    if k < len(sims):
+        top = np.argpartition(-sims, k - 1)[:k]
+    else:
+        top = np.arange(len(sims))
+    top = top[np.argsort(-sims[top], kind="stable")]
+    return [(int(i), float(sims[i])) for i in top]
+
+
+def _cosine_scores(query: Sequence[float], vectors: Sequence[Sequence[float] | None]) -> np.ndarray:
+    """NumPy core of :func:`cosine_similarities`: one score per vector."""
+    scores = np.zeros(len(vectors))
+    dim = len(query)
+    rows = [i for i, vec in enumerate(vectors) if vec is not None and 0 < len(vec) == dim]
+    if not rows:
+        return scores
+    q = np.asarray(query, dtype=np.float64)
+    q_norm = float(np.linalg.norm(q))
+    if q_norm == 0.0:
+        return scores
+    matrix = np.asarray([vectors[i] for i in rows], dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1) * q_norm
+    dots = matrix @ q
+    scores[rows] = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0.0)
+    return scores
+
+
 def mean_embedding(embeddings: list[list[float]]) -> list[float] | None:
     """Average a list of equal-length embedding vectors.
 
@@ -213,6 +213,8 @@ async def run_bot() -> None:
     token = _get_bot_token()
     bot = Bot(token=token)
     processor = build_processor()
+    # Schema setup at startup instead of on the first user message.
+    await processor.graph_api.storage.connect()
     if not hasattr(processor, "pattern_analyzer"):
         processor.pattern_analyzer = PatternAnalyzer(
             processor.graph_api.storage,
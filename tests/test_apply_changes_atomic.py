@@ -21,7 +21,7 @@ def test_atomic_rollback_on_failure(tmp_path):
         ]
 
         call_count = 0
-        original_dumps = node_ops_module.json.dumps
+        original_dumps = node_ops_module._dumps
 
         def flaky_dumps(value, *args, **kwargs):
             nonlocal call_count
@@ -31,7 +31,7 @@ def test_atomic_rollback_on_failure(tmp_path):
             return original_dumps(value, *args, **kwargs)
 
         try:
-            with patch("core.graph._node_ops.json.dumps", side_effect=flaky_dumps):
+            with patch("core.graph._node_ops._dumps", side_effect=flaky_dumps):
                 with pytest.raises(RuntimeError):
                     await api.apply_changes("u1", nodes_6, [])
 
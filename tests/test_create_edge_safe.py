@@ -3,6 +3,7 @@ import sqlite3
 from unittest.mock import AsyncMock, patch
 
 from core.graph.api import GraphAPI
+from core.graph.model import Edge
 from core.graph.storage import GraphStorage
 
 
@@ -17,3 +18,25 @@ def test_create_edge_returns_none_on_error(tmp_path):
             await api.storage.close()
 
     asyncio.run(scenario())
+
+
+def test_create_edges_falls_back_to_per_edge_inserts(tmp_path):
+    async def scenario() -> None:
+        api = GraphAPI(GraphStorage(db_path=tmp_path / "edge_safe.db"))
+        try:
+            a = await api.create_node("u1", "NOTE", text="a")
+            b = await api.create_node("u1", "NOTE", text="b")
+            edges = [
+                Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="RELATES_TO"),
+                Edge(user_id="u1", source_node_id=b.id, target_node_id=a.id, relation="SUPPORTS"),
+            ]
+            with patch.object(
+                api.storage, "add_edges", AsyncMock(side_effect=sqlite3.OperationalError("db error"))
+            ):
+                saved = await api.create_edges(edges)
+            assert [e.relation for e in saved] == ["RELATES_TO", "SUPPORTS"]
+            assert len(await api.storage.list_edges("u1")) == 2
+        finally:
+            await api.storage.close()
+
+    asyncio.run(scenario())
@@ -1,7 +1,14 @@
 import asyncio
 from typing import Any, cast
 
-from core.utils.math import cosine_similarity as _cosine_similarity
+import pytest
+
+from core.utils import math as math_utils
+from core.utils.math import (
+    cosine_similarities,
+    cosine_similarity as _cosine_similarity,
+    top_k_similar,
+)
 from core.llm.embedding_service import EmbeddingService, _node_to_embed_text
 
 
@@ -40,6 +47,34 @@ def test_cosine_similarity_orthogonal():
     assert _cosine_similarity([1.0, 0.0], [0.0, 1.0]) == 0.0
 
 
+def test_cosine_similarities_matches_pairwise():
+    query = [0.3, -1.2, 2.0]
+    vectors = [[0.3, -1.2, 2.0], [1.0, 0.5, 0.0], None, [], [1.0, 2.0], [0.0, 0.0, 0.0]]
+    scores = cosine_similarities(query, vectors)
+    expected = [_cosine_similarity(query, v) if v else 0.0 for v in vectors]
+    assert scores == [pytest.approx(e) for e in expected]
+    assert scores[2:] == [0.0, 0.0, 0.0, 0.0]
+    assert cosine_similarities([0.0, 0.0, 0.0], vectors) == [0.0] * len(vectors)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_top_k_similar_ranks_best_first(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(math_utils, "np", None)
+    elif math_utils.np is None:
+        pytest.skip("numpy is not installed")
+    query = [1.0, 0.0]
+    vectors = [[0.0, 1.0], [1.0, 0.1], None, [1.0, 0.0], [1.0, 1.0], [1.0]]
+
+    top = top_k_similar(query, vectors, 2)
+    assert [i for i, _ in top] == [3, 1]
+    assert top[0][1] == pytest.approx(1.0)
+    assert [i for i, _ in top_k_similar(query, vectors, 10)][:4] == [3, 1, 4, 0]
+    assert len(top_k_similar(query, vectors, 10)) == len(vectors)
+    assert top_k_similar(query, vectors, 0) == []
+    assert top_k_similar(query, [], 3) == []
+
+
 def test_node_to_embed_text():
     text = _node_to_embed_text("THOUGHT", "сомнение", "я не справлюсь")
     assert text == "THOUGHT: сомнение | я не справлюсь"
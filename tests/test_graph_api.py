@@ -174,3 +174,54 @@ def test_edge_dedup(tmp_path):
             await api.storage.close()
 
     asyncio.run(scenario())
+
+
+def test_apply_changes_collapses_in_batch_duplicates(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(db_path=tmp_path / "test.db")
+        api = GraphAPI(storage)
+        try:
+            person = await api.ensure_person_node("me")
+            lookups: list[list[tuple[str, str]]] = []
+            original_find_by_keys = storage.find_by_keys
+
+            async def recording_find_by_keys(user_id, keys):
+                lookups.append(keys)
+                return await original_find_by_keys(user_id, keys)
+
+            storage.find_by_keys = recording_find_by_keys
+
+            first = Node(
+                id="tmp-need-1",
+                user_id="me",
+                type="NEED",
+                name="покой",
+                key="need:Покой",
+                metadata={"source": "first"},
+            )
+            second = Node(
+                id="tmp-need-2",
+                user_id="me",
+                type="NEED",
+                text="хочу тишины",
+                key=" need:ПОКОЙ ",
+                metadata={"source": "second"},
+            )
+            edges = [
+                Edge(user_id="me", source_node_id=person.id, target_node_id="tmp-need-1", relation="RELATES_TO"),
+                Edge(user_id="me", source_node_id=person.id, target_node_id="tmp-need-2", relation="HAS_VALUE"),
+            ]
+
+            created_nodes, created_edges = await api.apply_changes("me", [first, second], edges)
+
+            assert lookups == [[("NEED", "need:покой")]]
+            assert len(created_nodes) == 1
+            saved = created_nodes[0]
+            assert saved.name == "покой"
+            assert saved.text == "хочу тишины"
+            assert saved.metadata["source"] == "second"
+            assert {edge.target_node_id for edge in created_edges} == {saved.id}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
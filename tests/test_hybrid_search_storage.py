@@ -58,3 +58,67 @@ def test_hybrid_search_empty_graph(tmp_path):
             await storage.close()
 
     asyncio.run(run())
+
+
+def test_hybrid_search_fts_prefilter_tracks_updates(tmp_path):
+    async def run():
+        storage = GraphStorage(tmp_path / "fts.db")
+        uid = "u1"
+        try:
+            await storage.upsert_node(_node(uid, "a1", "старый текст заметки"))
+            await storage.upsert_node(_node(uid, "a2", "кот собака питомец"))
+            await storage.upsert_node(_node("u2", "b1", "старый текст чужой"))
+
+            results = await storage.hybrid_search(uid, "старый", top_k=5)
+            assert [n.id for n, _ in results] == ["a1"]
+
+            # INSERT OR REPLACE по тому же key обновляет FTS-индекс
+            await storage.upsert_node(_node(uid, "a1", "новый текст заметки"))
+            assert await storage.hybrid_search(uid, "старый", top_k=5) == []
+            results = await storage.hybrid_search(uid, "новый", top_k=5)
+            assert [n.id for n, _ in results] == ["a1"]
+        finally:
+            await storage.close()
+
+    asyncio.run(run())
+
+
+def test_fts_candidates_keep_best_bm25_matches_when_truncated(tmp_path):
+    async def run():
+        storage = GraphStorage(tmp_path / "fts.db")
+        uid = "u1"
+        try:
+            await storage.upsert_node(_node(uid, "weak", "кот и много других слов про разное"))
+            await storage.upsert_node(_node(uid, "strong", "кот кот кот"))
+            await storage.upsert_node(_node(uid, "none", "собака"))
+
+            candidates = await storage._find_nodes_fts(uid, ["кот"], limit=1)
+            assert [n.id for n in candidates] == ["strong"]
+        finally:
+            await storage.close()
+
+    asyncio.run(run())
+
+
+def test_hybrid_search_adds_dense_candidates_for_query_embedding(tmp_path):
+    async def run():
+        storage = GraphStorage(tmp_path / "test.db")
+        uid = "u1"
+        try:
+            await storage.upsert_node(_node(uid, "n1", "проект разработка"))
+            # No token in common with the query: only the embedding finds it.
+            close = _node(uid, "n2", "кот собака питомец")
+            close.metadata["embedding"] = [1.0, 0.0]
+            await storage.upsert_node(close)
+
+            sparse_only = await storage.hybrid_search(uid, "проект", top_k=5)
+            assert {n.id for n, _ in sparse_only} == {"n1"}
+
+            hybrid = await storage.hybrid_search(
+                uid, "проект", top_k=5, query_embedding=[1.0, 0.0]
+            )
+            assert {n.id for n, _ in hybrid} == {"n1", "n2"}
+        finally:
+            await storage.close()
+
+    asyncio.run(run())
@@ -8,15 +8,23 @@ from core.graph.api import GraphAPI
 from core.graph.model import Edge, Node
 from core.graph.storage import GraphStorage
 from core.insights.engine import InsightEngine
+from core.insights.prepared import (
+    EDGES_BY_RELATION_KEY,
+    PREPARED_GRAPH_KEY,
+    EdgeIndex,
+    PreparedGraph,
+)
 from core.insights.rules import (
     BehavioralPatternRule,
     CognitiveTrapRule,
     EmotionalCycleRule,
     InsightCandidate,
+    InsightRule,
     NeedFrustrationRule,
     TimePatternRule,
 )
 from core.tools.base import Tool, ToolCallResult, ToolParameter, ToolRegistry
+from core.utils.json_codec import loads_lazy
 
 
 # ── Helpers ───────────────────────────────────────────────────────
@@ -164,6 +172,123 @@ def test_time_pattern_no_trigger_daytime():
     asyncio.run(_run())
 
 
+def test_time_pattern_counts_late_negative_emotions_from_history():
+    async def _run():
+        rule = TimePatternRule()
+        history = [
+            _make_node(
+                text="тоска",
+                metadata={"valence": -0.8, "created_at": f"2025-12-0{day}T01:00:00+00:00"},
+            )
+            for day in (1, 2)
+        ]
+        daytime = _make_node(
+            metadata={"valence": -0.8, "created_at": "2025-12-03T13:00:00+00:00"}
+        )
+        new_node = _make_node(
+            metadata={"valence": -0.6, "label": "грусть", "created_at": "2025-12-04T23:30:00Z"}
+        )
+        results = await rule.evaluate(
+            user_id="u1",
+            new_nodes=[new_node],
+            new_edges=[],
+            all_nodes=[*history, daytime, new_node],
+            all_edges=[],
+            graph_context={},
+        )
+        assert [r.title for r in results] == ["Негатив по ночам"]
+        assert results[0].metadata == {"count": 3, "label": "грусть"}
+    asyncio.run(_run())
+
+
+def test_time_pattern_counts_late_negative_history_once_per_pass():
+    async def _run():
+        rule = TimePatternRule()
+        calls = 0
+        count = rule._count_late_negative
+
+        def _counting(prepared):
+            nonlocal calls
+            calls += 1
+            return count(prepared)
+
+        rule._count_late_negative = _counting
+        new_nodes = [
+            _make_node(
+                metadata={"valence": -0.7, "label": label, "created_at": "2025-12-04T23:30:00Z"}
+            )
+            for label in ("грусть", "тревога")
+        ]
+        daytime = _make_node(metadata={"valence": -0.9, "created_at": "2025-12-04T12:00:00Z"})
+        results = await rule.evaluate(
+            user_id="u1",
+            new_nodes=[daytime, *new_nodes],
+            new_edges=[],
+            all_nodes=new_nodes,
+            all_edges=[],
+            graph_context={},
+        )
+        assert calls == 1
+        assert [r.metadata for r in results] == [
+            {"count": 2, "label": "грусть"},
+            {"count": 2, "label": "тревога"},
+        ]
+    asyncio.run(_run())
+
+
+def test_prepared_graph_derives_fields_once_per_node():
+    nodes = [
+        _make_node(
+            node_type="EMOTION", text="Тоска", metadata={"created_at": "2025-12-01T02:10:00Z"}
+        ),
+        _make_node(node_type="EMOTION", name="Страх", metadata={"valence": "bad"}),
+        _make_node(node_type="EMOTION", metadata={"valence": -0.5, "created_at": "not a date"}),
+    ]
+    nodes[1].created_at = ""
+
+    prepared = PreparedGraph.build(nodes)
+
+    assert prepared.types == ["EMOTION", "EMOTION", "EMOTION"]
+    assert prepared.lc_text == ["тоска", "страх", ""]
+    assert prepared.hours == [2, -1, -1]
+    assert prepared.valence[0] == 0.0
+    assert prepared.valence[1] != prepared.valence[1]  # NaN
+    assert prepared.valence[2] == -0.5
+    assert PreparedGraph.from_context({PREPARED_GRAPH_KEY: prepared}, nodes) is prepared
+    assert PreparedGraph.from_context({PREPARED_GRAPH_KEY: prepared}, list(nodes)) is not prepared
+
+
+def test_prepared_graph_leaves_non_emotion_metadata_unparsed():
+    note = _make_node(node_type="NOTE", text="Купить ЕДУ")
+    note.metadata = loads_lazy('{"created_at": "2025-12-01T02:10:00Z", "valence": -0.9}')
+
+    prepared = PreparedGraph.build([note])
+
+    assert prepared.lc_text == ["купить еду"]
+    assert prepared.hours == [-1]
+    assert prepared.valence[0] != prepared.valence[0]  # NaN
+    assert note.metadata._raw is not None
+
+
+def test_edge_index_keeps_edge_order_across_relations():
+    edges = [
+        _make_edge(source="a", relation="TRIGGERS"),
+        _make_edge(source="b", relation="SIGNALS_NEED"),
+        _make_edge(source="c", relation="PROTECTS"),
+        _make_edge(source="d", relation="TRIGGERS"),
+    ]
+
+    index = EdgeIndex.build(edges)
+
+    assert [e.source_node_id for e in index.with_relations("TRIGGERS")] == ["a", "d"]
+    assert [
+        e.source_node_id for e in index.with_relations("PROTECTS", "TRIGGERS", "TRIGGERED_BY")
+    ] == ["a", "c", "d"]
+    assert index.with_relations("TRIGGERED_BY") == []
+    assert EdgeIndex.from_context({EDGES_BY_RELATION_KEY: index}, edges) is index
+    assert EdgeIndex.from_context({EDGES_BY_RELATION_KEY: index}, list(edges)) is not index
+
+
 # ═════════════════════════════════════════════════════════════════
 # BehavioralPatternRule tests
 # ═════════════════════════════════════════════════════════════════
@@ -259,6 +384,71 @@ def test_insight_engine_creates_nodes(tmp_path):
     asyncio.run(_run())
 
 
+def test_insight_engine_links_insights_in_one_edge_batch(tmp_path):
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(
+            node_type="NOTE",
+            text="хочу заказать еду",
+            metadata={"created_at": "2025-12-01T03:00:00+00:00"},
+        )
+        new_node.user_id = "u1"
+
+        batches = []
+        original_add_edges = storage.add_edges_between_existing
+
+        async def _recording_add_edges(edges):
+            batches.append(edges)
+            return await original_add_edges(edges)
+
+        storage.add_edges_between_existing = _recording_add_edges
+        engine = InsightEngine(graph_api=api, rules=[TimePatternRule()])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={}
+        )
+
+        assert insights
+        assert len(batches) == 1
+        person = await api.ensure_person_node("u1")
+        edges = await storage.get_edges_by_relation("u1", "GENERATES_INSIGHT")
+        assert {(e.source_node_id, e.target_node_id) for e in edges} >= {
+            (person.id, insight.id) for insight in insights
+        }
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_uses_graph_from_context(tmp_path):
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(
+            node_type="NOTE",
+            text="хочу заказать еду",
+            metadata={"created_at": "2025-12-01T03:00:00+00:00"},
+        )
+        new_node.user_id = "u1"
+
+        async def _unexpected_load(*args, **kwargs):
+            raise AssertionError("graph should come from graph_context")
+
+        storage.load_user_graph = _unexpected_load
+        storage.fetch_insight_dedup_keys = _unexpected_load
+        context = {"all_nodes": [], "all_edges": [], "existing_insight_keys": set()}
+        engine = InsightEngine(graph_api=api, rules=[TimePatternRule()])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[new_node], new_edges=[], graph_context=context
+        )
+
+        assert insights
+        assert context["existing_insight_keys"] == {
+            (n.metadata["pattern_type"], n.name) for n in insights
+        }
+        await storage.close()
+    asyncio.run(_run())
+
+
 def test_insight_engine_deduplicates(tmp_path):
     async def _run():
         db_path = str(tmp_path / "test.db")
@@ -285,3 +475,303 @@ def test_insight_engine_deduplicates(tmp_path):
         all_insights = await storage.find_nodes("u1", node_type="INSIGHT")
         assert len(all_insights) == count1
     asyncio.run(_run())
+
+
+def test_get_insights_tool_returns_the_newest_insights(tmp_path):
+    from core.tools.memory_tools import GetInsightsTool
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        for day in range(1, 5):
+            await storage.upsert_node(
+                Node(
+                    user_id="u1",
+                    type="INSIGHT",
+                    name=f"insight {day}",
+                    created_at=f"2025-01-0{day}T00:00:00+00:00",
+                )
+            )
+
+        result = await GetInsightsTool(api, "u1").execute(limit=2)
+
+        assert result.success
+        assert [item["title"] for item in result.data] == ["insight 4", "insight 3"]
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_skips_a_failing_rule(tmp_path):
+    class _BrokenRule(InsightRule):
+        name = "broken"
+
+        async def evaluate(self, **kwargs):
+            raise ValueError("boom")
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(
+            node_type="NOTE",
+            text="хочу заказать еду",
+            metadata={"created_at": "2025-12-01T03:00:00+00:00"},
+        )
+        new_node.user_id = "u1"
+
+        engine = InsightEngine(graph_api=api, rules=[_BrokenRule(), TimePatternRule()])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={}
+        )
+
+        assert [n.metadata["pattern_type"] for n in insights] == ["time_pattern"]
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_keeps_the_most_confident_duplicate(tmp_path):
+    class _FixedRule(InsightRule):
+        def __init__(self, confidence: float) -> None:
+            self.name = f"fixed-{confidence}"
+            self.confidence = confidence
+
+        async def evaluate(self, **kwargs):
+            return [
+                InsightCandidate(
+                    pattern_type="behavioral",
+                    title="same",
+                    description=f"conf {self.confidence}",
+                    confidence=self.confidence,
+                    severity="info",
+                )
+            ]
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(node_type="NOTE", text="x")
+        new_node.user_id = "u1"
+
+        engine = InsightEngine(graph_api=api, rules=[_FixedRule(0.5), _FixedRule(0.9)])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={}
+        )
+
+        assert [n.text for n in insights] == ["conf 0.9"]
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_persists_the_top_candidates_by_confidence(tmp_path):
+    class _ManyRule(InsightRule):
+        name = "many"
+
+        async def evaluate(self, **kwargs):
+            return [
+                InsightCandidate(
+                    pattern_type="behavioral",
+                    title=f"t{confidence}",
+                    description="",
+                    confidence=confidence,
+                    severity="info",
+                )
+                for confidence in (0.5, 0.95, 0.3, 0.7, 0.8, 0.6)
+            ]
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(node_type="NOTE", text="x")
+        new_node.user_id = "u1"
+
+        engine = InsightEngine(graph_api=api, rules=[_ManyRule()])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={}
+        )
+
+        assert [n.name for n in insights] == ["t0.95", "t0.8", "t0.7"]
+        # One timestamp per pass, shared by node and metadata
+        assert len({n.created_at for n in insights}) == 1
+        assert all(n.metadata["created_at"] == n.created_at for n in insights)
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_skips_edges_to_missing_related_nodes(tmp_path):
+    class _RelatedRule(InsightRule):
+        name = "related"
+
+        def __init__(self, related_ids: list[str]) -> None:
+            self.related_ids = related_ids
+
+        async def evaluate(self, **kwargs):
+            return [
+                InsightCandidate(
+                    pattern_type="behavioral",
+                    title="linked",
+                    description="",
+                    confidence=0.9,
+                    severity="info",
+                    related_node_ids=self.related_ids,
+                )
+            ]
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        note = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="x"))
+
+        engine = InsightEngine(graph_api=api, rules=[_RelatedRule([note.id, "missing"])])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[note], new_edges=[], graph_context={}
+        )
+
+        person = await api.ensure_person_node("u1")
+        edges = await storage.get_edges_by_relation("u1", "GENERATES_INSIGHT")
+        assert sorted(e.source_node_id for e in edges) == sorted([person.id, note.id])
+        assert {e.target_node_id for e in edges} == {insights[0].id}
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_writes_nodes_and_edges_in_one_transaction(tmp_path):
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        await api.ensure_person_node("u1")
+        new_node = _make_node(
+            node_type="NOTE",
+            text="хочу заказать еду",
+            metadata={"created_at": "2025-12-01T03:00:00+00:00"},
+        )
+        new_node.user_id = "u1"
+
+        statements: list[str] = []
+        conn = await storage._get_conn()
+        await conn.set_trace_callback(statements.append)
+        engine = InsightEngine(graph_api=api, rules=[TimePatternRule()])
+        insights = await engine.run(
+            user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={}
+        )
+        await conn.set_trace_callback(None)
+
+        assert insights
+        assert [s for s in statements if s.startswith("BEGIN")] == ["BEGIN IMMEDIATE"]
+        edges = await storage.get_edges_by_relation("u1", "GENERATES_INSIGHT")
+        assert {e.target_node_id for e in edges} == {i.id for i in insights}
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_reuses_person_node_within_ttl(tmp_path):
+    class _TitledRule(InsightRule):
+        name = "titled"
+
+        def __init__(self) -> None:
+            self.calls = 0
+
+        async def evaluate(self, **kwargs):
+            self.calls += 1
+            return [
+                InsightCandidate(
+                    pattern_type="behavioral",
+                    title=f"pass {self.calls}",
+                    description="",
+                    confidence=0.9,
+                    severity="info",
+                )
+            ]
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(node_type="NOTE", text="x")
+        new_node.user_id = "u1"
+
+        lookups = []
+        original_ensure = api.ensure_person_node
+
+        async def _recording_ensure(user_id):
+            lookups.append(user_id)
+            return await original_ensure(user_id)
+
+        api.ensure_person_node = _recording_ensure
+        engine = InsightEngine(graph_api=api, rules=[_TitledRule()])
+        for _ in range(2):
+            assert await engine.run(
+                user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={}
+            )
+        assert lookups == ["u1"]
+
+        engine.PERSON_CACHE_TTL = 0.0
+        await engine.run(user_id="u1", new_nodes=[new_node], new_edges=[], graph_context={})
+        assert lookups == ["u1", "u1"]
+
+        person = await original_ensure("u1")
+        edges = await storage.get_edges_by_relation("u1", "GENERATES_INSIGHT")
+        assert len(edges) == 3
+        assert {e.source_node_id for e in edges} == {person.id}
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_shares_one_prepared_graph_across_rules(tmp_path):
+    seen = []
+
+    class _CapturingRule(InsightRule):
+        name = "capturing"
+
+        async def evaluate(self, **kwargs):
+            seen.append((kwargs["graph_context"], kwargs["all_nodes"]))
+            return []
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(node_type="NOTE", text="x")
+        context = {"all_nodes": [new_node], "all_edges": [], "existing_insight_keys": set()}
+
+        engine = InsightEngine(graph_api=api, rules=[_CapturingRule(), _CapturingRule()])
+        await engine.run(user_id="u1", new_nodes=[new_node], new_edges=[], graph_context=context)
+
+        (first, nodes), (second, _) = seen
+        assert first[PREPARED_GRAPH_KEY] is second[PREPARED_GRAPH_KEY]
+        assert first[PREPARED_GRAPH_KEY].nodes is nodes
+        assert PREPARED_GRAPH_KEY not in context
+        await storage.close()
+    asyncio.run(_run())
+
+
+def test_insight_engine_overlaps_rules_that_await(tmp_path):
+    started = []
+
+    class _WaitingRule(InsightRule):
+        def __init__(self, name, gate):
+            self.name = name
+            self.gate = gate
+
+        async def evaluate(self, **kwargs):
+            started.append(self.name)
+            await self.gate.wait()
+            return []
+
+    async def _run():
+        storage = GraphStorage(str(tmp_path / "test.db"))
+        api = GraphAPI(storage)
+        new_node = _make_node(node_type="NOTE", text="x")
+        context = {"all_nodes": [new_node], "all_edges": [], "existing_insight_keys": set()}
+        gate = asyncio.Event()
+
+        engine = InsightEngine(
+            graph_api=api, rules=[_WaitingRule("a", gate), _WaitingRule("b", gate)]
+        )
+        task = asyncio.create_task(
+            engine.run(user_id="u1", new_nodes=[new_node], new_edges=[], graph_context=context)
+        )
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # Both rules are waiting at once: the second did not queue behind the first.
+        assert started == ["a", "b"]
+        gate.set()
+        assert await task == []
+        await storage.close()
+    asyncio.run(_run())
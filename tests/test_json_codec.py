@@ -0,0 +1,51 @@
+"""Tests for core/utils/json_codec.py."""
+
+import json
+
+from core.utils import json_codec
+
+
+def test_roundtrip_keeps_unicode_and_floats():
+    value = {"label": "тревога", "embedding": [0.1, -0.25, 1e-7], "n": 3}
+    encoded = json_codec.dumps(value)
+    assert isinstance(encoded, str)
+    assert "тревога" in encoded
+    assert json_codec.loads(encoded) == value
+
+
+def test_non_string_keys_match_stdlib():
+    value = {1: "a", "b": None}
+    assert json_codec.loads(json_codec.dumps(value)) == json.loads(json.dumps(value))
+
+
+def test_loads_lazy_defers_parsing_until_first_access():
+    lazy = json_codec.loads_lazy('{"salience_score": 0.5, "tags": ["a"]}')
+    assert isinstance(lazy, dict)
+    assert lazy._raw is not None
+
+    assert lazy["salience_score"] == 0.5
+    assert lazy._raw is None
+    assert lazy == {"salience_score": 0.5, "tags": ["a"]}
+
+
+def test_loads_lazy_returns_plain_dict_for_empty_object():
+    empty = json_codec.loads_lazy("{}")
+    assert type(empty) is dict
+    empty["k"] = 1
+    assert json_codec.loads_lazy("{}") == {}
+
+
+def test_unparsed_lazy_dict_serializes_and_copies_like_a_dict():
+    raw = '{"label": "тревога", "n": 1}'
+    assert json_codec.loads(json_codec.dumps(json_codec.loads_lazy(raw))) == {"label": "тревога", "n": 1}
+    assert json.loads(json_codec.dumps({"m": json_codec.loads_lazy(raw)})) == {"m": {"label": "тревога", "n": 1}}
+    assert json.loads(json.dumps({"m": dict(json_codec.loads_lazy(raw))})) == {"m": {"label": "тревога", "n": 1}}
+    assert {**json_codec.loads_lazy(raw)} == {"label": "тревога", "n": 1}
+    assert len(json_codec.loads_lazy("{}")) == 0
+
+
+def test_unparsed_lazy_dict_keeps_no_placeholder_in_dict_storage():
+    lazy = json_codec.loads_lazy('{"n": 1}')
+    assert dict.__len__(lazy) == 0
+    assert list(lazy.items()) == [("n", 1)]
+    assert list(dict.keys(lazy)) == ["n"]
@@ -71,6 +71,48 @@ def test_abstract_with_llm_creates_archetype(tmp_path):
     asyncio.run(scenario())
 
 
+class RecordingSemanticStore:
+    """Semantic store fake that records mirrored merges."""
+
+    def __init__(self):
+        self.merges = []
+
+    async def merge_nodes(self, user_id, source_node_ids, target_node):
+        self.merges.append((user_id, list(source_node_ids), target_node))
+        return target_node
+
+
+def test_abstract_mirrors_merge_into_semantic_store(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            sources = [
+                await storage.upsert_node(
+                    Node(
+                        user_id="u1", type="BELIEF", text=f"belief {i}", key=f"b:{i}",
+                        metadata={"abstraction_level": 1, "embedding": emb},
+                    )
+                )
+                for i, emb in enumerate(([1.0, 0.0, 0.0], [0.99, 0.1, 0.0]))
+            ]
+            semantic = RecordingSemanticStore()
+
+            mc = MemoryConsolidator(
+                storage, llm_client=MockAbstractionLLM(), semantic_store=semantic
+            )
+            report = await mc.abstract("u1")
+
+            assert report.abstracted == 1
+            ((user_id, source_ids, target),) = semantic.merges
+            assert user_id == "u1"
+            assert sorted(source_ids) == sorted(n.id for n in sources)
+            assert target.metadata["abstraction_level"] == 2
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
 def test_abstract_without_llm_is_placeholder(tmp_path):
     async def scenario() -> None:
         storage = GraphStorage(tmp_path / "test.db")
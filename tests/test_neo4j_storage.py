@@ -0,0 +1,329 @@
+"""Tests for Neo4jStorage helpers that need no Neo4j server."""
+
+import asyncio
+
+from core.graph import neo4j_storage
+from core.graph.model import Edge, Node
+from core.graph.neo4j_storage import (
+    Neo4jStorage,
+    _is_native_value,
+    _metadata_to_props,
+    _props_to_metadata,
+)
+from core.utils import json_codec
+
+# ── metadata encoding ───────────────────────────────────────────
+
+
+def test_is_native_value_accepts_scalars_and_homogeneous_lists():
+    assert _is_native_value("x")
+    assert _is_native_value(True)
+    assert _is_native_value(3)
+    assert _is_native_value(0.5)
+    assert _is_native_value(["a", "b"])
+    assert _is_native_value([0.1, 0.2])
+    assert _is_native_value([1, 0.5])
+
+    assert not _is_native_value(None)
+    assert not _is_native_value([])
+    assert not _is_native_value({"a": 1})
+    assert not _is_native_value(["a", 1])
+    assert not _is_native_value([True, 1])
+    assert not _is_native_value([1, None])
+
+
+def test_metadata_to_props_stores_mixed_number_lists_as_floats():
+    props, extra = _metadata_to_props({"embedding": [1, 0.5, 0], "ints": [1, 2]})
+
+    assert props == {"meta_embedding": [1.0, 0.5, 0.0], "meta_ints": [1, 2]}
+    assert all(type(v) is float for v in props["meta_embedding"])
+    assert type(props["meta_ints"][0]) is int
+    assert extra is None
+
+
+def test_upsert_resets_metadata_properties_before_setting_new_ones():
+    # A full replace to the non-metadata properties drops meta_* keys the
+    # caller removed, plus the legacy JSON ``metadata`` string.
+    query = neo4j_storage._Q_UPSERT_NODE
+    reset = query.index("SET n = n {")
+    assert query.index("SET n += $meta_props") > reset
+    projection = query[reset : query.index("}", reset)]
+    assert "meta_" not in projection
+    assert ".metadata" not in projection
+    assert "._new" in projection and ".is_deleted" in projection
+
+
+def test_metadata_props_round_trip():
+    metadata = {
+        "salience_score": 0.5,
+        "label": "тревога",
+        "embedding": [1, 0.25],
+        "tags": ["a", "b"],
+        "last_reviewed_at": None,
+        "nested": {"k": [1, "x"]},
+    }
+    meta_props, extra = _metadata_to_props(metadata)
+    props = {"id": "n1", "user_id": "u1", "type": "BELIEF", **meta_props, "metadata_extra": extra}
+
+    assert set(meta_props) == {"meta_salience_score", "meta_label", "meta_embedding", "meta_tags"}
+    assert _props_to_metadata(props) == metadata
+
+
+def test_props_to_metadata_reads_legacy_json_as_base():
+    props = {
+        "metadata": json_codec.dumps({"old": 1, "label": "stale"}),
+        "meta_label": "fresh",
+        "metadata_extra": json_codec.dumps({"nested": {"a": 1}}),
+    }
+
+    assert _props_to_metadata(props) == {"old": 1, "label": "fresh", "nested": {"a": 1}}
+
+
+# ── query parameters and key cache (no server) ─────────────────
+
+
+class _Counters:
+    def __init__(self, relationships_created: int) -> None:
+        self.relationships_created = relationships_created
+
+
+class _FakeSession:
+    """Session whose execute_write records each bulk chunk."""
+
+    def __init__(self, batches: list[tuple[str, list[dict]]]) -> None:
+        self.batches = batches
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def execute_write(self, work, query, rows):
+        self.batches.append((query, rows))
+        return _Counters(relationships_created=len(rows))
+
+
+class _FakeDriver:
+    def __init__(self) -> None:
+        self.batches: list[tuple[str, list[dict]]] = []
+
+    def session(self, database: str) -> _FakeSession:
+        return _FakeSession(self.batches)
+
+
+class _RecordingStorage(Neo4jStorage):
+    """Neo4jStorage whose read/write transactions are served from memory."""
+
+    def __init__(self, by_key: dict[tuple[str, str, str], dict]) -> None:
+        # Only the bulk paths reach the driver; _read/_write are overridden.
+        self._driver = _FakeDriver()
+        self._database = "neo4j"
+        self._vector_dimensions = None
+        self._ready = asyncio.Event()
+        self._ready.set()
+        self._init_lock = asyncio.Lock()
+        self._key_cache = {}
+        self._key_generation = {}
+        self._key_epoch = 0
+        self.by_key = by_key
+        self.calls: list[tuple[str, dict]] = []
+
+    async def _read(self, query: str, **params):
+        self.calls.append((query, params))
+        props = self.by_key.get((params["user_id"], params["type"], params["key"]))
+        return [{"n": props}] if props is not None else []
+
+    async def _read_as(self, convert, query: str, **params):
+        self.calls.append((query, params))
+        return []
+
+    async def _write(self, query: str, **params):
+        self.calls.append((query, params))
+        if query is neo4j_storage._Q_UPSERT_NODE:
+            return [{
+                "id": params["id"],
+                "created_at": params["created_at"],
+                "name": params["name"],
+                "text": params["text"],
+                "subtype": params["subtype"],
+            }]
+        return []
+
+
+_BELIEF_PROPS = {"id": "b1", "user_id": "u1", "type": "BELIEF", "key": "b:1", "meta_label": "x"}
+
+
+def test_upsert_node_sends_native_metadata_params():
+    async def scenario() -> None:
+        storage = _RecordingStorage({})
+        node = Node(
+            user_id="u1", type="BELIEF", text="t", key="b:1",
+            metadata={"embedding": [1, 0.5], "nested": {"a": 1}},
+        )
+
+        saved = await storage.upsert_node(node)
+
+        ((query, params),) = storage.calls
+        assert query is neo4j_storage._Q_UPSERT_NODE
+        assert set(params) == {
+            "id", "user_id", "type", "name", "text", "subtype", "key",
+            "meta_props", "metadata_extra", "created_at",
+        }
+        assert params["meta_props"]["meta_embedding"] == [1.0, 0.5]
+        assert json_codec.loads(params["metadata_extra"])["nested"] == {"a": 1}
+        assert saved.id == node.id
+        assert saved.metadata["embedding"] == [1, 0.5]
+
+    asyncio.run(scenario())
+
+
+def test_merge_nodes_writes_target_without_return():
+    async def scenario() -> None:
+        storage = _RecordingStorage({})
+        target = Node(user_id="u1", type="BELIEF", text="archetype", key="b:arch")
+
+        saved = await storage.merge_nodes("u1", ["s1", "s2"], target)
+
+        (upsert_query, upsert_params), (merge_query, merge_params) = storage.calls
+        assert upsert_query is neo4j_storage._Q_UPSERT_NODE_NO_RETURN
+        assert "RETURN" not in upsert_query
+        assert upsert_params["id"] == target.id
+        assert merge_query is neo4j_storage._Q_MERGE_NODES
+        assert merge_params == {"source_ids": ["s1", "s2"], "target_id": target.id}
+        assert saved.id == target.id
+        assert saved.metadata["salience_score"] == 1.0
+
+    asyncio.run(scenario())
+
+
+def test_find_nodes_binds_missing_filters_as_null():
+    async def scenario() -> None:
+        storage = _RecordingStorage({})
+
+        await storage.find_nodes("u1", node_type="", limit=5)
+
+        ((query, params),) = storage.calls
+        assert query is neo4j_storage._Q_FIND_NODES
+        assert params == {"user_id": "u1", "node_type": None, "name": None, "limit": 5}
+
+    asyncio.run(scenario())
+
+
+def test_find_by_key_cache_hits_and_write_invalidation():
+    async def scenario() -> None:
+        storage = _RecordingStorage({("u1", "BELIEF", "b:1"): _BELIEF_PROPS})
+
+        first = await storage.find_by_key("u1", "BELIEF", "b:1")
+        assert first is not None and first.metadata == {"label": "x"}
+        first.metadata["label"] = "mutated by caller"
+        second = await storage.find_by_key("u1", "BELIEF", "b:1")
+        assert second is not first and second.metadata == {"label": "x"}
+        assert await storage.find_by_key("u1", "BELIEF", "missing") is None
+        assert await storage.find_by_key("u1", "BELIEF", "missing") is None
+        assert len(storage.calls) == 3  # hits are cached, misses are not
+        assert ("u1", "BELIEF", "missing") not in storage._key_cache
+
+        # Upsert of the same key drops its entry
+        await storage.upsert_node(Node(user_id="u1", type="BELIEF", key="b:1", id="b1"))
+        storage.calls.clear()
+        await storage.find_by_key("u1", "BELIEF", "b:1")
+        assert len(storage.calls) == 1
+
+        # Soft-delete invalidates by node id
+        await storage.soft_delete_node("b1")
+        assert ("u1", "BELIEF", "b:1") not in storage._key_cache
+
+    asyncio.run(scenario())
+
+
+def test_find_by_key_does_not_cache_a_lookup_that_raced_a_write():
+    class _SlowReadStorage(_RecordingStorage):
+        async def _read(self, query: str, **params):
+            records = await super()._read(query, **params)
+            self.reading.set()
+            await self.release.wait()
+            return records
+
+    async def scenario() -> None:
+        storage = _SlowReadStorage({("u1", "BELIEF", "b:1"): _BELIEF_PROPS})
+        storage.reading, storage.release = asyncio.Event(), asyncio.Event()
+
+        lookup = asyncio.create_task(storage.find_by_key("u1", "BELIEF", "b:1"))
+        await storage.reading.wait()
+        await storage.upsert_node(Node(user_id="u1", type="BELIEF", key="b:1", id="b1"))
+        storage.release.set()
+
+        assert (await lookup).metadata == {"label": "x"}  # what it read
+        assert ("u1", "BELIEF", "b:1") not in storage._key_cache
+
+    asyncio.run(scenario())
+
+
+def test_find_by_key_cache_expires_after_ttl(monkeypatch):
+    async def scenario() -> None:
+        storage = _RecordingStorage({("u1", "BELIEF", "b:1"): _BELIEF_PROPS})
+        clock = [100.0]
+        monkeypatch.setattr(neo4j_storage.time, "monotonic", lambda: clock[0])
+
+        await storage.find_by_key("u1", "BELIEF", "b:1")
+        clock[0] += neo4j_storage.KEY_CACHE_TTL - 1
+        await storage.find_by_key("u1", "BELIEF", "b:1")
+        assert len(storage.calls) == 1
+        clock[0] += 2
+        await storage.find_by_key("u1", "BELIEF", "b:1")
+        assert len(storage.calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_bulk_upsert_nodes_sends_one_unwind_per_batch(monkeypatch):
+    monkeypatch.setattr(neo4j_storage, "BULK_BATCH_SIZE", 2)
+
+    async def scenario() -> None:
+        storage = _RecordingStorage({})
+        nodes = [
+            Node(user_id="u1", type="BELIEF", text=str(i), key=f"b:{i}", metadata={"x": i})
+            for i in range(5)
+        ]
+        storage._key_cache[("u1", "BELIEF", "b:0")] = (nodes[0], 0.0)
+
+        assert await storage.bulk_upsert_nodes(nodes) == 5
+        assert await storage.bulk_upsert_nodes([]) == 0
+
+        batches = storage._driver.batches
+        assert [len(rows) for _, rows in batches] == [2, 2, 1]
+        assert {query for query, _ in batches} == {neo4j_storage._Q_BULK_UPSERT_NODES}
+        first = batches[0][1][0]
+        assert first["id"] == nodes[0].id
+        assert first["meta_props"]["meta_x"] == 0
+        assert first["meta_props"]["meta_salience_score"] == 1.0
+        assert not storage._key_cache
+        assert storage.calls == []  # no per-node round-trips
+
+    asyncio.run(scenario())
+
+
+def test_bulk_add_edges_counts_created_relationships(monkeypatch):
+    monkeypatch.setattr(neo4j_storage, "BULK_BATCH_SIZE", 2)
+
+    async def scenario() -> None:
+        storage = _RecordingStorage({})
+        edges = [
+            Edge(user_id="u1", source_node_id=f"a{i}", target_node_id=f"b{i}",
+                 relation="SUPPORTS", metadata={"weight": 0.5})
+            for i in range(3)
+        ]
+
+        assert await storage.bulk_add_edges(edges) == 3
+        assert await storage.bulk_add_edges([]) == 0
+
+        batches = storage._driver.batches
+        assert [len(rows) for _, rows in batches] == [2, 1]
+        assert {query for query, _ in batches} == {neo4j_storage._Q_BULK_ADD_EDGES}
+        first = batches[0][1][0]
+        assert (first["source_id"], first["target_id"]) == ("a0", "b0")
+        assert first["meta_props"]["meta_weight"] == 0.5
+        assert storage.calls == []
+
+    asyncio.run(scenario())
@@ -135,3 +135,30 @@ def test_build_context_empty_for_no_data(tmp_path):
             await storage.close()
 
     asyncio.run(scenario())
+
+
+def test_retrieve_passes_query_embedding_to_dense_search(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            await _seed_graph(storage, "u1")
+            value = Node(
+                user_id="u1",
+                type="VALUE",
+                text="свобода",
+                key="value:свобода",
+                metadata={"embedding": [0.0, 1.0]},
+            )
+            await storage.upsert_node(value)
+            retriever = GraphRAGRetriever(storage)
+
+            plain = await retriever.retrieve("u1", "недостаточно", top_k=5)
+            assert value.id not in {node.id for node, _ in plain}
+            dense = await retriever.retrieve(
+                "u1", "недостаточно", top_k=5, query_embedding=[0.0, 1.0]
+            )
+            assert value.id in {node.id for node, _ in dense}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
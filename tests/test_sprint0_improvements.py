@@ -2,7 +2,7 @@
 
 import asyncio
 
-from core.graph.model import Node, ensure_metadata_defaults
+from core.graph.model import Node, ensure_metadata_defaults, metadata_with_defaults
 from core.graph.storage import GraphStorage
 from core.journal.storage import JournalStorage
 from core.therapy.outcome import OutcomeTracker
@@ -27,6 +27,16 @@ def test_ensure_metadata_defaults_preserves_existing():
     assert result["abstraction_level"] == 0  # filled in
 
 
+def test_metadata_with_defaults_copies_only_when_incomplete():
+    partial = {"review_count": 5}
+    filled = metadata_with_defaults(partial)
+    assert filled is not partial
+    assert partial == {"review_count": 5}
+    assert filled["salience_score"] == 1.0
+
+    assert metadata_with_defaults(filled) is filled
+
+
 def test_upsert_node_enriches_metadata(tmp_path):
     async def scenario() -> None:
         storage = GraphStorage(tmp_path / "test.db")
@@ -148,7 +158,6 @@ def test_mood_snapshot_new_columns_exist(tmp_path):
     async def scenario() -> None:
         storage = GraphStorage(tmp_path / "test.db")
         try:
-            await storage._ensure_initialized()
             conn = await storage._get_conn()
             # Verify new columns are accessible
             await conn.execute(
@@ -240,7 +249,6 @@ def test_intervention_outcomes_table_created(tmp_path):
     async def scenario() -> None:
         storage = GraphStorage(tmp_path / "test.db")
         try:
-            await storage._ensure_initialized()
             conn = await storage._get_conn()
             cursor = await conn.execute(
                 "SELECT name FROM sqlite_master WHERE type='table' AND name='intervention_outcomes'"
@@ -176,6 +176,52 @@ def test_consolidate_merges_similar_notes(tmp_path):
     asyncio.run(scenario())
 
 
+class _SemanticStore:
+    """Records the bulk writes MemoryConsolidator sends to the semantic layer."""
+
+    def __init__(self) -> None:
+        self.node_batches: list[list[Node]] = []
+        self.edge_batches: list[list[Edge]] = []
+
+    async def bulk_upsert_nodes(self, nodes):
+        self.node_batches.append(list(nodes))
+        return len(nodes)
+
+    async def bulk_add_edges(self, edges):
+        self.edge_batches.append(list(edges))
+        return len(edges)
+
+
+def test_consolidate_promotes_new_beliefs_and_edges_in_bulk(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            notes = []
+            for i, emb in enumerate(([1.0, 0.0], [0.99, 0.1], [0.0, 1.0], [0.1, 0.99])):
+                notes.append(await storage.upsert_node(
+                    Node(user_id="u1", type="NOTE", text=f"note {i}", key=f"note:{i}",
+                         metadata={"salience_score": 0.1, "embedding": emb})
+                ))
+            await storage.add_edge(Edge(user_id="u1", source_node_id=notes[0].id,
+                                        target_node_id=notes[2].id, relation="RELATES_TO"))
+            semantic = _SemanticStore()
+
+            mc = MemoryConsolidator(storage, semantic_store=semantic)
+            report = await mc.consolidate("u1", similarity_threshold=0.9)
+
+            assert report.new_nodes_created == 2
+            (batch,) = semantic.node_batches
+            belief_ids = {n.id for n in await storage.find_nodes("u1", node_type="BELIEF")}
+            assert {n.id for n in batch} == belief_ids
+            # The note edge was re-pointed onto the two archetypes by merge_nodes
+            ((edge,),) = semantic.edge_batches
+            assert {edge.source_node_id, edge.target_node_id} == belief_ids
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
 def test_consolidate_skips_when_too_few(tmp_path):
     async def scenario() -> None:
         storage = GraphStorage(tmp_path / "test.db")
@@ -260,6 +306,49 @@ def test_forget_removes_low_salience_orphans(tmp_path):
     asyncio.run(scenario())
 
 
+def test_forget_deletes_expired_edges_through_storage_writer(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            person = await storage.upsert_node(
+                Node(user_id="u1", type="PERSON", text="me", key="person:me")
+            )
+            stale = [
+                await storage.upsert_node(
+                    Node(user_id="u1", type="NOTE", text=f"old note {i}",
+                         key=f"note:old{i}", metadata={"salience_score": 0.01})
+                )
+                for i in range(2)
+            ]
+            fresh = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", text="fresh note", key="note:fresh",
+                     metadata={"salience_score": 0.01})
+            )
+            for node in stale:
+                await storage.add_edge(
+                    Edge(user_id="u1", source_node_id=person.id, target_node_id=node.id,
+                         relation="RELATES_TO", created_at="2020-01-01T00:00:00+00:00")
+                )
+            await storage.add_edge(
+                Edge(user_id="u1", source_node_id=person.id, target_node_id=fresh.id,
+                     relation="RELATES_TO")
+            )
+
+            report = await MemoryConsolidator(storage).forget("u1")
+
+            assert report == ForgetReport(edges_removed=2, nodes_tombstoned=2)
+            edges = await storage.list_edges("u1")
+            assert [e.target_node_id for e in edges] == [fresh.id]
+            notes = await storage.find_nodes("u1", node_type="NOTE")
+            assert [n.text for n in notes] == ["fresh note"]
+            # The writer is left outside a transaction: later writes succeed
+            await storage.soft_delete_node(fresh.id)
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
 def test_forget_protects_reviewed_beliefs(tmp_path):
     async def scenario() -> None:
         storage = GraphStorage(tmp_path / "test.db")
@@ -1,7 +1,16 @@
 import asyncio
+import contextlib
+import random
+import sqlite3
+from array import array
 
-from core.graph.model import Node
+import pytest
+
+from core.graph import _node_ops as node_ops
+from core.graph import storage as storage_module
+from core.graph.model import Edge, Node
 from core.graph.storage import GraphStorage
+from core.utils.math import cosine_similarity as _cosine_similarity
 
 
 def test_get_all_user_ids_returns_distinct(tmp_path):
@@ -18,3 +27,868 @@ def test_get_all_user_ids_returns_distinct(tmp_path):
             await storage.close()
 
     asyncio.run(scenario())
+
+
+def test_list_edges_endpoint_in_filters_in_sql(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            c = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="c"))
+            inside = await storage.add_edge(
+                Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="RELATES_TO")
+            )
+            await storage.add_edge(
+                Edge(user_id="u1", source_node_id=b.id, target_node_id=c.id, relation="RELATES_TO")
+            )
+
+            assert len(await storage.list_edges("u1")) == 2
+            subset = await storage.list_edges("u1", endpoint_in={a.id, b.id})
+            assert [edge.id for edge in subset] == [inside.id]
+            assert await storage.list_edges("u1", endpoint_in=set()) == []
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_iter_edges_streams_in_created_order(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            first = await storage.add_edge(
+                Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="RELATES_TO")
+            )
+            second = await storage.add_edge(
+                Edge(user_id="u1", source_node_id=b.id, target_node_id=a.id, relation="SUPPORTS")
+            )
+
+            streamed = [edge.id async for edge in storage.iter_edges("u1")]
+            assert streamed == [first.id, second.id]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_iter_nodes_streams_in_batches_and_find_nodes_wraps_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(node_ops, "ITER_FETCH_SIZE", 2)
+
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            saved = await storage.upsert_nodes(
+                [Node(user_id="u1", type="NOTE", text=str(i)) for i in range(5)]
+            )
+            await storage.upsert_node(Node(user_id="u1", type="TASK", text="t"))
+            await storage.soft_delete_node(saved[0].id)
+
+            streamed = [node.id async for node in storage.iter_nodes("u1", node_type="NOTE")]
+            assert streamed == [node.id for node in saved[1:]]
+            assert [n.id for n in await storage.find_nodes("u1", node_type="NOTE")] == streamed
+            limited = [n.id async for n in storage.iter_nodes("u1", node_type="NOTE", limit=3)]
+            assert limited == streamed[:3]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_reopening_migrated_database_skips_alter_table(tmp_path):
+    async def scenario() -> None:
+        storage = await GraphStorage(tmp_path / "test.db").connect()
+        await storage.close()
+
+        statements: list[str] = []
+        reopened = GraphStorage(tmp_path / "test.db")
+        try:
+            conn = await reopened._open_conn()
+            await conn.set_trace_callback(statements.append)
+            await reopened._create_schema(conn)
+            await conn.close()
+        finally:
+            await reopened.close()
+        assert not [s for s in statements if s.lstrip().upper().startswith("ALTER")]
+
+    asyncio.run(scenario())
+
+
+def test_connection_uses_wal_journal(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            conn = await storage._get_conn()
+            cursor = await conn.execute("PRAGMA journal_mode")
+            row = await cursor.fetchone()
+            assert row[0] == "wal"
+            cursor = await conn.execute("PRAGMA busy_timeout")
+            assert (await cursor.fetchone())[0] == 5000
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_in_memory_storage_skips_file_pragmas():
+    async def scenario() -> None:
+        storage = GraphStorage(":memory:")
+        try:
+            node = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            assert (await storage.get_node(node.id)).text == "a"
+            conn = await storage._get_conn()
+            cursor = await conn.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "memory"
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_writes_do_not_interleave_with_a_batch(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            batch = [Node(user_id="u1", type="NOTE", key=f"note:{i}", text="x") for i in range(50)]
+            broken = Node(user_id="u1", type=None, text="NOT NULL")  # type: ignore[arg-type]
+            single = Node(user_id="u1", type="NOTE", text="single")
+            results = await asyncio.gather(
+                storage.upsert_nodes([*batch, broken]),
+                storage.upsert_node(single),
+                return_exceptions=True,
+            )
+            assert isinstance(results[0], sqlite3.IntegrityError)
+            # rolling back the batch must not drop the concurrent single write
+            assert (await storage.get_node(single.id)).text == "single"
+            assert await storage.count_nodes("u1") == 1
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_transaction_groups_writes_into_one_commit(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            async with storage.transaction():
+                a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+                b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+                await storage.add_edge(
+                    Edge(
+                        user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="SUPPORTS"
+                    )
+                )
+                await storage.upsert_scheduler_state("u1", increment_sent=True)
+                await storage.upsert_scheduler_state("u1", increment_sent=True)
+                # readers only see committed data
+                assert await storage.count_nodes("u1") == 0
+            assert await storage.count_nodes("u1") == 2
+            assert len(await storage.list_edges("u1")) == 1
+            assert (await storage.get_scheduler_state("u1"))["total_sent"] == 2
+
+            with pytest.raises(RuntimeError):
+                async with storage.transaction():
+                    await storage.upsert_node(Node(user_id="u1", type="NOTE", text="c"))
+                    raise RuntimeError("boom")
+            assert await storage.count_nodes("u1") == 2
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_batch_inside_transaction_rolls_back_only_itself(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            async with storage.transaction():
+                await storage.upsert_node(Node(user_id="u1", type="NOTE", text="kept"))
+                with pytest.raises(sqlite3.IntegrityError):
+                    await storage.upsert_nodes(
+                        [
+                            Node(user_id="u1", type="NOTE", text="dropped"),
+                            Node(user_id="u1", type=None, text="x"),  # type: ignore[arg-type]
+                        ]
+                    )
+            found = await storage.find_nodes("u1")
+            assert [n.text for n in found] == ["kept"]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_writes_from_other_tasks_wait_for_the_transaction(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            async with storage.transaction():
+                await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+                other = asyncio.ensure_future(
+                    storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+                )
+                await asyncio.sleep(0.01)
+                assert not other.done()
+            await other
+            assert await storage.count_nodes("u1") == 2
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_user_stats_cache_tracks_node_writes(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            assert await storage.get_all_user_ids() == []
+            first = await storage.upsert_node(Node(user_id="u2", type="NOTE", text="a"))
+            assert await storage.get_all_user_ids() == ["u2"]
+            assert await storage.get_last_activity_at("u2") == first.created_at
+
+            async with storage.transaction():
+                await storage.upsert_nodes(
+                    [
+                        Node(user_id="u1", type="NOTE", text="b"),
+                        Node(user_id="u2", type="NOTE", text="c"),
+                    ]
+                )
+                await storage.upsert_node(first)  # update, not a new node
+                assert await storage.count_nodes("u2") == 1
+            assert await storage.get_all_user_ids() == ["u1", "u2"]
+            assert await storage.count_nodes("u2") == 2
+            assert await storage.count_nodes("u1") == 1
+            assert await storage.count_nodes("nobody") == 0
+            assert await storage.get_last_activity_at("nobody") is None
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_user_stats_cache_sees_writes_from_other_connections(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        other = GraphStorage(tmp_path / "test.db")
+        try:
+            await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            assert await storage.get_all_user_ids() == ["u1"]
+            assert await storage.count_nodes("u1") == 1
+
+            late = await other.upsert_node(Node(user_id="u2", type="NOTE", text="b"))
+            await other.upsert_node(Node(user_id="u1", type="NOTE", text="c"))
+
+            assert await storage.get_all_user_ids() == ["u1", "u2"]
+            assert await storage.count_nodes("u1") == 2
+            assert await storage.get_last_activity_at("u2") == late.created_at
+        finally:
+            await other.close()
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_reads_use_pooled_read_only_connections(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            node = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            writer = await storage._get_conn()
+            async with storage._read_conn() as reader:
+                assert reader is not writer
+                with pytest.raises(sqlite3.OperationalError, match="readonly"):
+                    await reader.execute("DELETE FROM nodes")
+
+            nodes = await asyncio.gather(*(storage.get_node(node.id) for _ in range(8)))
+            assert {n.id for n in nodes} == {node.id}
+            assert len(storage._readers) <= 4
+        finally:
+            await storage.close()
+        assert storage._readers == []
+
+    asyncio.run(scenario())
+
+
+def test_save_mood_snapshots_batch_prunes_history(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            snapshots = [
+                {
+                    "id": f"s{i:02d}",
+                    "user_id": "u1",
+                    "timestamp": f"2024-01-01T00:{i:02d}:00+00:00",
+                    "valence_avg": 0.1,
+                    "arousal_avg": 0.2,
+                }
+                for i in range(35)
+            ]
+            await storage.save_mood_snapshots(snapshots)
+
+            stored = await storage.get_mood_snapshots("u1", limit=100)
+            assert len(stored) == 30
+            assert stored[0]["id"] == "s34"
+            assert stored[-1]["id"] == "s05"
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_upsert_node_keeps_identity_and_revives_soft_deleted(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            first = await storage.upsert_node(
+                Node(user_id="u1", type="PROJECT", name="alpha", key="project:alpha")
+            )
+            await storage.soft_delete_node(first.id)
+            second = await storage.upsert_node(
+                Node(user_id="u1", type="PROJECT", name="beta", key="project:alpha")
+            )
+
+            assert second.id == first.id
+            assert second.created_at == first.created_at
+            found = await storage.find_nodes("u1", node_type="PROJECT")
+            assert [(n.id, n.name) for n in found] == [(first.id, "beta")]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_upsert_nodes_batch_resolves_canonical_identities(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            existing = await storage.upsert_node(
+                Node(user_id="u1", type="PROJECT", name="alpha", key="project:alpha")
+            )
+            keyless = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            saved = await storage.upsert_nodes(
+                [
+                    Node(user_id="u1", type="PROJECT", name="beta", key="project:alpha"),
+                    Node(user_id="u1", type="NOTE", text="fresh"),
+                    Node(id=keyless.id, user_id="u1", type="NOTE", text="edited"),
+                    Node(user_id="u1", type="PROJECT", name="gamma", key="project:alpha"),
+                ]
+            )
+
+            assert [n.id for n in saved] == [existing.id, saved[1].id, keyless.id, existing.id]
+            assert saved[0].created_at == existing.created_at
+            assert saved[2].created_at == keyless.created_at
+            assert (await storage.get_node(existing.id)).name == "gamma"
+            assert (await storage.get_node(keyless.id)).text == "edited"
+            assert await storage.count_nodes("u1") == 3
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_embedding_is_stored_as_float16_blob(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            node = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", text="a", metadata={"embedding": [0.5, -1.0, 2.0]})
+            )
+            conn = await storage._get_conn()
+            cursor = await conn.execute(
+                "SELECT metadata_json, length(embedding_blob), embedding_dtype FROM nodes "
+                "WHERE id = ?",
+                (node.id,),
+            )
+            metadata_json, blob_size, dtype = await cursor.fetchone()
+            assert "embedding" not in metadata_json
+            assert (blob_size, dtype) == (3 * 2, "e")
+
+            loaded = await storage.get_node(node.id)
+            assert loaded.metadata._raw is not None  # nothing decoded until first access
+            assert loaded.metadata["embedding"] == [0.5, -1.0, 2.0]
+            assert loaded.metadata == {**node.metadata}
+            plain = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            assert "embedding" not in (await storage.get_node(plain.id)).metadata
+
+            # Out of float16 range: kept as float32.
+            wide = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", text="c", metadata={"embedding": [1e6, 1.0]})
+            )
+            assert (await storage.get_node(wide.id)).metadata["embedding"] == [1e6, 1.0]
+
+            # Rows written before float16 (embedding_dtype NULL) decode as float32.
+            await conn.execute(
+                "UPDATE nodes SET embedding_blob = ?, embedding_dtype = NULL WHERE id = ?",
+                (array("f", [0.25, 4.0]).tobytes(), node.id),
+            )
+            await conn.commit()
+            legacy = await storage.get_node(node.id)
+            assert legacy.metadata["embedding"] == [0.25, 4.0]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_embedding_round_trip_error_is_bounded(tmp_path):
+    # float16 storage is lossy: embedding-scale vectors (1536 dims, components
+    # ~1e-2) come back within float16 rounding and keep their direction.
+    rng = random.Random(7)
+    vector = [rng.gauss(0.0, 0.03) for _ in range(1536)]
+
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            node = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", text="a", metadata={"embedding": vector})
+            )
+            loaded = (await storage.get_node(node.id)).metadata["embedding"]
+        finally:
+            await storage.close()
+
+        assert len(loaded) == len(vector)
+        assert loaded != vector
+        for a, b in zip(loaded, vector, strict=True):
+            assert abs(a - b) <= 2**-11 * abs(b) + 2**-25
+        assert _cosine_similarity(loaded, vector) >= 1 - 1e-6
+
+    asyncio.run(scenario())
+
+
+def test_upsert_without_embedding_keeps_stored_vector(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            first = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", key="k", text="a", metadata={"embedding": [1.0]})
+            )
+            second = await storage.upsert_node(Node(user_id="u1", type="NOTE", key="k", text="b"))
+            assert second.id == first.id
+
+            loaded = await storage.get_node(first.id)
+            assert loaded.text == "b"
+            assert loaded.metadata["embedding"] == [1.0]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_vector_search_ranks_embedded_nodes_via_partial_index(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            near = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", text="near", metadata={"embedding": [1.0, 0.1]})
+            )
+            far = await storage.upsert_node(
+                Node(user_id="u1", type="NOTE", text="far", metadata={"embedding": [0.0, 1.0]})
+            )
+            await storage.upsert_node(Node(user_id="u1", type="NOTE", text="plain"))
+            await storage.upsert_node(
+                Node(user_id="u2", type="NOTE", text="other", metadata={"embedding": [1.0, 0.0]})
+            )
+
+            results = await storage.vector_search("u1", [1.0, 0.0], top_k=1)
+            assert [node.id for node, _ in results] == [near.id]
+            ranked = await storage.vector_search("u1", [1.0, 0.0])
+            assert [node.id for node, _ in ranked] == [near.id, far.id]
+            assert ranked[0][1] > ranked[1][1]
+
+            conn = await storage._get_conn()
+            cursor = await conn.execute(
+                "EXPLAIN QUERY PLAN " + storage_module._EMBEDDED_NODES_SQL, ("u1",)
+            )
+            plan = " ".join(row[-1] for row in await cursor.fetchall())
+            assert "idx_nodes_user_embedding" in plan
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_readers_return_plain_tuples(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            await storage.upsert_scheduler_state("u1", increment_sent=True)
+            async with storage._read_conn() as reader:
+                cursor = await reader.execute("SELECT user_id FROM scheduler_state")
+                assert type(await cursor.fetchone()) is tuple
+
+            state = await storage.get_scheduler_state("u1")
+            assert state["user_id"] == "u1" and state["total_sent"] == 1
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_aclosing_releases_reader_slot_on_early_stop(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            await storage.upsert_nodes(
+                [Node(user_id="u1", type="NOTE", text=str(i), key=f"k{i}") for i in range(3)]
+            )
+            for _ in range(storage_module.READ_POOL_SIZE + 1):
+                async with contextlib.aclosing(storage.iter_nodes("u1")) as nodes:
+                    async for _node in nodes:
+                        break
+                assert not storage._reader_slots.locked()
+            assert len(storage._idle_readers) == 1
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_find_nodes_by_type_walks_type_created_index(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            conn = await storage._get_conn()
+            query = node_ops._FIND_NODES_SQL[(True, False)]
+            cursor = await conn.execute("EXPLAIN QUERY PLAN " + query, ("u1", "NOTE", 10))
+            plan = " ".join(row[-1] for row in await cursor.fetchall())
+            assert "idx_nodes_user_type_created" in plan
+            assert "TEMP B-TREE" not in plan
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_nodes_by_ids_probe_the_primary_key(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            conn = await storage._get_conn()
+            for query in (node_ops._SELECT_NODES_BY_IDS_SQL, node_ops._MERGE_SOFT_DELETE_SQL):
+                cursor = await conn.execute("EXPLAIN QUERY PLAN " + query, ("u1", "[]"))
+                plan = " ".join(row[-1] for row in await cursor.fetchall())
+                assert "(id=?)" in plan
+                assert "idx_nodes_user_created" not in plan
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_refreshes_planner_statistics(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        await storage.upsert_nodes(
+            [Node(user_id="u1", type="NOTE", text=str(i), key=f"k{i}") for i in range(50)]
+        )
+        await storage.close()
+
+        with sqlite3.connect(tmp_path / "test.db") as db:
+            analyzed = {row[0] for row in db.execute("SELECT tbl FROM sqlite_stat1")}
+        assert "nodes" in analyzed
+
+    asyncio.run(scenario())
+
+
+def test_insight_keys_are_read_from_the_dedup_index(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            conn = await storage._get_conn()
+            cursor = await conn.execute(
+                "EXPLAIN QUERY PLAN " + storage_module._INSIGHT_KEYS_SQL, ("u1",)
+            )
+            plan = " ".join(row[-1] for row in await cursor.fetchall())
+            assert "COVERING INDEX idx_nodes_insight_dedup" in plan
+
+            insight = Node(
+                user_id="u1", type="INSIGHT", name="t", key="i", metadata={"pattern_type": "a"}
+            )
+            await storage.upsert_node(insight)
+            insight.metadata = {"pattern_type": "b"}
+            await storage.upsert_node(insight)
+            assert await storage.fetch_insight_dedup_keys("u1") == {("b", "t")}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_pattern_type_column_is_backfilled_for_existing_insights(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        await storage.upsert_node(
+            Node(user_id="u1", type="INSIGHT", name="t", metadata={"pattern_type": "a"})
+        )
+        await storage.close()
+        with sqlite3.connect(tmp_path / "test.db") as db:
+            db.execute("DROP INDEX idx_nodes_insight_dedup")
+            db.execute("ALTER TABLE nodes DROP COLUMN pattern_type")
+
+        reopened = GraphStorage(tmp_path / "test.db")
+        try:
+            assert await reopened.fetch_insight_dedup_keys("u1") == {("a", "t")}
+        finally:
+            await reopened.close()
+
+    asyncio.run(scenario())
+
+
+def test_write_block_takes_the_file_write_lock_up_front(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            async with storage._write_conn():
+                other = sqlite3.connect(tmp_path / "test.db", timeout=0)
+                try:
+                    with pytest.raises(sqlite3.OperationalError, match="locked"):
+                        other.execute("BEGIN IMMEDIATE")
+                finally:
+                    other.close()
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_load_user_graph_returns_nodes_edges_and_insight_keys(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            note = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            insight = await storage.upsert_node(
+                Node(
+                    user_id="u1",
+                    type="INSIGHT",
+                    name="Late nights",
+                    metadata={"pattern_type": "time_pattern"},
+                )
+            )
+            await storage.upsert_node(Node(user_id="u1", type="INSIGHT", name="untyped"))
+            await storage.add_edge(
+                Edge(
+                    user_id="u1",
+                    source_node_id=note.id,
+                    target_node_id=insight.id,
+                    relation="GENERATES_INSIGHT",
+                )
+            )
+            await storage.upsert_node(Node(user_id="u2", type="INSIGHT", name="other"))
+
+            graph = await storage.load_user_graph("u1")
+            assert len(graph.nodes) == 3
+            # Rules mostly read type/name/ids: metadata JSON stays unparsed.
+            assert all(node.metadata._raw is not None for node in graph.nodes)
+            # Empty edge metadata ("{}") has nothing to defer: a plain dict.
+            assert [type(edge.metadata) for edge in graph.edges] == [dict]
+            assert [edge.relation for edge in graph.edges] == ["GENERATES_INSIGHT"]
+            assert graph.insight_keys == {("time_pattern", "Late nights"), ("", "untyped")}
+            assert await storage.fetch_insight_dedup_keys("u1") == graph.insight_keys
+            assert await storage.fetch_insight_dedup_keys("nobody") == set()
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_find_by_keys_returns_stored_nodes_by_type_and_key(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            need = await storage.upsert_node(Node(user_id="u1", type="NEED", key="need:rest"))
+            value = await storage.upsert_node(Node(user_id="u1", type="VALUE", key="need:rest"))
+            await storage.upsert_node(Node(user_id="u2", type="NEED", key="need:calm"))
+
+            found = await storage.find_by_keys(
+                "u1", [("NEED", "need:rest"), ("VALUE", "need:rest"), ("NEED", "need:calm")]
+            )
+            assert {pair: node.id for pair, node in found.items()} == {
+                ("NEED", "need:rest"): need.id,
+                ("VALUE", "need:rest"): value.id,
+            }
+            assert await storage.find_by_keys("u1", []) == {}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_get_nodes_by_ids_is_not_bound_by_the_parameter_limit(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            ids = [f"missing-{i}" for i in range(40_000)] + [a.id, b.id, a.id]
+            found = await storage.get_nodes_by_ids("u1", ids)
+            assert {n.id for n in found} == {a.id, b.id}
+            assert await storage.get_nodes_by_ids("u2", ids) == []
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_add_edge_returns_existing_id_for_duplicate(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            first = await storage.add_edge(
+                Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="RELATES_TO")
+            )
+            conn = await storage._get_conn()
+            changes_before = conn.total_changes
+            again = await storage.add_edge(
+                Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="RELATES_TO")
+            )
+
+            assert again.id == first.id
+            assert conn.total_changes == changes_before  # the duplicate writes no row
+            assert len(await storage.list_edges("u1")) == 1
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_add_edges_batch_resolves_existing_and_repeated_ids(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            existing = await storage.add_edge(
+                Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id, relation="RELATES_TO")
+            )
+
+            saved = await storage.add_edges(
+                [
+                    Edge(
+                        user_id="u1",
+                        source_node_id=a.id,
+                        target_node_id=b.id,
+                        relation="RELATES_TO",
+                    ),
+                    Edge(
+                        user_id="u1", source_node_id=b.id, target_node_id=a.id, relation="SUPPORTS"
+                    ),
+                    Edge(
+                        user_id="u1", source_node_id=b.id, target_node_id=a.id, relation="SUPPORTS"
+                    ),
+                ]
+            )
+
+            assert saved[0].id == existing.id
+            assert saved[1].id == saved[2].id
+            assert len(await storage.list_edges("u1")) == 2
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_add_edges_between_existing_skips_missing_and_foreign_endpoints(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            other = await storage.upsert_node(Node(user_id="u2", type="NOTE", text="c"))
+
+            inserted = await storage.add_edges_between_existing(
+                [
+                    Edge(
+                        user_id="u1",
+                        source_node_id=a.id,
+                        target_node_id=b.id,
+                        relation="RELATES_TO",
+                        metadata={"weight": 1},
+                    ),
+                    Edge(
+                        user_id="u1",
+                        source_node_id="missing",
+                        target_node_id=b.id,
+                        relation="RELATES_TO",
+                    ),
+                    Edge(
+                        user_id="u1",
+                        source_node_id=other.id,
+                        target_node_id=b.id,
+                        relation="RELATES_TO",
+                    ),
+                    Edge(
+                        user_id="u1",
+                        source_node_id=a.id,
+                        target_node_id=b.id,
+                        relation="RELATES_TO",
+                    ),
+                ]
+            )
+
+            assert inserted == 1
+            edges = await storage.list_edges("u1")
+            assert [(e.source_node_id, e.target_node_id) for e in edges] == [(a.id, b.id)]
+            assert edges[0].metadata == {"weight": 1}
+            assert await storage.add_edges_between_existing([]) == 0
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_add_edges_between_existing_skips_soft_deleted_endpoints(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            a = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="a"))
+            b = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="b"))
+            gone = await storage.upsert_node(Node(user_id="u1", type="NOTE", text="gone"))
+            await storage.soft_delete_node(gone.id)
+
+            inserted = await storage.add_edges_between_existing(
+                [
+                    Edge(user_id="u1", source_node_id=gone.id, target_node_id=b.id,
+                         relation="GENERATES_INSIGHT"),
+                    Edge(user_id="u1", source_node_id=a.id, target_node_id=gone.id,
+                         relation="GENERATES_INSIGHT"),
+                    Edge(user_id="u1", source_node_id=a.id, target_node_id=b.id,
+                         relation="GENERATES_INSIGHT"),
+                ]
+            )
+
+            assert inserted == 1
+            edges = await storage.list_edges("u1")
+            assert [(e.source_node_id, e.target_node_id) for e in edges] == [(a.id, b.id)]
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_upsert_skips_the_write(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            node = Node(user_id="u1", type="BELIEF", text="I am enough", key="belief:enough")
+            first = await storage.upsert_node(node)
+            conn = await storage._get_conn()
+            changes = conn.total_changes
+
+            again = await storage.upsert_node(node)
+            assert (again.id, again.created_at) == (first.id, first.created_at)
+            assert conn.total_changes == changes
+
+            changed = await storage.upsert_node(
+                Node(user_id="u1", type="BELIEF", text="I am loved", key="belief:enough")
+            )
+            assert changed.id == first.id
+            assert conn.total_changes > changes
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
@@ -2,6 +2,7 @@
 
 import asyncio
 
+from core.graph.model import Node
 from core.graph.storage import GraphStorage
 from core.therapy.outcome import OutcomeTracker
 
@@ -123,3 +124,24 @@ def test_list_outcomes_filters_by_user(tmp_path):
             await storage.close()
 
     asyncio.run(scenario())
+
+
+def test_record_intervention_concurrent_with_storage_write(tmp_path):
+    async def scenario() -> None:
+        storage = GraphStorage(tmp_path / "test.db")
+        try:
+            await storage.connect()
+            tracker = OutcomeTracker(storage)
+            tid, node = await asyncio.gather(
+                tracker.record_intervention(user_id="u1", intervention_type="reframe"),
+                storage.upsert_node(Node(user_id="u1", type="NOTE", text="note")),
+            )
+            await tracker.record_outcome(tid, post_valence=0.1)
+
+            outcomes = await tracker.list_outcomes("u1")
+            assert [(o.id, o.post_valence) for o in outcomes] == [(tid, 0.1)]
+            assert (await storage.get_node(node.id)).text == "note"
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())